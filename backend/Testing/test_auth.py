@@ -325,3 +325,177 @@ def test_merchant_can_delete_admin(client, app, setup_users_for_management):
     with app.app_context():
         user = User.query.get(admin_to_delete.id)
         assert user is None
+
+
+def test_principal_is_cached_across_requests_and_evicted_on_user_change(client, app):
+    """role_required resolves the user once; later requests skip the users lookup until the user changes."""
+    from sqlalchemy import event
+
+    with app.app_context():
+        store = Store(name="Principal Store", address="1 Cache Lane")
+        db.session.add(store)
+        db.session.commit()
+        clerk = User(name="Principal Clerk", email="principal_clerk@test.com",
+                     password="password123", role="clerk", store_id=store.id)
+        db.session.add(clerk)
+        db.session.commit()
+        clerk_id = clerk.id
+        token = create_access_token(identity=str(clerk_id))
+        engine = db.engine
+    headers = {"Authorization": f"Bearer {token}"}
+    app.extensions["dashboard_cache"].ttl = 0
+
+    user_queries = []
+
+    def count_user_queries(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            user_queries.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count_user_queries)
+    try:
+        assert client.get('/clerk_dashboard/summary', headers=headers).status_code == 200
+        assert len(user_queries) == 1
+        assert client.get('/clerk_dashboard/summary', headers=headers).status_code == 200
+        assert len(user_queries) == 1
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_user_queries)
+
+    with app.app_context():
+        db.session.get(User, clerk_id).is_active = False
+        db.session.commit()
+    assert client.get('/clerk_dashboard/summary', headers=headers).status_code == 403
+
+
+def test_login_token_claims_authorize_without_queries_until_version_bump(client, app):
+    """Tokens carry role/store claims; a role or active-state change retires them."""
+    from sqlalchemy import event
+    from flask_jwt_extended import decode_token
+
+    with app.app_context():
+        store = Store(name="Claims Store", address="2 Token Road")
+        db.session.add(store)
+        db.session.commit()
+        clerk = User(name="Claims Clerk", email="claims_clerk@test.com",
+                     password="password123", role="clerk", store_id=store.id)
+        db.session.add(clerk)
+        db.session.commit()
+        clerk_id, store_id = clerk.id, store.id
+        engine = db.engine
+
+    login = client.post('/api/auth/login', json={"email": "claims_clerk@test.com", "password": "password123"})
+    assert login.status_code == 200
+    token = login.json["access_token"]
+    with app.app_context():
+        claims = decode_token(token)
+    assert (claims["role"], claims["store_id"], claims["ver"]) == ("clerk", store_id, 0)
+
+    headers = {"Authorization": f"Bearer {token}"}
+    app.extensions["dashboard_cache"].ttl = 0
+    app.extensions["token_versions"].poll_seconds = 3600
+    auth_queries = []
+
+    def count_auth_queries(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement or "FROM token_versions" in statement:
+            auth_queries.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count_auth_queries)
+    try:
+        assert client.get('/clerk_dashboard/summary', headers=headers).status_code == 200
+        first_request = len(auth_queries)
+        assert client.get('/clerk_dashboard/summary', headers=headers).status_code == 200
+        assert len(auth_queries) == first_request
+        assert not any("FROM users" in statement for statement in auth_queries)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_auth_queries)
+
+    # Promoting the clerk bumps the version: the old token's claims are no longer trusted
+    with app.app_context():
+        db.session.get(User, clerk_id).role = "admin"
+        db.session.commit()
+    assert client.get('/clerk_dashboard/summary', headers=headers).status_code == 403
+    assert client.get('/admin_dashboard/summary', headers=headers).status_code == 200
+
+    with app.app_context():
+        db.session.get(User, clerk_id).is_active = False
+        db.session.commit()
+    assert client.get('/admin_dashboard/summary', headers=headers).status_code == 403
+
+
+def test_token_version_bump_committed_long_after_its_flush_reaches_other_workers(app):
+    """Another worker's registry picks up a bump however late its transaction commits."""
+    from datetime import datetime, timedelta
+    from app.auth.principal import TokenVersionRegistry
+    from app.models import TokenVersion
+
+    with app.app_context():
+        user = User(name="Slow Commit", email="slow_commit@test.com", password="password123", role="clerk")
+        db.session.add(user)
+        db.session.commit()
+        user.role = "admin"
+        db.session.commit()
+
+        other_worker = TokenVersionRegistry(poll_seconds=1)
+        assert other_worker.version(user.id) == 1
+
+        # Flushed, then the transaction stalls well past the poll window before committing
+        user.is_active = False
+        db.session.flush()
+        stale = datetime.utcnow() - timedelta(hours=1)
+        db.session.query(TokenVersion).filter_by(user_id=user.id).update({"updated_at": stale})
+        db.session.commit()
+
+        other_worker.expire()
+        assert other_worker.version(user.id) == 2
+
+
+def test_login_rehashes_outdated_argon2_parameters(client, app):
+    """A hash made with older Argon2 parameters is upgraded transparently at login."""
+    from argon2 import PasswordHasher
+    from app.auth.utils import needs_rehash
+
+    with app.app_context():
+        user = User(name="Rehash User", email="rehash@test.com", password="password123", role="cashier")
+        user.password_hash = PasswordHasher(time_cost=1, memory_cost=8, parallelism=1).hash("password123")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        assert needs_rehash(user.password_hash)
+
+    response = client.post('/api/auth/login', json={"email": "rehash@test.com", "password": "password123"})
+    assert response.status_code == 200
+    with app.app_context():
+        upgraded = db.session.get(User, user_id).password_hash
+        assert not needs_rehash(upgraded)
+        assert "m=65536" in upgraded
+    assert client.post('/api/auth/login', json={"email": "rehash@test.com", "password": "password123"}).status_code == 200
+
+
+def test_login_returns_503_when_password_hashing_pool_is_saturated(client, app):
+    """With every hashing worker and queue slot busy, logins are shed with 503 and Retry-After."""
+    import threading
+    from app.auth.utils import PasswordHashingPool
+
+    with app.app_context():
+        db.session.add(User(name="Busy User", email="busy@test.com", password="password123", role="cashier"))
+        db.session.commit()
+
+    pool = app.extensions["password_hashing"]
+    saturated = PasswordHashingPool(pool.hasher, workers=1, queue_size=0, retry_after=7)
+    app.extensions["password_hashing"] = saturated
+    started, release = threading.Event(), threading.Event()
+
+    def occupy_worker():
+        started.set()
+        release.wait()
+
+    blocker = threading.Thread(target=saturated.run, args=(occupy_worker,))
+    blocker.start()
+    started.wait()
+    try:
+        response = client.post('/api/auth/login', json={"email": "busy@test.com", "password": "password123"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "7"
+    finally:
+        release.set()
+        blocker.join()
+    assert client.post('/api/auth/login', json={"email": "busy@test.com", "password": "password123"}).status_code == 200
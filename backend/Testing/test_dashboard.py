@@ -0,0 +1,268 @@
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from app import db
+from app.models import (
+    Store, User, Supplier, Product, StoreProduct, Purchase, PurchaseItem,
+    StockTransfer, StockTransferItem, Sale, SaleItem, ProductCostBasis
+)
+
+
+@contextmanager
+def count_queries(app):
+    """Counts the SQL statements sent to the database inside the block."""
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def add_catalog(app, store_ids, size):
+    """
+    Adds `size` products stocked in every given store (a mix of low, out of
+    and in stock), each with a purchase line and a transfer line.
+    """
+    with app.app_context():
+        supplier = Supplier(name=f"Supplier {uuid.uuid4()}")
+        user = User(
+            name="Dashboard Merchant",
+            email=f"merchant_{uuid.uuid4()}@example.com",
+            password="securepassword",
+            role="merchant"
+        )
+        db.session.add_all([supplier, user])
+        db.session.flush()
+
+        purchase = Purchase(supplier_id=supplier.id, store_id=store_ids[0], date=date.today(), notes="Restock")
+        transfer = StockTransfer(from_store_id=store_ids[0], to_store_id=store_ids[-1], initiated_by=user.id)
+        db.session.add_all([purchase, transfer])
+        db.session.flush()
+
+        for i in range(size):
+            product = Product(name=f"Item {i}", sku=f"DB{uuid.uuid4().hex[:10]}", unit="pcs")
+            db.session.add(product)
+            db.session.flush()
+            for store_id in store_ids:
+                db.session.add(StoreProduct(
+                    store_id=store_id, product_id=product.id,
+                    quantity_in_stock=(0, 3, 50)[i % 3], low_stock_threshold=10, price=Decimal("20.00")
+                ))
+            db.session.add(PurchaseItem(purchase_id=purchase.id, product_id=product.id, quantity=5, unit_cost=Decimal("12.00")))
+            db.session.add(StockTransferItem(stock_transfer_id=transfer.id, product_id=product.id, quantity=1))
+        db.session.commit()
+
+
+def create_stores(app, count=2):
+    with app.app_context():
+        stores = [Store(name=f"Dashboard Store {uuid.uuid4()}", address="3 Shelf Street") for _ in range(count)]
+        db.session.add_all(stores)
+        db.session.commit()
+        return [store.id for store in stores]
+
+
+def test_merchant_summary_query_count_is_independent_of_catalog_size(client, app):
+    store_ids = create_stores(app)
+
+    add_catalog(app, store_ids, 3)
+    with count_queries(app) as small:
+        response = client.get('/dashboard/summary')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["low_stock_count"] == 2
+    assert body["out_of_stock_count"] == 2
+    assert all(item["store_name"].startswith("Dashboard Store") for item in body["low_stock_items"])
+    assert body["recent_transfers"][0]["from_store"] != "N/A"
+
+    add_catalog(app, store_ids, 30)
+    with count_queries(app) as large:
+        response = client.get('/dashboard/summary')
+    assert response.status_code == 200
+    assert response.get_json()["low_stock_count"] == 2 + 20
+
+    assert len(large) == len(small)
+
+
+def test_merchant_movements_query_count_is_independent_of_catalog_size(client, app):
+    store_ids = create_stores(app)
+
+    add_catalog(app, store_ids, 2)
+    with count_queries(app) as small:
+        response = client.get('/dashboard/movements')
+    assert response.status_code == 200
+    movements = response.get_json()
+    assert {movement["type"] for movement in movements} == {"Purchase", "Transfer"}
+    assert all(movement["product_name"].startswith("Item ") for movement in movements)
+
+    add_catalog(app, store_ids, 12)
+    with count_queries(app) as large:
+        response = client.get('/dashboard/movements')
+    assert len(response.get_json()) == 10
+
+    assert len(large) == len(small)
+
+
+def test_merchant_summary_is_cached_until_a_store_write(client, app):
+    store_ids = create_stores(app)
+    add_catalog(app, store_ids, 3)
+    with app.app_context():
+        cashier = User(
+            name="Dashboard Cashier", email=f"cashier_{uuid.uuid4()}@example.com",
+            password="securepassword", role="cashier", store_id=store_ids[1]
+        )
+        db.session.add(cashier)
+        db.session.commit()
+        cashier_id = cashier.id
+        in_stock = StoreProduct.query.filter_by(store_id=store_ids[1], quantity_in_stock=50).first()
+        in_stock_id, in_stock_product_id = in_stock.id, in_stock.product_id
+
+    first_store = {"store_id": store_ids[0]}
+    assert client.get('/dashboard/summary', query_string=first_store).headers['X-Cache'] == 'MISS'
+    assert client.get('/dashboard/summary').headers['X-Cache'] == 'MISS'
+    with count_queries(app) as statements:
+        response = client.get('/dashboard/summary', query_string=first_store)
+    assert response.headers['X-Cache'] == 'HIT'
+    assert statements == []
+
+    # A sale in the second store retires the all-stores entry but not the first store's
+    response = client.post('/sales/batch', json=[{
+        "store_id": store_ids[1], "cashier_id": cashier_id, "payment_status": "paid",
+        "sale_items": [{"store_product_id": in_stock_id, "quantity": 45}]
+    }])
+    assert response.get_json()["created"] == 1
+
+    assert client.get('/dashboard/summary', query_string=first_store).headers['X-Cache'] == 'HIT'
+    response = client.get('/dashboard/summary')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert in_stock_product_id in {item["id"] for item in response.get_json()["low_stock_items"]}
+
+    # A unit-of-work write to the first store retires its entry
+    with app.app_context():
+        store_product = StoreProduct.query.filter_by(store_id=store_ids[0], quantity_in_stock=50).first()
+        store_product.quantity_in_stock = 0
+        db.session.commit()
+    assert client.get('/dashboard/summary', query_string=first_store).headers['X-Cache'] == 'MISS'
+
+
+def test_bootstrap_matches_individual_panels_and_resolves_scope_once(client, app):
+    store_ids = create_stores(app)
+    add_catalog(app, store_ids, 4)
+    app.config["DASHBOARD_CACHE_TTL"] = 0
+    app.extensions["dashboard_cache"].ttl = 0
+
+    scope = {"store_id": store_ids[0]}
+    with count_queries(app) as statements:
+        response = client.get('/dashboard/bootstrap', query_string=scope)
+    assert response.status_code == 200
+    payload = response.get_json()
+    store_lookups = [s for s in statements if "FROM stores" in s and "WHERE stores.is_deleted" in s]
+    assert len(store_lookups) == 1
+
+    for key, path in (
+        ("summary", "/dashboard/summary"),
+        ("movements", "/dashboard/movements"),
+        ("sales_trend_daily", "/dashboard/sales_trend_daily"),
+        ("profit_trend_daily", "/dashboard/profit_trend_daily"),
+    ):
+        assert payload[key] == client.get(path, query_string=scope).get_json()
+    assert payload["top_performing_stores"] == client.get('/dashboard/top_performing_stores').get_json()
+    assert payload["store_ids"] == [store_ids[0]]
+
+    assert client.get('/dashboard/bootstrap', query_string={"store_id": 999999}).status_code == 404
+
+
+def test_sales_trend_is_windowed_bucketed_and_gap_filled(client, app):
+    store_ids = create_stores(app, count=1)
+    add_catalog(app, store_ids, 1)
+    app.extensions["dashboard_cache"].ttl = 0
+    with app.app_context():
+        store_product = StoreProduct.query.filter_by(store_id=store_ids[0]).first()
+        for sold_at, quantity in ((datetime(2024, 2, 27, 9), 1), (datetime(2024, 3, 1, 18), 2), (datetime(2023, 12, 31, 12), 7)):
+            sale = Sale(store_id=store_ids[0], payment_status="paid", created_at=sold_at)
+            db.session.add(sale)
+            db.session.flush()
+            db.session.add(SaleItem(sale_id=sale.id, store_product_id=store_product.id, quantity=quantity, price_at_sale=Decimal("20.00")))
+        db.session.commit()
+
+    scope = {"store_id": store_ids[0], "start": "2024-02-26", "end": "2024-03-03"}
+    daily = client.get('/dashboard/sales_trend_daily', query_string=scope).get_json()
+    assert [point["date"] for point in daily] == [f"2024-02-{d}" for d in (26, 27, 28, 29)] + ["2024-03-01", "2024-03-02", "2024-03-03"]
+    assert [point["value"] for point in daily] == [0.0, 20.0, 0.0, 0.0, 40.0, 0.0, 0.0]
+
+    weekly = client.get('/dashboard/sales_trend_daily', query_string={**scope, "granularity": "week"}).get_json()
+    assert weekly == [{"date": "2024-02-26", "value": 60.0}]
+
+    monthly = client.get('/dashboard/sales_trend_daily', query_string={
+        "store_id": store_ids[0], "start": "2023-12-15", "end": "2024-03-31", "granularity": "month"
+    }).get_json()
+    assert monthly == [
+        {"date": "2023-12-01", "value": 140.0}, {"date": "2024-01-01", "value": 0.0},
+        {"date": "2024-02-01", "value": 20.0}, {"date": "2024-03-01", "value": 40.0},
+    ]
+
+    assert len(client.get('/dashboard/sales_trend_daily').get_json()) == 30
+    assert client.get('/dashboard/sales_trend_daily', query_string={"granularity": "year"}).status_code == 400
+    assert client.get('/dashboard/profit_trend_daily', query_string={"start": "2024-03-02", "end": "2024-03-01"}).status_code == 400
+    assert client.get('/dashboard/profit_trend_daily', query_string={"start": "2010-01-01", "end": "2024-01-01"}).status_code == 400
+
+
+def test_profit_trend_uses_cost_basis_maintained_by_purchases(client, app):
+    store_id = create_stores(app, count=1)[0]
+    with app.app_context():
+        supplier = Supplier(name=f"Supplier {uuid.uuid4()}")
+        product = Product(name="Costed Item", sku=f"CB{uuid.uuid4().hex[:10]}", unit="pcs")
+        db.session.add_all([supplier, product])
+        db.session.commit()
+        supplier_id, product_id = supplier.id, product.id
+
+    def purchase(quantity, unit_cost):
+        return {"supplier_id": supplier_id, "store_id": store_id,
+                "purchase_items": [{"product_id": product_id, "quantity": quantity, "unit_cost": unit_cost}]}
+
+    def cost_basis():
+        with app.app_context():
+            row = db.session.get(ProductCostBasis, (store_id, product_id))
+            return row.total_quantity, row.total_cost
+
+    assert client.post('/purchases', json=purchase(10, 10)).status_code == 201
+    second_id = client.post('/purchases', json=purchase(10, 14)).get_json()["id"]
+    assert cost_basis() == (20, Decimal("240.00"))
+
+    with app.app_context():
+        store_product = StoreProduct.query.filter_by(store_id=store_id, product_id=product_id).first()
+        sale = Sale(store_id=store_id, payment_status="paid")
+        db.session.add(sale)
+        db.session.flush()
+        db.session.add(SaleItem(sale_id=sale.id, store_product_id=store_product.id, quantity=2, price_at_sale=Decimal("20.00")))
+        db.session.commit()
+        today = sale.created_at.date().isoformat()
+
+    def profit():
+        response = client.get('/dashboard/profit_trend_daily', query_string={"store_id": store_id, "start": today, "end": today})
+        return response.get_json()[0]["value"]
+
+    app.extensions["dashboard_cache"].ttl = 0
+    assert profit() == 40 - 2 * 12
+
+    assert client.patch(f'/purchases/{second_id}', json={"purchase_items": purchase(10, 20)["purchase_items"]}).status_code == 200
+    assert cost_basis() == (20, Decimal("300.00"))
+    assert profit() == 40 - 2 * 15
+
+    assert client.delete(f'/purchases/{second_id}').status_code == 200
+    assert cost_basis() == (10, Decimal("100.00"))
+    assert profit() == 40 - 2 * 10
+
+    result = app.test_cli_runner().invoke(args=["reports", "cost-basis"])
+    assert "Wrote 1 cost basis rows." in result.output
+    assert cost_basis() == (10, Decimal("100.00"))
@@ -0,0 +1,97 @@
+import smtplib
+import uuid
+from datetime import datetime
+
+from flask_jwt_extended import create_access_token
+
+from app import db
+from app.models import User, OutboundEmail, InvitationToken
+from app.services.email_service import SmtpConnectionPool, deliver_pending_emails, queue_email, drain_outbox
+
+
+class FakeSMTP:
+    """Stand-in for smtplib.SMTP that records connections and delivered messages."""
+    connections = []
+    delivered = []
+    refuse = set()
+
+    def __init__(self, host, port, timeout=None):
+        self.logged_in = False
+        FakeSMTP.connections.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logged_in = True
+
+    def send_message(self, message):
+        if message['To'] in FakeSMTP.refuse:
+            raise smtplib.SMTPRecipientsRefused({message['To']: (550, b'No such user')})
+        FakeSMTP.delivered.append((message['To'], message['Subject']))
+
+    def noop(self):
+        return 250, b'OK'
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def fake_pool():
+    FakeSMTP.connections, FakeSMTP.delivered, FakeSMTP.refuse = [], [], set()
+    settings = {'host': 'localhost', 'port': 2525, 'user': 'mailer', 'password': 'secret',
+                'from_email': 'noreply@myduka.test', 'starttls': True}
+    return SmtpConnectionPool(settings, size=1, smtp_class=FakeSMTP)
+
+
+def test_invitation_request_only_queues_the_email(client, app):
+    app.config["EMAIL_OUTBOX_WORKER"] = False
+    with app.app_context():
+        merchant = User(name="Outbox Merchant", email=f"merchant_{uuid.uuid4()}@example.com",
+                        password="securepassword", role="merchant")
+        db.session.add(merchant)
+        db.session.commit()
+        token = create_access_token(identity=str(merchant.id))
+
+    response = client.post('/api/invitations/send', json={"email": "new.admin@example.com", "role": "admin"},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 201
+    assert response.get_json()["email_status"] == "queued"
+
+    with app.app_context():
+        invitation = InvitationToken.query.filter_by(email="new.admin@example.com").one()
+        queued = OutboundEmail.query.one()
+        assert queued.to_address == "new.admin@example.com"
+        assert queued.status == "pending"
+        assert invitation.token in queued.html_body
+
+
+def test_outbox_sends_batches_over_one_connection_and_backs_off_failures(app):
+    pool = fake_pool()
+    with app.app_context():
+        app.config["EMAIL_OUTBOX_MAX_ATTEMPTS"] = 2
+        for address in ("a@example.com", "b@example.com", "bounce@example.com", "c@example.com"):
+            queue_email(address, f"Hello {address}", "<p>Hi</p>")
+        db.session.commit()
+        FakeSMTP.refuse = {"bounce@example.com"}
+
+        assert deliver_pending_emails(pool, batch_size=2) == (2, 0)
+        assert drain_outbox(pool, batch_size=2) == (1, 1)
+        assert [to for to, _ in FakeSMTP.delivered] == ["a@example.com", "b@example.com", "c@example.com"]
+        assert len(FakeSMTP.connections) == 1 and FakeSMTP.connections[0].logged_in
+
+        bounced = OutboundEmail.query.filter_by(to_address="bounce@example.com").one()
+        assert (bounced.status, bounced.attempts) == ("pending", 1)
+        assert bounced.next_attempt_at > datetime.utcnow()
+        assert "No such user" in bounced.last_error
+        assert OutboundEmail.query.filter_by(status="sent").count() == 3
+
+        # Not due yet; once due, the last allowed attempt marks it failed
+        assert deliver_pending_emails(pool) == (0, 0)
+        bounced.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        assert deliver_pending_emails(pool) == (0, 1)
+        assert db.session.get(OutboundEmail, bounced.id).status == "failed"
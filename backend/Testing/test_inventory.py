@@ -205,6 +205,130 @@ def test_delete_product_not_found(client):
     response = client.delete(f'{INVENTORY_BASE_URL}/products/999999')
     assert response.status_code == 404
 
+def test_products_catalog_keyset_pages_and_etag(client):
+    """Test the paginated, filtered catalog listing and its ETag revalidation."""
+    cat = create_category_via_api(client, "Catalog Snacks")
+    other = create_category_via_api(client, "Catalog Tools")
+    for name in ("Crisps", "Biscuits", "Almonds", "Dates"):
+        create_product_via_api(client, name, cat['id'], "pcs", sku=f"CAT-{name.upper()}")
+    create_product_via_api(client, "Hammer", other['id'], "pcs", sku="CAT-HAMMER")
+
+    response = client.get(f'{INVENTORY_BASE_URL}/products',
+                          query_string={"category_id": cat['id'], "cursor": "", "per_page": 3})
+    assert response.status_code == 200
+    first = response.json
+    assert [p['name'] for p in first['products']] == ["Almonds", "Biscuits", "Crisps"]
+    assert first['products'][0]['category'] == "Catalog Snacks"
+    second = client.get(f'{INVENTORY_BASE_URL}/products',
+                        query_string={"category_id": cat['id'], "cursor": first['next_cursor'], "per_page": 3}).json
+    assert [p['name'] for p in second['products']] == ["Dates"]
+    assert second['next_cursor'] is None
+
+    search = client.get(f'{INVENTORY_BASE_URL}/products', query_string={"search": "cat-ham"}).json
+    assert [p['name'] for p in search] == ["Hammer"]
+    assert client.get(f'{INVENTORY_BASE_URL}/products', query_string={"cursor": "???"}).status_code == 400
+
+    response = client.get(f'{INVENTORY_BASE_URL}/products')
+    etag = response.headers['ETag']
+    assert etag and not etag.startswith('W/')
+    revalidated = client.get(f'{INVENTORY_BASE_URL}/products', headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+
+    # Any product change retires the tag
+    client.patch(f'{INVENTORY_BASE_URL}/products/{search[0]["id"]}', json={"name": "Claw Hammer"})
+    refreshed = client.get(f'{INVENTORY_BASE_URL}/products', headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers['ETag'] != etag
+    assert any(p['name'] == "Claw Hammer" for p in refreshed.json)
+
+def test_search_products_by_sku_and_name_prefix(client, app):
+    """Test typeahead search ranking, store stock details and index refresh."""
+    from app import db
+    from app.models import Store, StoreProduct
+
+    cat = create_category_via_api(client, "Search Drinks")
+    cola = create_product_via_api(client, "Coca-Cola 500ml", cat['id'], "pcs", sku="5449000000996")
+    create_product_via_api(client, "Cocoa Powder", cat['id'], "tin", sku="COC-001")
+    create_product_via_api(client, "Diet Cola", cat['id'], "pcs", sku="5449000131805")
+    with app.app_context():
+        store = Store(name="Search Store", address="2 Till Street")
+        db.session.add(store)
+        db.session.flush()
+        db.session.add(StoreProduct(store_id=store.id, product_id=cola['id'], quantity_in_stock=12, price=1.25))
+        db.session.commit()
+        store_id = store.id
+
+    response = client.get(f'{INVENTORY_BASE_URL}/search', query_string={"q": "5449000000996", "store_id": store_id})
+    assert response.status_code == 200
+    assert [(p['name'], p['price'], p['quantity_in_stock']) for p in response.json] == [("Coca-Cola 500ml", 1.25, 12)]
+
+    # SKU prefix matches rank before name matches; "cola" also matches a later word of a name
+    names = [p['name'] for p in client.get(f'{INVENTORY_BASE_URL}/search', query_string={"q": "coc"}).json]
+    assert names == ["Cocoa Powder", "Coca-Cola 500ml"]
+    names = [p['name'] for p in client.get(f'{INVENTORY_BASE_URL}/search', query_string={"q": "COLA"}).json]
+    assert names == ["Coca-Cola 500ml", "Diet Cola"]
+    assert len(client.get(f'{INVENTORY_BASE_URL}/search', query_string={"q": "5449", "limit": 1}).json) == 1
+    assert client.get(f'{INVENTORY_BASE_URL}/search', query_string={"q": ""}).json == []
+
+    # Product changes are visible to the next search
+    client.delete(f'{INVENTORY_BASE_URL}/products/{cola["id"]}')
+    create_product_via_api(client, "Cola Zero", cat['id'], "pcs", sku="5449000133328")
+    names = [p['name'] for p in client.get(f'{INVENTORY_BASE_URL}/search', query_string={"q": "cola"}).json]
+    assert names == ["Cola Zero", "Diet Cola"]
+
+def test_import_products_csv(client, app):
+    """Test bulk-importing products from CSV into a store, with per-row errors."""
+    from app import db
+    from app.models import Product, Store, StoreProduct
+
+    cat = create_category_via_api(client, "Import Drinks")
+    existing = create_product_via_api(client, "Old Cola Name", cat['id'], "pcs", sku="IMP-COLA")
+    with app.app_context():
+        store = Store(name="Import Store", address="1 Import Way")
+        db.session.add(store)
+        db.session.commit()
+        store_id = store.id
+
+    csv_body = (
+        "SKU,Name,Unit,Category,Price,Unit_Cost,Low_Stock_Threshold\n"
+        "IMP-COLA,Cola 500ml,pcs,import drinks,1.50,0.90,24\n"
+        "IMP-WATER,\"Water\n1L\",pcs,Import Drinks,0.80,0.30,\n"
+        "IMP-JUICE,Juice,pcs,Smoothies,2.00,1.00,5\n"
+        ",Nameless,pcs,,1.00,0.50,5\n"
+        "IMP-SODA,Soda,pcs,,abc,0.50,5\n"
+        "IMP-TEA,Tea,box,,3.00,2.00,5\n"
+    )
+    # The quoted name spans two lines; a batch size smaller than the file exercises the batch loop
+    app.config['PRODUCT_IMPORT_BATCH_SIZE'] = 2
+    response = client.post(f'{INVENTORY_BASE_URL}/products/import?store_id={store_id}',
+                           data=csv_body, content_type='text/csv')
+    assert response.status_code == 200
+    data = response.json
+    assert data['rows'] == 6
+    assert data['products'] == 3
+    assert data['store_products'] == 3
+    assert data['error_count'] == 3
+    assert [(error['line'], error['sku']) for error in data['errors']] == [(5, 'IMP-JUICE'), (6, None), (7, 'IMP-SODA')]
+
+    with app.app_context():
+        products = {product.sku: product for product in Product.query.filter(Product.sku.like('IMP-%'))}
+        assert set(products) == {'IMP-COLA', 'IMP-WATER', 'IMP-TEA'}
+        assert products['IMP-COLA'].id == existing['id']
+        assert products['IMP-COLA'].name == "Cola 500ml"
+        assert products['IMP-WATER'].category_id == cat['id']
+        assert products['IMP-WATER'].name == "Water\n1L"
+        stocked = {sp.product.sku: sp for sp in StoreProduct.query.filter_by(store_id=store_id)}
+        assert set(stocked) == set(products)
+        assert stocked['IMP-COLA'].low_stock_threshold == 24
+        assert stocked['IMP-WATER'].low_stock_threshold == 10
+        assert str(stocked['IMP-TEA'].price) == "3.00"
+        assert stocked['IMP-TEA'].quantity_in_stock == 0
+
+    # Without a store, a header lacking required columns is rejected up front
+    response = client.post(f'{INVENTORY_BASE_URL}/products/import', data="sku,name\nX,Y\n", content_type='text/csv')
+    assert response.status_code == 400
+
 # --- PURCHASE TESTS ---
 
 def test_create_purchase(client, app):
@@ -0,0 +1,53 @@
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import db
+from app.models import User, InvitationToken
+from app.services.invitation_services import sweep_invitation_tokens
+
+
+def test_sweeper_deletes_stale_tokens_in_batches_and_keeps_active_ones(app):
+    with app.app_context():
+        merchant = User(name="Sweep Merchant", email=f"sweep_{uuid.uuid4()}@example.com",
+                        password="securepassword", role="merchant")
+        db.session.add(merchant)
+        db.session.flush()
+        long_ago = datetime.utcnow() - timedelta(days=40)
+
+        active = InvitationToken("active@example.com", merchant.id)
+        recently_expired = InvitationToken("recent@example.com", merchant.id, expires_hours=-1)
+        stale = []
+        for i in range(5):
+            expired = InvitationToken(f"expired{i}@example.com", merchant.id)
+            expired.created_at, expired.expires_at = long_ago, long_ago + timedelta(hours=24)
+            stale.append(expired)
+        used = InvitationToken("used@example.com", merchant.id)
+        used.is_used, used.created_at = True, long_ago
+        cancelled = InvitationToken("cancelled@example.com", merchant.id)
+        cancelled.is_deleted, cancelled.created_at = True, long_ago
+        db.session.add_all([active, recently_expired, used, cancelled, *stale])
+        db.session.commit()
+
+        assert sweep_invitation_tokens(retention_days=30, batch_size=2) == 7
+        remaining = {invitation.email for invitation in InvitationToken.query.all()}
+        assert remaining == {"active@example.com", "recent@example.com"}
+        assert sweep_invitation_tokens(retention_days=30) == 0
+
+
+def test_invitation_lookups_use_the_lower_email_and_active_indexes(app):
+    with app.app_context():
+        connection = db.session.connection()
+
+        def plan(sql):
+            return " | ".join(row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+        assert "ix_invitation_tokens_lower_email" in plan(
+            "SELECT id FROM invitation_tokens WHERE lower(email) = 'a@example.com' "
+            "AND is_used = 0 AND is_deleted = 0"
+        )
+        assert "ix_invitation_tokens_active_user_id_created_at" in plan(
+            "SELECT id FROM invitation_tokens WHERE user_id = 1 AND is_used = 0 AND is_deleted = 0 "
+            "ORDER BY created_at DESC"
+        )
@@ -0,0 +1,82 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Store, Supplier, Product, StoreProduct
+from test_dashboard import count_queries
+
+
+@pytest.fixture
+def purchase_setup(app):
+    with app.app_context():
+        store = Store(name=f"Receiving Store {uuid.uuid4()}", address="4 Dock Lane")
+        supplier = Supplier(name=f"Supplier {uuid.uuid4()}")
+        products = [Product(name=f"Bulk {i}", sku=f"BK{uuid.uuid4().hex[:10]}", unit="pcs") for i in range(40)]
+        db.session.add_all([store, supplier, *products])
+        db.session.flush()
+        # Half the catalog is already stocked in the store
+        db.session.add_all([
+            StoreProduct(store_id=store.id, product_id=product.id, quantity_in_stock=5,
+                         unit_cost=Decimal("1.00"), price=Decimal("9.00"))
+            for product in products[:20]
+        ])
+        db.session.commit()
+        return {"store_id": store.id, "supplier_id": supplier.id, "product_ids": [p.id for p in products]}
+
+
+def stock_levels(app, store_id):
+    with app.app_context():
+        return {
+            sp.product_id: (sp.quantity_in_stock, sp.unit_cost, sp.price)
+            for sp in StoreProduct.query.filter_by(store_id=store_id)
+        }
+
+
+def test_create_purchase_receives_stock_in_one_statement(client, app, purchase_setup):
+    store_id, product_ids = purchase_setup["store_id"], purchase_setup["product_ids"]
+    items = [{"product_id": product_id, "quantity": 3, "unit_cost": 2.50} for product_id in product_ids]
+    # A repeated product is merged into one row with the latest cost
+    items.append({"product_id": product_ids[0], "quantity": 4, "unit_cost": 2.75})
+
+    with count_queries(app) as statements:
+        response = client.post('/purchases', json={
+            "supplier_id": purchase_setup["supplier_id"], "store_id": store_id, "purchase_items": items
+        })
+    assert response.status_code == 201
+    store_product_statements = [s.lstrip() for s in statements if "store_products" in s]
+    assert len(store_product_statements) == 1
+    assert store_product_statements[0].startswith("INSERT INTO store_products")
+
+    levels = stock_levels(app, store_id)
+    assert len(levels) == 40
+    assert levels[product_ids[0]] == (5 + 3 + 4, Decimal("2.75"), Decimal("9.00"))
+    assert levels[product_ids[1]] == (8, Decimal("2.50"), Decimal("9.00"))
+    assert levels[product_ids[-1]] == (3, Decimal("2.50"), Decimal("0.00"))
+
+
+def test_update_purchase_moves_stock_through_upsert(client, app, purchase_setup):
+    store_id, product_ids = purchase_setup["store_id"], purchase_setup["product_ids"]
+    purchase_id = client.post('/purchases', json={
+        "supplier_id": purchase_setup["supplier_id"], "store_id": store_id,
+        "purchase_items": [{"product_id": product_ids[0], "quantity": 10, "unit_cost": 2.00}]
+    }).get_json()["id"]
+
+    response = client.patch(f'/purchases/{purchase_id}', json={
+        "purchase_items": [{"product_id": product_ids[-1], "quantity": 6, "unit_cost": 3.00}]
+    })
+    assert response.status_code == 200
+
+    levels = stock_levels(app, store_id)
+    assert levels[product_ids[0]][0] == 5
+    assert levels[product_ids[-1]][:2] == (6, Decimal("3.00"))
+
+
+def test_store_products_are_unique_per_store_and_product(app, purchase_setup):
+    with app.app_context():
+        db.session.add(StoreProduct(store_id=purchase_setup["store_id"], product_id=purchase_setup["product_ids"][0]))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
@@ -0,0 +1,87 @@
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from app import db
+from app.models import Store, User, Product, StoreProduct, Sale, SaleItem
+
+
+@contextmanager
+def query_plans(app):
+    """
+    Collects (statement, EXPLAIN QUERY PLAN details) for every SELECT issued
+    inside the block, explained on the same connection with the same parameters.
+    """
+    captured = []
+    with app.app_context():
+        engine = db.engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    plans = []
+    try:
+        yield plans
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    with app.app_context():
+        connection = db.session.connection().connection
+        for statement, parameters in captured:
+            rows = connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            plans.append((statement, " | ".join(row[-1] for row in rows)))
+
+
+def plans_touching(plans, table):
+    return [plan for statement, plan in plans if f"FROM {table}" in statement]
+
+
+def seed_sales(app):
+    with app.app_context():
+        store = Store(name=f"Plan Store {uuid.uuid4()}", address="1 Index Road")
+        cashier = User(name="Plan Cashier", email=f"plan_{uuid.uuid4()}@example.com",
+                       password="securepassword", role="cashier")
+        product = Product(name="Plan Item", sku=f"PL{uuid.uuid4().hex[:10]}", unit="pcs")
+        db.session.add_all([store, cashier, product])
+        db.session.flush()
+        store_product = StoreProduct(store_id=store.id, product_id=product.id, quantity_in_stock=5, price=Decimal("3.00"))
+        db.session.add(store_product)
+        db.session.flush()
+        for _ in range(3):
+            sale = Sale(store_id=store.id, cashier_id=cashier.id, payment_status="paid")
+            db.session.add(sale)
+            db.session.flush()
+            db.session.add(SaleItem(sale_id=sale.id, store_product_id=store_product.id, quantity=1, price_at_sale=Decimal("3.00")))
+        db.session.commit()
+        return store.id
+
+
+def test_sales_listing_uses_sales_and_sale_item_indexes(client, app):
+    store_id = seed_sales(app)
+
+    with query_plans(app) as plans:
+        assert client.get('/sales', query_string={"store_id": store_id}).status_code == 200
+        assert client.get('/sales').status_code == 200
+
+    listing = [plan for statement, plan in plans if "FROM sales LEFT OUTER JOIN users" in statement and "LIMIT" in statement]
+    assert "ix_sales_store_id_is_deleted_created_at" in listing[0]
+    assert "ix_sales_live_created_at_id" in listing[1]
+    item_plans = plans_touching(plans, "sale_items")
+    assert item_plans and all("ix_sale_items_sale_id_is_deleted" in plan for plan in item_plans)
+
+
+def test_dashboard_trend_and_stock_view_use_store_indexes(client, app):
+    store_id = seed_sales(app)
+    app.extensions["dashboard_cache"].ttl = 0
+
+    with query_plans(app) as plans:
+        assert client.get('/dashboard/sales_trend_daily', query_string={"store_id": store_id}).status_code == 200
+        assert client.get(f'/api/inventory/stock/{store_id}').status_code == 200
+
+    trend = [plan for statement, plan in plans if "FROM sales JOIN sale_items" in statement]
+    assert trend and "ix_sales_store_id_is_deleted_created_at" in trend[0]
+    stock = [plan for statement, plan in plans if "FROM store_products JOIN products" in statement]
+    assert stock and "USING INDEX ix_store_products_" in stock[0]
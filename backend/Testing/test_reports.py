@@ -383,4 +383,113 @@
 #     assert response.json == []
 
 #     response = client.get(f'/reports/top-products/{store_id}')
-#     assert response.status_code == 401
\ No newline at end of file
+#     assert response.status_code == 401
+
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import Store, User, Product, StoreProduct, DailyStoreProductSales
+from services.reporting_services import get_daily_summary, get_monthly_summary, get_top_products
+
+
+@pytest.fixture
+def rollup_data(app):
+    """A store and cashier with two stocked products; returns their IDs."""
+    with app.app_context():
+        store = Store(name=f"Rollup Store {uuid.uuid4()}", address="2 Ledger Road")
+        db.session.add(store)
+        db.session.commit()
+
+        cashier = User(
+            name="Rollup Cashier",
+            email=f"rollup_{uuid.uuid4()}@example.com",
+            password="securepassword",
+            role="cashier",
+            store_id=store.id
+        )
+        products = [
+            Product(name=name, sku=f"{name[:3].upper()}{uuid.uuid4().hex[:6]}", unit="pcs")
+            for name in ("Sugar", "Salt")
+        ]
+        db.session.add(cashier)
+        db.session.add_all(products)
+        db.session.commit()
+
+        store_products = [
+            StoreProduct(store_id=store.id, product_id=product.id, quantity_in_stock=100, price=Decimal(price))
+            for product, price in zip(products, ("120.00", "40.00"))
+        ]
+        db.session.add_all(store_products)
+        db.session.commit()
+
+        return {
+            "store_id": store.id,
+            "cashier_id": cashier.id,
+            "product_ids": [product.id for product in products],
+            "store_product_ids": [sp.id for sp in store_products]
+        }
+
+
+def _sale(data, lines, created_at=None):
+    sale = {
+        "store_id": data["store_id"],
+        "cashier_id": data["cashier_id"],
+        "payment_status": "paid",
+        "sale_items": [{"store_product_id": sp_id, "quantity": qty} for sp_id, qty in lines]
+    }
+    if created_at:
+        sale["created_at"] = created_at.isoformat()
+    return sale
+
+
+def test_rollups_follow_sale_create_update_and_delete(client, app, rollup_data):
+    sugar_sp, salt_sp = rollup_data["store_product_ids"]
+    store_id = rollup_data["store_id"]
+
+    sale_id = client.post('/sales', json=_sale(rollup_data, [(sugar_sp, 2), (salt_sp, 1)])).get_json()["sale_id"]
+    last_month = datetime.utcnow() - timedelta(days=40)
+    response = client.post('/sales/batch', json=[_sale(rollup_data, [(salt_sp, 5)], last_month)])
+    assert response.get_json()["created"] == 1
+
+    with app.app_context():
+        daily = get_daily_summary(store_id)
+        assert daily["total_quantity_sold"] == 3
+        assert daily["total_revenue"] == 280.0
+        assert get_top_products(store_id)["top_products"] == [
+            {"product": "Salt", "quantity_sold": 6},
+            {"product": "Sugar", "quantity_sold": 2}
+        ]
+
+    with app.app_context():
+        item_ids = {
+            item.store_product_id: item.id
+            for item in db.session.get(StoreProduct, sugar_sp).sale_items
+        }
+    response = client.patch(f'/sales/{sale_id}', json={"sale_items": [{"id": item_ids[sugar_sp], "quantity": 3}]})
+    assert response.status_code == 200
+    with app.app_context():
+        daily = get_daily_summary(store_id)
+        assert daily["total_quantity_sold"] == 3
+        assert daily["total_revenue"] == 360.0
+
+    client.delete(f'/sales/{sale_id}')
+    with app.app_context():
+        assert get_daily_summary(store_id)["total_quantity_sold"] == 0
+        assert get_monthly_summary(store_id)["total_revenue"] == 0.0
+        incremental = sorted(
+            (row.sale_date, row.product_id, row.quantity, float(row.revenue))
+            for row in DailyStoreProductSales.query.filter_by(store_id=store_id) if row.quantity
+        )
+
+    result = app.test_cli_runner().invoke(args=["reports", "backfill"])
+    assert "Wrote" in result.output
+    with app.app_context():
+        rebuilt = sorted(
+            (row.sale_date, row.product_id, row.quantity, float(row.revenue))
+            for row in DailyStoreProductSales.query.filter_by(store_id=store_id)
+        )
+    assert rebuilt == incremental == [(last_month.date(), rollup_data["product_ids"][1], 5, 200.0)]
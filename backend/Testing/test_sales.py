@@ -3,6 +3,8 @@ from decimal import Decimal
 from app import db
 from app.models import Store, User, Product, StoreProduct, Sale, SaleItem
 import uuid # Import uuid for generating unique IDs
+import json
+from datetime import datetime
 
 @pytest.fixture(scope='function') # Explicitly setting scope for clarity, though 'function' is default
 def setup_data(app): # Add 'app' fixture dependency to access app context if needed
@@ -215,4 +217,371 @@ def test_sale_soft_delete_and_recalculate_total(client, setup_data):
     remaining_items = [item for item in updated_sale.sale_items if not item.is_deleted]
     expected_total = sum(item.price_at_sale * item.quantity for item in remaining_items)
 
-    assert updated_sale.total == expected_total
\ No newline at end of file
+    assert updated_sale.total == expected_total
+
+@pytest.fixture
+def checkout_data(app):
+    """Creates a store, a cashier and three stocked store products; returns their IDs."""
+    with app.app_context():
+        store = Store(name=f"Checkout Store {uuid.uuid4()}", address="1 Till Lane")
+        db.session.add(store)
+        db.session.commit()
+
+        cashier = User(
+            name="Till Cashier",
+            email=f"till_{uuid.uuid4()}@example.com",
+            password="securepassword",
+            role="cashier",
+            store_id=store.id
+        )
+        products = [
+            Product(name=name, sku=f"{name[:3].upper()}{uuid.uuid4().hex[:6]}", unit="pcs")
+            for name in ("Bread", "Milk", "Eggs")
+        ]
+        db.session.add(cashier)
+        db.session.add_all(products)
+        db.session.commit()
+
+        store_products = [
+            StoreProduct(store_id=store.id, product_id=product.id, quantity_in_stock=stock, price=Decimal(price))
+            for product, stock, price in zip(products, (10, 5, 2), ("60.00", "55.00", "15.00"))
+        ]
+        db.session.add_all(store_products)
+        db.session.commit()
+
+        return {
+            "store_id": store.id,
+            "cashier_id": cashier.id,
+            "store_product_ids": [sp.id for sp in store_products]
+        }
+
+
+def test_checkout_decrements_all_lines(client, app, checkout_data):
+    bread_id, milk_id, eggs_id = checkout_data["store_product_ids"]
+
+    response = client.post("/sales", json={
+        "cashier_id": checkout_data["cashier_id"],
+        "store_id": checkout_data["store_id"],
+        "payment_status": "paid",
+        "sale_items": [
+            {"store_product_id": bread_id, "quantity": 3},
+            {"store_product_id": milk_id, "quantity": 5},
+            {"store_product_id": bread_id, "quantity": 2}
+        ]
+    })
+
+    assert response.status_code == 201
+    assert response.get_json()["total"] == 5 * 60.0 + 5 * 55.0
+
+    with app.app_context():
+        assert db.session.get(StoreProduct, bread_id).quantity_in_stock == 5
+        assert db.session.get(StoreProduct, milk_id).quantity_in_stock == 0
+        assert db.session.get(StoreProduct, eggs_id).quantity_in_stock == 2
+
+
+def test_checkout_reports_every_short_line(client, app, checkout_data):
+    bread_id, milk_id, eggs_id = checkout_data["store_product_ids"]
+
+    response = client.post("/sales", json={
+        "cashier_id": checkout_data["cashier_id"],
+        "store_id": checkout_data["store_id"],
+        "payment_status": "paid",
+        "sale_items": [
+            {"store_product_id": bread_id, "quantity": 1},
+            {"store_product_id": milk_id, "quantity": 6},
+            {"store_product_id": eggs_id, "quantity": 3}
+        ]
+    })
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert "Not enough stock" in data["error"]
+    assert {s["store_product_id"] for s in data["shortages"]} == {milk_id, eggs_id}
+
+    with app.app_context():
+        # Nothing is taken when any line is short
+        assert db.session.get(StoreProduct, bread_id).quantity_in_stock == 10
+        assert db.session.query(Sale).count() == 0
+
+
+def test_decrement_race_reports_only_short_lines_with_untouched_levels(app, checkout_data):
+    from sqlalchemy import update
+    from app.errors import StockShortageError
+    from app.services.stock_services import load_store_products, decrement_stock
+
+    bread_id, milk_id, _ = checkout_data["store_product_ids"]
+    with app.app_context():
+        store_products = load_store_products(checkout_data["store_id"], [bread_id, milk_id])
+        # Another sale takes milk after the levels were loaded
+        db.session.execute(
+            update(StoreProduct).where(StoreProduct.id == milk_id).values(quantity_in_stock=3),
+            execution_options={"synchronize_session": False}
+        )
+
+        with pytest.raises(StockShortageError) as shortage:
+            decrement_stock(store_products, {bread_id: 6, milk_id: 4})
+        assert shortage.value.payload["shortages"] == [{
+            "store_product_id": milk_id,
+            "product_name": "Milk",
+            "available_stock": 3,
+            "requested_quantity": 4
+        }]
+        db.session.rollback()
+
+
+def test_batch_sales_reports_per_sale_results(client, app, checkout_data):
+    bread_id, milk_id, eggs_id = checkout_data["store_product_ids"]
+    sale = {
+        "cashier_id": checkout_data["cashier_id"],
+        "store_id": checkout_data["store_id"],
+        "payment_status": "paid"
+    }
+
+    response = client.post("/sales/batch", json=[
+        {**sale, "sale_items": [{"store_product_id": bread_id, "quantity": 4}], "created_at": "2025-01-31T18:05:00"},
+        {**sale, "sale_items": [{"store_product_id": eggs_id, "quantity": 3}]},
+        {**sale, "sale_items": [{"store_product_id": bread_id, "quantity": 6}, {"store_product_id": eggs_id, "quantity": 2}]},
+        {**sale, "sale_items": [{"store_product_id": bread_id, "quantity": 1}]},
+        {**sale, "payment_status": "later", "sale_items": [{"store_product_id": milk_id, "quantity": 1}]}
+    ])
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["created"] == 2
+    assert [r["status"] for r in data["results"]] == ["created", "failed", "created", "failed", "failed"]
+    assert "Not enough stock" in data["results"][3]["error"]
+
+    with app.app_context():
+        assert db.session.get(StoreProduct, bread_id).quantity_in_stock == 0
+        assert db.session.get(StoreProduct, eggs_id).quantity_in_stock == 0
+        assert db.session.get(StoreProduct, milk_id).quantity_in_stock == 5
+        first_sale = db.session.get(Sale, data["results"][0]["sale_id"])
+        assert first_sale.created_at.isoformat() == "2025-01-31T18:05:00"
+        assert first_sale.total == Decimal("240.00")
+
+
+def test_batch_sales_rejects_malformed_items_per_sale(client, app, checkout_data):
+    bread_id = checkout_data["store_product_ids"][0]
+    sale = {
+        "cashier_id": checkout_data["cashier_id"],
+        "store_id": checkout_data["store_id"],
+        "payment_status": "paid"
+    }
+
+    response = client.post("/sales/batch", json=[
+        {**sale, "sale_items": ["bread"]},
+        {**sale, "sale_items": [{"store_product_id": "bread", "quantity": 1}]},
+        {**sale, "sale_items": [{"store_product_id": bread_id, "quantity": "lots"}]},
+        {**sale, "sale_items": [{"store_product_id": bread_id, "quantity": 2}]}
+    ])
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["status"] for r in results] == ["failed", "failed", "failed", "created"]
+    assert results[0]["error"] == "Each sale item must be an object."
+    assert results[1]["error"] == "'store_product_id' for a sale item must be an integer."
+    assert results[2]["error"] == "Quantity for a sale item must be a valid number."
+
+    response = client.post("/sales", json={**sale, "sale_items": [42]})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Each sale item must be an object."
+
+
+def test_batch_sales_accepts_ndjson(client, checkout_data):
+    milk_id = checkout_data["store_product_ids"][1]
+    line = json.dumps({
+        "cashier_id": checkout_data["cashier_id"],
+        "store_id": checkout_data["store_id"],
+        "payment_status": "unpaid",
+        "sale_items": [{"store_product_id": milk_id, "quantity": 1}]
+    })
+
+    response = client.post(
+        "/sales/batch",
+        data="\n".join([line, "{not json", line]),
+        content_type="application/x-ndjson"
+    )
+
+    assert response.status_code == 200
+    assert [r["status"] for r in response.get_json()["results"]] == ["created", "failed", "created"]
+
+
+def test_idempotency_key_replays_original_sale(client, app, checkout_data):
+    bread_id = checkout_data["store_product_ids"][0]
+    payload = {
+        "cashier_id": checkout_data["cashier_id"],
+        "store_id": checkout_data["store_id"],
+        "payment_status": "paid",
+        "sale_items": [{"store_product_id": bread_id, "quantity": 2}]
+    }
+    headers = {"Idempotency-Key": f"till-1-{uuid.uuid4()}"}
+
+    first = client.post("/sales", json=payload, headers=headers)
+    retry = client.post("/sales", json=payload, headers=headers)
+
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    assert retry.get_json()["sale_id"] == first.get_json()["sale_id"]
+
+    with app.app_context():
+        assert db.session.get(StoreProduct, bread_id).quantity_in_stock == 8
+        assert db.session.query(Sale).count() == 1
+
+    changed = client.post("/sales", json={**payload, "payment_status": "unpaid"}, headers=headers)
+    assert changed.status_code == 409
+
+
+def test_batch_sales_skip_replayed_idempotency_keys(client, app, checkout_data):
+    bread_id = checkout_data["store_product_ids"][0]
+    sale = {
+        "cashier_id": checkout_data["cashier_id"],
+        "store_id": checkout_data["store_id"],
+        "payment_status": "paid",
+        "sale_items": [{"store_product_id": bread_id, "quantity": 1}],
+        "idempotency_key": f"offline-{uuid.uuid4()}"
+    }
+
+    first = client.post("/sales/batch", json=[sale, sale]).get_json()
+    replay = client.post("/sales/batch", json=[sale]).get_json()
+
+    assert first["results"][1]["sale_id"] == first["results"][0]["sale_id"]
+    assert replay["results"][0]["replayed"] is True
+    assert replay["results"][0]["sale_id"] == first["results"][0]["sale_id"]
+    with app.app_context():
+        assert db.session.get(StoreProduct, bread_id).quantity_in_stock == 9
+
+
+def test_sales_cursor_pagination_walks_every_sale_once(client, checkout_data):
+    bread_id = checkout_data["store_product_ids"][0]
+    # Identical timestamps make the id tie-breaker do the work
+    created_at = datetime.utcnow().replace(microsecond=0).isoformat()
+    sales = [
+        {
+            "store_id": checkout_data["store_id"],
+            "cashier_id": checkout_data["cashier_id"],
+            "payment_status": "paid",
+            "created_at": created_at,
+            "sale_items": [{"store_product_id": bread_id, "quantity": 1}]
+        }
+        for _ in range(5)
+    ]
+    response = client.post('/sales/batch', json=sales)
+    assert response.status_code == 200
+    created_ids = sorted((r["sale_id"] for r in response.get_json()["results"]), reverse=True)
+
+    seen, cursor = [], ""
+    for _ in range(5):
+        response = client.get('/sales', query_string={
+            "store_id": checkout_data["store_id"], "per_page": 2, "cursor": cursor
+        })
+        assert response.status_code == 200
+        body = response.get_json()
+        assert "total" not in body
+        seen.extend(sale["id"] for sale in body["sales"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == created_ids
+
+    response = client.get('/sales', query_string={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_sales_listing_search_returns_each_sale_once(client, checkout_data):
+    bread_id, milk_id, eggs_id = checkout_data["store_product_ids"]
+    response = client.post('/sales', json={
+        "store_id": checkout_data["store_id"],
+        "cashier_id": checkout_data["cashier_id"],
+        "payment_status": "paid",
+        "sale_items": [
+            {"store_product_id": bread_id, "quantity": 1},
+            {"store_product_id": bread_id, "quantity": 2},
+            {"store_product_id": milk_id, "quantity": 1}
+        ]
+    })
+    assert response.status_code == 201
+    sale_id = response.get_json()["sale_id"]
+
+    response = client.get('/sales', query_string={"store_id": checkout_data["store_id"], "search": "bread"})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["total"] == 1
+    [sale] = body["sales"]
+    assert sale["id"] == sale_id
+    assert sale["total"] == 235.0
+    assert sale["cashier"] == {"name": "Till Cashier"}
+    assert [item["product_name"] for item in sale["sale_items"]] == ["Bread", "Bread", "Milk"]
+
+    response = client.get('/sales', query_string={"store_id": checkout_data["store_id"], "search": "eggs"})
+    assert response.get_json()["sales"] == []
+
+
+def test_sales_search_document_follows_updates(client, app, checkout_data):
+    bread_id, milk_id, _ = checkout_data["store_product_ids"]
+    response = client.post('/sales', json={
+        "store_id": checkout_data["store_id"],
+        "cashier_id": checkout_data["cashier_id"],
+        "payment_status": "paid",
+        "sale_items": [
+            {"store_product_id": bread_id, "quantity": 1},
+            {"store_product_id": milk_id, "quantity": 1}
+        ]
+    })
+    sale_id = response.get_json()["sale_id"]
+
+    def search(term):
+        response = client.get('/sales', query_string={"store_id": checkout_data["store_id"], "search": term})
+        return [sale["id"] for sale in response.get_json()["sales"]]
+
+    assert search("MILK") == [sale_id]
+    assert search("till cash") == [sale_id]
+    assert search("Checkout Store") == [sale_id]
+
+    with app.app_context():
+        milk_item = SaleItem.query.filter_by(sale_id=sale_id, store_product_id=milk_id).one()
+        bread_item = SaleItem.query.filter_by(sale_id=sale_id, store_product_id=bread_id).one()
+        bread_item_id = bread_item.id
+    response = client.patch(f'/sales/{sale_id}', json={
+        "sale_items": [{"id": bread_item_id, "quantity": 1}]
+    })
+    assert response.status_code == 200
+    assert search("milk") == []
+    assert search("bread") == [sale_id]
+
+    # A rebuild regenerates the same documents
+    result = app.test_cli_runner().invoke(args=["search", "rebuild"])
+    assert "Indexed" in result.output
+    assert search("bread") == [sale_id]
+
+    client.delete(f'/sales/{sale_id}')
+    assert search("bread") == []
+
+
+def test_sales_export_streams_filtered_sales_as_csv_and_ndjson(client, checkout_data):
+    bread_id, milk_id, _ = checkout_data["store_product_ids"]
+    sale = {"store_id": checkout_data["store_id"], "cashier_id": checkout_data["cashier_id"], "payment_status": "paid"}
+    response = client.post('/sales/batch', json=[
+        {**sale, "sale_items": [{"store_product_id": bread_id, "quantity": 1}, {"store_product_id": milk_id, "quantity": 2}]},
+        {**sale, "sale_items": [{"store_product_id": milk_id, "quantity": 1}]},
+    ])
+    assert response.get_json()["created"] == 2
+
+    response = client.get('/sales/export', query_string={"store_id": checkout_data["store_id"]})
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "text/csv"
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0].startswith("sale_id,created_at,store_id,store_name")
+    assert len(lines) == 1 + 3
+    assert sorted(line.split(",")[8] for line in lines[1:]) == ["Bread", "Milk", "Milk"]
+
+    response = client.get('/sales/export', query_string={"store_id": checkout_data["store_id"], "format": "ndjson"})
+    exported = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    listed = client.get('/sales', query_string={"store_id": checkout_data["store_id"]}).get_json()["sales"]
+    assert exported == listed
+
+    assert client.get('/sales/export', query_string={"store_id": 999999}).get_data(as_text=True).count("\n") == 1
+    assert client.get('/sales/export', query_string={"format": "xml"}).status_code == 400
+    assert client.get('/sales/export', query_string={"start_date": "yesterday"}).status_code == 400
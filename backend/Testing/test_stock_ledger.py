@@ -0,0 +1,140 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import update
+
+from app import db
+from app.models import Store, User, Supplier, Product, StoreProduct, StockMovement, StockTransfer, StockTransferItem
+from app.services.stock_services import transfer_stock
+
+
+def seed_store(app):
+    with app.app_context():
+        store = Store(name=f"Ledger Store {uuid.uuid4()}", address="5 Tally Street")
+        other = Store(name=f"Ledger Branch {uuid.uuid4()}", address="6 Tally Street")
+        supplier = Supplier(name=f"Supplier {uuid.uuid4()}")
+        products = [Product(name=f"Ledger {i}", sku=f"LG{uuid.uuid4().hex[:10]}", unit="pcs") for i in range(2)]
+        db.session.add_all([store, other, supplier, *products])
+        db.session.flush()
+        cashier = User(name="Ledger Cashier", email=f"ledger_{uuid.uuid4()}@example.com",
+                       password="securepassword", role="cashier", store_id=store.id)
+        db.session.add(cashier)
+        db.session.add_all([
+            StoreProduct(store_id=store.id, product_id=product.id, quantity_in_stock=20, price=Decimal("5.00"))
+            for product in products
+        ])
+        db.session.commit()
+        store_products = {sp.product_id: sp.id for sp in StoreProduct.query.filter_by(store_id=store.id)}
+        return {
+            "store_id": store.id, "other_id": other.id, "supplier_id": supplier.id, "cashier_id": cashier.id,
+            "product_ids": [product.id for product in products], "store_products": store_products,
+        }
+
+
+def levels_at(client, store_id, at):
+    response = client.get(f'/api/inventory/stock/{store_id}/as-of', query_string={"at": at.isoformat()})
+    assert response.status_code == 200
+    body = response.get_json()
+    return {item["product_id"]: item["quantity_in_stock"] for item in body["items"]}, body["snapshot_taken_at"]
+
+
+def test_every_stock_change_is_recorded_and_replayable(client, app):
+    seed = seed_store(app)
+    store_id, (first, second) = seed["store_id"], seed["product_ids"]
+
+    result = app.test_cli_runner().invoke(args=["stock", "snapshot", "--store-id", str(store_id)])
+    assert "Wrote 2 stock snapshot rows." in result.output
+    opening = datetime.utcnow()
+
+    sale_id = client.post('/sales', json={
+        "store_id": store_id, "cashier_id": seed["cashier_id"], "payment_status": "paid",
+        "sale_items": [{"store_product_id": seed["store_products"][first], "quantity": 3}]
+    }).get_json()["sale_id"]
+    purchase_id = client.post('/purchases', json={
+        "supplier_id": seed["supplier_id"], "store_id": store_id,
+        "purchase_items": [{"product_id": second, "quantity": 7, "unit_cost": 2.0}]
+    }).get_json()["id"]
+    after_sale_and_purchase = datetime.utcnow()
+
+    assert client.delete(f'/sales/{sale_id}').status_code == 200
+    assert client.delete(f'/purchases/{purchase_id}').status_code == 200
+    with app.app_context():
+        transfer = StockTransfer(from_store_id=store_id, to_store_id=seed["other_id"])
+        db.session.add(transfer)
+        db.session.flush()
+        db.session.add(StockTransferItem(stock_transfer_id=transfer.id, product_id=first, quantity=4))
+        transfer_stock(store_id, seed["other_id"], {first: 4}, reference_id=transfer.id)
+        db.session.commit()
+
+        reasons = [(m.product_id, m.quantity_change, m.reason) for m in
+                   StockMovement.query.filter_by(store_id=store_id).order_by(StockMovement.id)]
+    assert reasons[-5:] == [
+        (first, -3, "sale"), (second, 7, "purchase"), (first, 3, "sale_void"),
+        (second, -7, "purchase_void"), (first, -4, "transfer_out"),
+    ]
+
+    levels, snapshot_taken_at = levels_at(client, store_id, opening)
+    assert levels == {first: 20, second: 20} and snapshot_taken_at is not None
+    assert levels_at(client, store_id, after_sale_and_purchase)[0] == {first: 17, second: 27}
+    assert levels_at(client, store_id, datetime.utcnow())[0] == {first: 16, second: 20}
+    assert levels_at(client, seed["other_id"], datetime.utcnow())[0] == {first: 4}
+
+    assert client.get(f'/api/inventory/stock/{store_id}/reconcile').get_json()["discrepancies"] == []
+
+
+def test_reconcile_reports_changes_that_bypassed_the_ledger(client, app):
+    seed = seed_store(app)
+    store_id, first = seed["store_id"], seed["product_ids"][0]
+    with app.app_context():
+        db.session.execute(
+            update(StoreProduct).where(StoreProduct.id == seed["store_products"][first]).values(quantity_in_stock=12)
+        )
+        db.session.commit()
+
+    assert client.get(f'/api/inventory/stock/{store_id}/reconcile').get_json()["discrepancies"] == [
+        {"product_id": first, "ledger_quantity": 20, "quantity_in_stock": 12, "difference": -8}
+    ]
+    assert client.get(f'/api/inventory/stock/{store_id}/as-of', query_string={"at": "yesterday"}).status_code == 400
+
+
+def test_replay_follows_commit_order_not_flush_time(app):
+    """
+    A movement stamped before a snapshot's taken_at but committed after the
+    snapshot read stock, and one stamped after taken_at but committed before,
+    are each counted exactly once.
+    """
+    from datetime import timedelta
+    from app.models import StockSnapshot
+    from app.services.ledger_services import take_stock_snapshots, stock_as_of, reconcile_stock
+
+    seed = seed_store(app)
+    store_id, (first, second) = seed["store_id"], seed["product_ids"]
+    with app.app_context():
+        take_stock_snapshots([store_id])
+        first_taken_at = db.session.query(db.func.max(StockSnapshot.taken_at)).scalar()
+
+        # Flushed before the snapshot's taken_at, committed only after the snapshot
+        db.session.get(StoreProduct, seed["store_products"][first]).quantity_in_stock = 15
+        db.session.flush()
+        db.session.execute(
+            update(StockMovement).where(StockMovement.store_id == store_id, StockMovement.quantity_change == -5)
+            .values(created_at=first_taken_at - timedelta(seconds=1))
+        )
+        db.session.commit()
+        assert reconcile_stock(store_id) == []
+
+        # Committed before the snapshot read stock, but stamped after its taken_at
+        db.session.get(StoreProduct, seed["store_products"][second]).quantity_in_stock = 26
+        db.session.commit()
+        take_stock_snapshots([store_id])
+        second_taken_at = db.session.query(db.func.max(StockSnapshot.taken_at)).scalar()
+        db.session.execute(
+            update(StockMovement).where(StockMovement.store_id == store_id, StockMovement.quantity_change == 6)
+            .values(created_at=second_taken_at + timedelta(seconds=1))
+        )
+        db.session.commit()
+
+        assert reconcile_stock(store_id) == []
+        levels, taken_at = stock_as_of(store_id, second_taken_at + timedelta(seconds=2))
+        assert levels == {first: 15, second: 26} and taken_at == second_taken_at
@@ -876,3 +876,107 @@
 #     response = client.patch(f"/api/store/stock-transfers/{transfer.id}/approve", headers=headers_clerk)
 #     assert response.status_code == 403, f"Expected 403 but got {response.status_code}. Response: {response.json}"
 
+
+
+import uuid
+from decimal import Decimal
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import db
+from app.models import User, Store, Product, StoreProduct, StockTransfer, StockTransferItem
+
+
+@pytest.fixture
+def transfer_setup(app):
+    """Two stores, an admin, and three products stocked only in the source store."""
+    with app.app_context():
+        source = Store(name="Source Branch", address="1 Depot Road")
+        destination = Store(name="Destination Branch", address="2 Depot Road")
+        db.session.add_all([source, destination])
+        db.session.flush()
+        admin = User(name="Transfer Admin", email=f"admin_{uuid.uuid4()}@example.com",
+                     password="securepassword", role="admin", store_id=source.id)
+        products = [Product(name=f"Transfer {i}", sku=f"TR{uuid.uuid4().hex[:10]}", unit="pcs") for i in range(3)]
+        db.session.add_all([admin, *products])
+        db.session.flush()
+        db.session.add_all([
+            StoreProduct(store_id=source.id, product_id=product.id, quantity_in_stock=10,
+                         unit_cost=Decimal("4.00"), price=Decimal("6.00"))
+            for product in products
+        ])
+        # The destination already stocks the first product
+        db.session.add(StoreProduct(store_id=destination.id, product_id=products[0].id,
+                                    quantity_in_stock=1, unit_cost=Decimal("5.00"), price=Decimal("8.00")))
+        db.session.commit()
+        return {
+            "source_id": source.id,
+            "destination_id": destination.id,
+            "product_ids": [product.id for product in products],
+            "headers": {"Authorization": f"Bearer {create_access_token(identity=str(admin.id))}"},
+            "admin_id": admin.id,
+        }
+
+
+def create_transfer(app, setup, lines):
+    with app.app_context():
+        transfer = StockTransfer(from_store_id=setup["source_id"], to_store_id=setup["destination_id"],
+                                 initiated_by=setup["admin_id"])
+        db.session.add(transfer)
+        db.session.flush()
+        db.session.add_all([
+            StockTransferItem(stock_transfer_id=transfer.id, product_id=product_id, quantity=quantity)
+            for product_id, quantity in lines
+        ])
+        db.session.commit()
+        return transfer.id
+
+
+def stock(app, store_id, product_id):
+    with app.app_context():
+        store_product = StoreProduct.query.filter_by(store_id=store_id, product_id=product_id).first()
+        return (store_product.quantity_in_stock, store_product.unit_cost, store_product.price) if store_product else None
+
+
+def test_approving_a_transfer_moves_its_stock(client, app, transfer_setup):
+    first, second, third = transfer_setup["product_ids"]
+    transfer_id = create_transfer(app, transfer_setup, [(first, 4), (second, 10), (first, 1)])
+
+    response = client.patch(f'/api/store/stock-transfers/{transfer_id}/approve', headers=transfer_setup["headers"])
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "approved"
+
+    source, destination = transfer_setup["source_id"], transfer_setup["destination_id"]
+    assert stock(app, source, first)[0] == 5
+    assert stock(app, source, second)[0] == 0
+    assert stock(app, source, third)[0] == 10
+    # Existing destination rows keep their own cost and price; new ones take the source's
+    assert stock(app, destination, first) == (6, Decimal("5.00"), Decimal("8.00"))
+    assert stock(app, destination, second) == (10, Decimal("4.00"), Decimal("6.00"))
+    assert stock(app, destination, third) is None
+
+    with app.app_context():
+        assert db.session.get(StockTransfer, transfer_id).status == "approved"
+
+
+def test_transfer_shortages_are_reported_together_and_nothing_moves(client, app, transfer_setup):
+    first, second, third = transfer_setup["product_ids"]
+    with app.app_context():
+        unstocked = Product(name="Never Stocked", sku=f"NS{uuid.uuid4().hex[:10]}", unit="pcs")
+        db.session.add(unstocked)
+        db.session.commit()
+        unstocked_id = unstocked.id
+    transfer_id = create_transfer(app, transfer_setup, [(first, 3), (second, 11), (third, 12), (unstocked_id, 1)])
+
+    response = client.patch(f'/api/store/stock-transfers/{transfer_id}/approve', headers=transfer_setup["headers"])
+    assert response.status_code == 400
+    shortages = response.get_json()["shortages"]
+    assert {(s["product_id"], s["available_stock"], s["requested_quantity"]) for s in shortages} == {
+        (second, 10, 11), (third, 10, 12), (unstocked_id, 0, 1)
+    }
+
+    assert stock(app, transfer_setup["source_id"], first)[0] == 10
+    assert stock(app, transfer_setup["destination_id"], first)[0] == 1
+    with app.app_context():
+        assert db.session.get(StockTransfer, transfer_id).status == "pending"
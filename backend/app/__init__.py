@@ -20,6 +20,10 @@ swagger = Swagger()
 
 # Import the registration function for error handlers
 from app.error_handlers import register_error_handlers
+from app.commands import register_commands
+from app.cache import init_dashboard_cache
+from app.auth.principal import init_principal_cache
+from app.auth.utils import init_password_hashing
 
 def create_app():
     app = Flask(__name__)
@@ -30,6 +34,23 @@ def create_app():
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "super-secret-dev-key")
     app.config["DEBUG"] = os.getenv("FLASK_DEBUG", "False").lower() in ('true', '1', 't')
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = False
+    app.config["DASHBOARD_CACHE_TTL"] = int(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+    app.config["DASHBOARD_CACHE_MAX_ENTRIES"] = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "1024"))
+    app.config["DASHBOARD_CACHE_REDIS_URL"] = os.getenv("DASHBOARD_CACHE_REDIS_URL")
+    app.config["DASHBOARD_BOOTSTRAP_WORKERS"] = int(os.getenv("DASHBOARD_BOOTSTRAP_WORKERS", "1"))
+    app.config["PRINCIPAL_CACHE_TTL"] = int(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+    app.config["TOKEN_VERSION_POLL_SECONDS"] = int(os.getenv("TOKEN_VERSION_POLL_SECONDS", "5"))
+    app.config["ARGON2_TIME_COST"] = int(os.getenv("ARGON2_TIME_COST", "3"))
+    app.config["ARGON2_MEMORY_COST"] = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+    app.config["ARGON2_PARALLELISM"] = int(os.getenv("ARGON2_PARALLELISM", "4"))
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    app.config["PASSWORD_HASH_QUEUE_SIZE"] = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "8"))
+    app.config["PASSWORD_HASH_RETRY_AFTER"] = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "2"))
+    app.config["EMAIL_OUTBOX_WORKER"] = os.getenv("EMAIL_OUTBOX_WORKER", "True").lower() in ('true', '1', 't')
+    app.config["EMAIL_OUTBOX_BATCH_SIZE"] = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+    app.config["EMAIL_OUTBOX_MAX_ATTEMPTS"] = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "6"))
+    app.config["EMAIL_OUTBOX_BACKOFF_SECONDS"] = int(os.getenv("EMAIL_OUTBOX_BACKOFF_SECONDS", "30"))
+    app.config["EMAIL_OUTBOX_POLL_SECONDS"] = int(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "10"))
 
     # Flasgger configuration
     app.config['SWAGGER'] = {
@@ -64,9 +85,16 @@ def create_app():
     migrate.init_app(app, db)
     jwt.init_app(app)
     swagger.init_app(app)
+    init_dashboard_cache(app)
+    init_principal_cache(app)
+    init_password_hashing(app)
 
     # --- Import Models (needed for Flask-Migrate) ---
     from app import models
+    from app.services.ledger_services import register_ledger_listeners
+    register_ledger_listeners()
+    from app.services.catalog_services import register_catalog_listeners
+    register_catalog_listeners()
 
     # --- Register Blueprints ---
     from app.routes.auth_routes import auth_bp
@@ -148,6 +176,9 @@ def create_app():
     # --- Register Global Error Handlers ---
     register_error_handlers(app)
 
+    # --- Register CLI Commands ---
+    register_commands(app)
+
     # --- Root Route for Swagger UI ---
     @app.route('/')
     def index():
@@ -1,7 +1,7 @@
 from functools import wraps
 from flask_jwt_extended import get_jwt_identity
 from flask import jsonify
-from app.models import User
+from app.auth.principal import current_principal
 
 def role_required(*roles):
     def decorator(f):
@@ -11,7 +11,7 @@ def role_required(*roles):
             if not current_user_id:
                 return jsonify({"error": "Missing or invalid token"}), 401
 
-            current_user = User.query.get(current_user_id)
+            current_user = current_principal()
             if not current_user or not current_user.is_active:
                 return jsonify({"error": "User not found or inactive"}), 403
 
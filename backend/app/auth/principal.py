@@ -0,0 +1,292 @@
+# app/auth/principal.py
+"""
+The authenticated principal: the few User fields authorization needs.
+
+Access tokens carry the user's role, store_id and token version as claims
+(see token_claims()). current_principal() trusts those claims as long as
+the token version is still the user's current one, which it checks against
+an in-memory copy of the token_versions table that is refreshed with one
+small query every TOKEN_VERSION_POLL_SECONDS (default 5) and immediately
+after this process commits a version bump. The refresh reads the rows
+whose `seq` is above the highest one seen so far; seq comes from a
+single-row clock that each bumping transaction increments and keeps locked
+until it commits, so a bump can never become visible behind the watermark,
+however long its transaction takes. In the common case authorizing
+a request therefore needs no query at all.
+
+Tokens without claims (issued before they existed) or with a retired
+version fall back to loading the user, through a per-app TTL cache
+(PRINCIPAL_CACHE_TTL seconds, default 30). Either way the principal is
+resolved once per request into flask.g.
+
+Changing a user's role, store, active or deleted state bumps their token
+version in the same transaction. Committing any change to a user evicts
+them from the principal cache, and committing a change to a store clears
+the store name cache. Other worker processes see cache evictions once their
+entries expire.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app, g, has_app_context
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+DEFAULT_PRINCIPAL_CACHE_TTL = 30
+DEFAULT_TOKEN_VERSION_POLL_SECONDS = 5
+TOKEN_VERSION_CLOCK_ID = 1
+_SESSION_INFO_KEY = 'principal_cache_users'
+_VERSION_BUMPS_KEY = 'token_version_bumps'
+_STORES_CHANGED_KEY = 'principal_cache_stores_changed'
+_ALL = object()
+
+# User attributes that are baked into, or decide the validity of, a token
+TOKEN_BOUND_ATTRIBUTES = ('role', 'store_id', 'is_active', 'is_deleted')
+
+Principal = namedtuple('Principal', ['id', 'role', 'store_id', 'is_active'])
+
+
+class TTLCache:
+    """Thread-safe dict with per-entry expiry."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def evict(self, keys):
+        with self._lock:
+            if keys is _ALL:
+                self._entries.clear()
+                return
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+class TokenVersionRegistry:
+    """
+    In-memory {user_id: token version}, topped up from token_versions with
+    the rows whose seq is above the highest seq seen by the previous poll.
+    """
+
+    def __init__(self, poll_seconds=DEFAULT_TOKEN_VERSION_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._versions = {}
+        self._seq = None            # highest TokenVersion.seq seen
+        self._next_poll = 0.0       # monotonic deadline
+        self._lock = threading.Lock()
+
+    def version(self, user_id):
+        if time.monotonic() >= self._next_poll:
+            self._poll()
+        return self._versions.get(user_id, 0)
+
+    def expire(self):
+        """Forces a poll on the next lookup, e.g. after this process bumped a version."""
+        self._next_poll = 0.0
+
+    def _poll(self):
+        from app.models import db, TokenVersion
+        with self._lock:
+            if time.monotonic() < self._next_poll:
+                return  # another thread polled while this one waited
+            query = select(TokenVersion.user_id, TokenVersion.version, TokenVersion.seq)
+            if self._seq is not None:
+                query = query.where(TokenVersion.seq > self._seq)
+            seq = self._seq or 0
+            for user_id, version, row_seq in db.session.execute(query):
+                self._versions[user_id] = version
+                seq = max(seq, row_seq)
+            self._seq = seq
+            self._next_poll = time.monotonic() + self.poll_seconds
+
+
+def init_principal_cache(app):
+    """Creates the app's principal, store name and token version caches from config and hooks up invalidation."""
+    ttl = app.config.get('PRINCIPAL_CACHE_TTL', DEFAULT_PRINCIPAL_CACHE_TTL)
+    app.extensions['principal_cache'] = TTLCache(ttl)
+    app.extensions['store_name_cache'] = TTLCache(ttl)
+    app.extensions['token_versions'] = TokenVersionRegistry(
+        app.config.get('TOKEN_VERSION_POLL_SECONDS', DEFAULT_TOKEN_VERSION_POLL_SECONDS)
+    )
+    _register_invalidation_listeners()
+
+
+def current_token_version(user_id):
+    """The user's token version read from the database (for issuing tokens)."""
+    from app.models import db, TokenVersion
+    return db.session.query(TokenVersion.version).filter(TokenVersion.user_id == user_id).scalar() or 0
+
+
+def token_claims(user):
+    """Additional JWT claims for `user`; pass to create_access_token(additional_claims=...)."""
+    return {'role': user.role, 'store_id': user.store_id, 'ver': current_token_version(user.id)}
+
+
+def _load_principal(user_id):
+    from app.models import db, User
+    row = db.session.query(User.id, User.role, User.store_id, User.is_active)\
+        .filter(User.id == user_id)\
+        .first()
+    return Principal(*row) if row else None
+
+
+def _principal_from_claims(user_id):
+    claims = get_jwt()
+    if 'ver' not in claims or 'role' not in claims:
+        return None
+    registry = current_app.extensions.get('token_versions')
+    if registry is None or registry.version(user_id) != claims['ver']:
+        return None
+    # A deactivation or deletion bumps the version, so a current token means an active user
+    return Principal(user_id, claims['role'], claims.get('store_id'), True)
+
+
+def current_principal():
+    """
+    The Principal for the JWT identity of the current request, or None when
+    there is no identity or the user does not exist. Call after jwt_required().
+    """
+    if 'principal' in g:
+        return g.principal
+
+    principal = None
+    identity = get_jwt_identity()
+    try:
+        user_id = int(identity) if identity is not None else None
+    except (TypeError, ValueError):
+        user_id = None
+
+    if user_id is not None:
+        principal = _principal_from_claims(user_id)
+    if user_id is not None and principal is None:
+        cache = current_app.extensions.get('principal_cache')
+        principal = cache.get(user_id) if cache else None
+        if principal is None:
+            principal = _load_principal(user_id)
+            if principal is not None and cache:
+                cache.set(user_id, principal)
+
+    g.principal = principal
+    return principal
+
+
+def store_name(store_id):
+    """Name of a store (None if it does not exist), cached like principals."""
+    from app.models import db, Store
+    cache = current_app.extensions.get('store_name_cache')
+    name = cache.get(store_id) if cache else None
+    if name is None:
+        name = db.session.query(Store.name).filter(Store.id == store_id).scalar()
+        if name is not None and cache:
+            cache.set(store_id, name)
+    return name
+
+
+# --- Invalidation -----------------------------------------------------------
+
+_listeners_registered = False
+
+
+def _register_invalidation_listeners():
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'after_flush', _collect_flushed_users)
+    event.listen(Session, 'after_commit', _evict_committed_users)
+    event.listen(Session, 'after_rollback', _discard_pending)
+    _listeners_registered = True
+
+
+def _token_bound_change(obj):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in TOKEN_BOUND_ATTRIBUTES)
+
+
+def _next_token_version_seq(connection):
+    """
+    Increments the clock and returns its new value. The UPDATE's row lock is
+    held until commit, so bumping transactions commit in seq order.
+    """
+    from app.models import TokenVersionClock
+    result = connection.execute(
+        update(TokenVersionClock).where(TokenVersionClock.id == TOKEN_VERSION_CLOCK_ID)
+        .values(seq=TokenVersionClock.seq + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(TokenVersionClock).values(id=TOKEN_VERSION_CLOCK_ID, seq=1))
+    return connection.execute(
+        select(TokenVersionClock.seq).where(TokenVersionClock.id == TOKEN_VERSION_CLOCK_ID)
+    ).scalar_one()
+
+
+def _bump_token_versions(connection, user_ids):
+    from app.models import TokenVersion
+    seq = _next_token_version_seq(connection)
+    now = datetime.utcnow()
+    for user_id in user_ids:
+        result = connection.execute(
+            update(TokenVersion).where(TokenVersion.user_id == user_id)
+            .values(version=TokenVersion.version + 1, seq=seq, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(TokenVersion).values(user_id=user_id, version=1, seq=seq, updated_at=now))
+
+
+def _collect_flushed_users(session, flush_context):
+    from app.models import User, Store
+    users = session.info.setdefault(_SESSION_INFO_KEY, set())
+    bumped = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Store):
+            session.info[_STORES_CHANGED_KEY] = True
+        elif isinstance(obj, User) and obj.id is not None:
+            users.add(obj.id)
+            if obj in session.dirty and _token_bound_change(obj):
+                bumped.add(obj.id)
+    if bumped:
+        # The session cannot be used for new work inside after_flush; its connection can
+        _bump_token_versions(session.connection(), sorted(bumped))
+        session.info.setdefault(_VERSION_BUMPS_KEY, set()).update(bumped)
+
+
+def _evict_committed_users(session):
+    users = session.info.pop(_SESSION_INFO_KEY, None)
+    bumped = session.info.pop(_VERSION_BUMPS_KEY, None)
+    stores_changed = session.info.pop(_STORES_CHANGED_KEY, None)
+    if not has_app_context() or not (users or bumped or stores_changed):
+        return
+    extensions = current_app.extensions
+    if users and 'principal_cache' in extensions:
+        extensions['principal_cache'].evict(users)
+    if stores_changed and 'store_name_cache' in extensions:
+        extensions['store_name_cache'].evict(_ALL)
+    if bumped and 'token_versions' in extensions:
+        extensions['token_versions'].expire()
+    g.pop('principal', None)
+
+
+def _discard_pending(session):
+    for key in (_SESSION_INFO_KEY, _VERSION_BUMPS_KEY, _STORES_CHANGED_KEY):
+        session.info.pop(key, None)
@@ -1,16 +1,98 @@
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
+from flask import current_app, has_app_context
 
+from app.errors import ServiceUnavailableError
+
+# Used outside an app (scripts, seeding); apps build their own from config
 ph = PasswordHasher()
 
+
+class PasswordHashingPool:
+    """
+    Runs Argon2 hashing and verification on a fixed number of worker threads
+    so a burst of logins cannot occupy every request thread. At most
+    `queue_size` calls wait for a worker; beyond that callers get a 503 with
+    Retry-After instead of queueing without bound.
+    """
+
+    def __init__(self, hasher, workers, queue_size, retry_after):
+        self.hasher = hasher
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise ServiceUnavailableError(
+                "Too many sign-ins are being processed. Please retry shortly.",
+                retry_after=self.retry_after
+            )
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+
+def init_password_hashing(app):
+    """
+    Builds the app's Argon2 hasher from ARGON2_* config and, when
+    PASSWORD_HASH_WORKERS > 0, the pool it runs on. Hashes made with older
+    parameters keep verifying and are upgraded at the next login.
+    """
+    hasher = PasswordHasher(
+        time_cost=app.config.get('ARGON2_TIME_COST', ph.time_cost),
+        memory_cost=app.config.get('ARGON2_MEMORY_COST', ph.memory_cost),
+        parallelism=app.config.get('ARGON2_PARALLELISM', ph.parallelism)
+    )
+    workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+    if workers > 0:
+        app.extensions['password_hashing'] = PasswordHashingPool(
+            hasher,
+            workers,
+            app.config.get('PASSWORD_HASH_QUEUE_SIZE', workers * 4),
+            app.config.get('PASSWORD_HASH_RETRY_AFTER', 2)
+        )
+    else:
+        app.extensions['password_hasher'] = hasher
+
+
+def _hashing():
+    """(hasher, pool or None) for the current app, or the module defaults outside one."""
+    if not has_app_context():
+        return ph, None
+    pool = current_app.extensions.get('password_hashing')
+    if pool is not None:
+        return pool.hasher, pool
+    return current_app.extensions.get('password_hasher', ph), None
+
+
 def hash_password(password):
-    return ph.hash(password)
+    hasher, pool = _hashing()
+    if pool is None:
+        return hasher.hash(password)
+    return pool.run(hasher.hash, password)
+
 
 def verify_password(stored_hash, password):
-    try:
-        return ph.verify(stored_hash, password)
-    except VerifyMismatchError:
-        return False
+    hasher, pool = _hashing()
+
+    def verify():
+        try:
+            return hasher.verify(stored_hash, password)
+        except VerifyMismatchError:
+            return False
+
+    return verify() if pool is None else pool.run(verify)
+
 
 def needs_rehash(stored_hash):
-    return ph.check_needs_rehash(stored_hash)
+    hasher, _ = _hashing()
+    return hasher.check_needs_rehash(stored_hash)
@@ -0,0 +1,250 @@
+# app/cache.py
+"""
+Response cache for the dashboard endpoints.
+
+Entries are keyed by request path/arguments and by the *generation* of the
+stores they cover. Committing a change to a sale, purchase, transfer or
+stock row bumps the generation of the affected stores (and of the "all
+stores" scope), so stale entries are simply never read again and age out
+of the LRU / TTL. Writes whose store cannot be determined bump a global
+epoch that retires every entry.
+
+The default backend lives in process memory. Setting
+DASHBOARD_CACHE_REDIS_URL (with the `redis` package installed) shares
+entries and generations between worker processes instead; with the memory
+backend other workers only see a write once their entries expire.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, has_app_context, request, make_response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+# Execution option naming the store ids touched by a bulk ORM statement
+# (insert(Sale), update(StoreProduct), ...) that bypasses the unit of work.
+INVALIDATES_STORES = 'invalidates_stores'
+
+ALL_STORES = 'all'
+_EPOCH = 'epoch'
+_SESSION_INFO_KEY = 'dashboard_cache_stores'
+
+DEFAULT_TTL = 30
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class MemoryCacheBackend:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counters(self, names):
+        with self._lock:
+            return [self._counters.get(name, 0) for name in names]
+
+    def incr_counters(self, names):
+        with self._lock:
+            for name in names:
+                self._counters[name] = self._counters.get(name, 0) + 1
+
+
+class RedisCacheBackend:
+    """Stores entries and generations in Redis so all workers share them."""
+
+    def __init__(self, url, prefix='myduka:dashboard:'):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def get_counters(self, names):
+        values = self.client.mget([f"{self.prefix}gen:{name}" for name in names])
+        return [int(value) if value else 0 for value in values]
+
+    def incr_counters(self, names):
+        pipe = self.client.pipeline()
+        for name in names:
+            pipe.incr(f"{self.prefix}gen:{name}")
+        pipe.execute()
+
+
+class DashboardCache:
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def key_for(self, scope):
+        """Cache key for the current request over `scope` (store ids or ALL_STORES)."""
+        names = [_EPOCH, ALL_STORES] if scope == ALL_STORES else [_EPOCH] + [str(s) for s in sorted(scope)]
+        generations = ",".join(
+            f"{name}.{generation}" for name, generation in zip(names, self.backend.get_counters(names))
+        )
+        args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        return f"{request.path}?{args}|{generations}"
+
+    def invalidate(self, store_ids):
+        """Retires entries for the given stores (None = everything)."""
+        if store_ids is None:
+            self.backend.incr_counters([_EPOCH])
+        else:
+            self.backend.incr_counters([ALL_STORES] + [str(s) for s in store_ids])
+
+
+def init_dashboard_cache(app):
+    """Creates the app's dashboard cache from config and hooks up invalidation."""
+    ttl = app.config.get('DASHBOARD_CACHE_TTL', DEFAULT_TTL)
+    redis_url = app.config.get('DASHBOARD_CACHE_REDIS_URL')
+    if redis_url and redis is not None:
+        backend = RedisCacheBackend(redis_url)
+    else:
+        if redis_url:
+            app.logger.warning("DASHBOARD_CACHE_REDIS_URL is set but redis is not installed; using memory cache.")
+        backend = MemoryCacheBackend(app.config.get('DASHBOARD_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    app.extensions['dashboard_cache'] = DashboardCache(backend, ttl)
+    _register_invalidation_listeners()
+
+
+def cached_dashboard(scope_for_request):
+    """
+    Serves a dashboard view from the cache. `scope_for_request()` returns the
+    store ids the response covers, or ALL_STORES; it runs after the auth
+    decorators and may abort. Only 200 JSON responses are stored.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('dashboard_cache')
+            if cache is None or cache.ttl <= 0:
+                return view(*args, **kwargs)
+
+            key = cache.key_for(scope_for_request())
+            body = cache.backend.get(key)
+            if body is not None:
+                response = current_app.response_class(body, status=200, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.is_json:
+                cache.backend.set(key, response.get_data(), cache.ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+# --- Invalidation -----------------------------------------------------------
+
+_listeners_registered = False
+
+
+def _register_invalidation_listeners():
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'after_flush', _collect_flushed_stores)
+    event.listen(Session, 'do_orm_execute', _collect_bulk_statement_stores)
+    event.listen(Session, 'after_commit', _invalidate_committed_stores)
+    event.listen(Session, 'after_rollback', _discard_pending)
+    _listeners_registered = True
+
+
+def _tracked_models():
+    from app.models import Sale, SaleItem, Purchase, PurchaseItem, StockTransfer, StoreProduct, Store
+    return Sale, SaleItem, Purchase, PurchaseItem, StockTransfer, StoreProduct, Store
+
+
+def _mark(session, store_ids):
+    """Records stores to invalidate on commit; None means all of them."""
+    pending = session.info.setdefault(_SESSION_INFO_KEY, set())
+    if store_ids is None:
+        pending.add(None)
+    else:
+        pending.update(store_ids)
+
+
+def _column_values(obj, column):
+    """Current and pre-flush values of `column` (store ids may be reassigned)."""
+    history = inspect(obj).attrs[column].history
+    return {value for value in (*history.added, *history.unchanged, *history.deleted) if value is not None}
+
+
+def _parent_store(session, model, parent_id, column='store_id'):
+    parent = session.identity_map.get(identity_key(model, parent_id)) if parent_id else None
+    return getattr(parent, column) if parent is not None else None
+
+
+def _collect_flushed_stores(session, flush_context):
+    Sale, SaleItem, Purchase, PurchaseItem, StockTransfer, StoreProduct, Store = _tracked_models()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Sale, Purchase, StoreProduct)):
+            _mark(session, _column_values(obj, 'store_id'))
+        elif isinstance(obj, StockTransfer):
+            _mark(session, _column_values(obj, 'from_store_id') | _column_values(obj, 'to_store_id'))
+        elif isinstance(obj, (SaleItem, PurchaseItem)):
+            parent_model = Sale if isinstance(obj, SaleItem) else Purchase
+            parent_id = obj.sale_id if isinstance(obj, SaleItem) else obj.purchase_id
+            store_id = _parent_store(session, parent_model, parent_id)
+            _mark(session, None if store_id is None else {store_id})
+        elif isinstance(obj, Store):
+            _mark(session, None)
+
+
+def _collect_bulk_statement_stores(orm_execute_state):
+    if orm_execute_state.is_select:
+        return
+    # Covers both entity statements (update(StoreProduct)) and table ones (insert(Model.__table__))
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is None or table.name not in {model.__tablename__ for model in _tracked_models()}:
+        return
+    _mark(orm_execute_state.session, orm_execute_state.execution_options.get(INVALIDATES_STORES))
+
+
+def _invalidate_committed_stores(session):
+    pending = session.info.pop(_SESSION_INFO_KEY, None)
+    if not pending or not has_app_context():
+        return
+    cache = current_app.extensions.get('dashboard_cache')
+    if cache is None:
+        return
+    cache.invalidate(None if None in pending else pending)
+
+
+def _discard_pending(session):
+    session.info.pop(_SESSION_INFO_KEY, None)
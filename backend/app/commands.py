@@ -0,0 +1,117 @@
+# app/commands.py
+
+import click
+from flask.cli import AppGroup
+
+search_cli = AppGroup('search', help='Maintain the sales search index.')
+reports_cli = AppGroup('reports', help='Maintain the reporting rollup and cost basis tables.')
+stock_cli = AppGroup('stock', help='Stock ledger snapshots and reconciliation.')
+email_cli = AppGroup('email', help='Deliver the outbound email queue.')
+invitations_cli = AppGroup('invitations', help='Maintain invitation tokens.')
+
+
+@search_cli.command('rebuild')
+@click.option('--batch-size', default=1000, show_default=True, help='Sales indexed per transaction.')
+def rebuild_search_index(batch_size):
+    """Regenerates every sale search document (e.g. after seeding or renames)."""
+    from app.services.search_services import rebuild_sale_search_documents
+
+    indexed = rebuild_sale_search_documents(batch_size=batch_size)
+    click.echo(f"Indexed {indexed} sales.")
+
+
+@reports_cli.command('backfill')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only rebuild days on or after this date (YYYY-MM-DD).')
+def backfill_reports(since):
+    """Recomputes daily_store_product_sales from the recorded sale items."""
+    from app.services.rollup_services import backfill_daily_sales_rollups
+
+    written = backfill_daily_sales_rollups(since=since.date() if since else None)
+    click.echo(f"Wrote {written} daily rollup rows.")
+
+
+@reports_cli.command('cost-basis')
+def backfill_cost_basis():
+    """Recomputes product_cost_basis from the recorded purchase items."""
+    from app.services.cost_basis_services import backfill_product_cost_basis
+
+    written = backfill_product_cost_basis()
+    click.echo(f"Wrote {written} cost basis rows.")
+
+
+@stock_cli.command('snapshot')
+@click.option('--store-id', 'store_ids', type=int, multiple=True,
+              help='Only snapshot these stores (repeatable). Defaults to every store.')
+def snapshot_stock(store_ids):
+    """Records current stock levels; schedule this (e.g. nightly) to keep ledger replays short."""
+    from app.services.ledger_services import take_stock_snapshots
+
+    written = take_stock_snapshots(store_ids=list(store_ids) or None)
+    click.echo(f"Wrote {written} stock snapshot rows.")
+
+
+@stock_cli.command('reconcile')
+@click.argument('store_id', type=int)
+def reconcile_store_stock(store_id):
+    """Lists products whose stock level disagrees with the ledger."""
+    from app.services.ledger_services import reconcile_stock
+
+    discrepancies = reconcile_stock(store_id)
+    for entry in discrepancies:
+        click.echo(
+            f"Product {entry['product_id']}: ledger {entry['ledger_quantity']}, "
+            f"in stock {entry['quantity_in_stock']} ({entry['difference']:+d})"
+        )
+    click.echo(f"{len(discrepancies)} discrepancies in store {store_id}.")
+
+
+@email_cli.command('send')
+def send_queued_emails():
+    """Delivers every due message in the email outbox once and exits."""
+    from app.services.email_service import SmtpConnectionPool, drain_outbox
+
+    pool = SmtpConnectionPool()
+    try:
+        sent, failed = drain_outbox(pool)
+    finally:
+        pool.close()
+    click.echo(f"Sent {sent} emails, {failed} failed (will be retried unless out of attempts).")
+
+
+@email_cli.command('worker')
+def run_email_worker():
+    """Runs the outbox sender in the foreground (set EMAIL_OUTBOX_WORKER=false on the web workers)."""
+    from flask import current_app
+    from app.services.email_service import OutboxWorker
+
+    worker = OutboxWorker(current_app._get_current_object())
+    click.echo(f"Delivering queued email every {worker.poll_seconds}s; Ctrl+C to stop.")
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(1)
+    except KeyboardInterrupt:
+        worker.stop()
+        worker.join()
+
+
+@invitations_cli.command('sweep')
+@click.option('--retention-days', default=30, show_default=True,
+              help='Keep expired, used and cancelled tokens for this many days.')
+@click.option('--batch-size', default=1000, show_default=True, help='Tokens deleted per transaction.')
+def sweep_invitations(retention_days, batch_size):
+    """Deletes stale invitation tokens; schedule this (e.g. nightly) to keep the table small."""
+    from app.services.invitation_services import sweep_invitation_tokens
+
+    deleted = sweep_invitation_tokens(retention_days=retention_days, batch_size=batch_size)
+    click.echo(f"Deleted {deleted} invitation tokens.")
+
+
+def register_commands(app):
+    """Attaches the maintenance command groups to `flask` / manage.py."""
+    app.cli.add_command(search_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(stock_cli)
+    app.cli.add_command(email_cli)
+    app.cli.add_command(invitations_cli)
@@ -0,0 +1,93 @@
+# app/db_utils.py
+
+from sqlalchemy import Date, cast, func, update, insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def dialect_name():
+    return db.session.get_bind().dialect.name
+
+
+def sale_day(column):
+    """Calendar day of a DateTime column, as an expression usable in GROUP BY."""
+    if dialect_name() == 'sqlite':
+        return func.date(column)
+    return cast(column, Date)
+
+
+def upsert(model, rows, key_columns, increment=(), replace=(), execution_options=None):
+    """
+    Inserts `rows` (dicts) into `model`'s table, or updates the existing row
+    with the same `key_columns`: columns in `increment` are added to, columns
+    in `replace` are overwritten. Rows sharing a key are merged first so one
+    statement never touches a row twice.
+
+    Uses INSERT ... ON CONFLICT DO UPDATE on PostgreSQL and SQLite and falls
+    back to UPDATE-then-INSERT elsewhere. Runs in the caller's transaction;
+    `execution_options` are passed to every statement.
+    """
+    execution_options = execution_options or {}
+    merged = {}
+    for row in rows:
+        key = tuple(row[column] for column in key_columns)
+        if key in merged:
+            existing = merged[key]
+            for column in increment:
+                existing[column] += row[column]
+            for column in replace:
+                existing[column] = row[column]
+        else:
+            merged[key] = dict(row)
+    if not merged:
+        return
+
+    table = model.__table__
+    make_insert = _UPSERT_INSERTS.get(dialect_name())
+    if make_insert is not None:
+        stmt = make_insert(table)
+        set_ = {column: table.c[column] + stmt.excluded[column] for column in increment}
+        set_.update({column: stmt.excluded[column] for column in replace})
+        stmt = stmt.on_conflict_do_update(index_elements=list(key_columns), set_=set_)
+        db.session.execute(stmt, list(merged.values()), execution_options=execution_options)
+        return
+
+    for row in merged.values():
+        where = [table.c[column] == row[column] for column in key_columns]
+        values = {column: table.c[column] + row[column] for column in increment}
+        values.update({column: row[column] for column in replace})
+        result = db.session.execute(update(table).where(*where).values(**values), execution_options=execution_options)
+        if result.rowcount == 0:
+            db.session.execute(insert(table).values(**row), execution_options=execution_options)
+
+
+def increment_counter(connection, model, key_column, key, column):
+    """
+    Adds 1 to `column` of `model`'s row keyed by `key` (creating it at 1) on
+    `connection` and returns the new value. The row stays locked until the
+    transaction ends, so transactions that increment the same counter commit
+    in the order of the values they got.
+    """
+    table = model.__table__
+    make_insert = _UPSERT_INSERTS.get(connection.dialect.name)
+    if make_insert is not None:
+        stmt = make_insert(table).values({key_column: key, column: 1})
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key_column], set_={column: table.c[column] + 1}
+        ).returning(table.c[column])
+        return connection.execute(stmt).scalar_one()
+
+    value = connection.execute(
+        update(table).where(table.c[key_column] == key)
+        .values({column: table.c[column] + 1}).returning(table.c[column])
+    ).scalar()
+    if value is None:
+        connection.execute(insert(table).values({key_column: key, column: 1}))
+        value = 1
+    return value
@@ -19,6 +19,7 @@ def register_error_handlers(app):
         app.logger.error(f"API Error: {error.message} (Status: {error.status_code}, Payload: {error.payload})")
         response = jsonify(error.to_dict())
         response.status_code = error.status_code
+        response.headers.update(getattr(error, 'headers', {}))
         return response
 
     @app.errorhandler(SQLAlchemyError)
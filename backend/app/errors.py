@@ -46,6 +46,20 @@ class UnauthorizedError(APIError):
     message = "Unauthorized: Authentication required or invalid."
 
 
+class ServiceUnavailableError(APIError):
+    """Custom exception for 503 Service Unavailable errors (e.g., a saturated worker pool)."""
+    status_code = 503
+    message = "Service temporarily unavailable. Please retry shortly."
+
+    def __init__(self, message=None, retry_after=None, payload=None):
+        super().__init__(message=message, payload=payload)
+        self.retry_after = retry_after
+
+    @property
+    def headers(self):
+        return {'Retry-After': str(self.retry_after)} if self.retry_after is not None else {}
+
+
 class InsufficientStockError(BadRequestError): # Inherits from BadRequestError
     """Custom exception for insufficient stock during a sale."""
     message = "Not enough items in stock."
@@ -59,3 +73,18 @@ class InsufficientStockError(BadRequestError): # Inherits from BadRequestError
                 'requested_quantity': requested_quantity
             }
         )
+
+
+class StockShortageError(BadRequestError):
+    """Custom exception listing every line of a request that exceeds available stock."""
+    message = "Not enough items in stock."
+
+    def __init__(self, shortages):
+        details = "; ".join(
+            f"'{s['product_name']}' (Available: {s['available_stock']}, Requested: {s['requested_quantity']})"
+            for s in shortages
+        )
+        super().__init__(
+            message=f"Not enough stock for {details}",
+            payload={'shortages': shortages}
+        )
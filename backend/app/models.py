@@ -2,7 +2,7 @@ from datetime import datetime
 from enum import Enum
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy import select, func
+from sqlalchemy import select, func, event, DDL
 from app import db  # ✅ resolves circular import
 
 from app.auth.utils import hash_password, verify_password
@@ -20,6 +20,14 @@ class SerializerMixin:
         }
 
 
+def _live_rows_only():
+    """Partial-index predicate for soft-deleted tables: only rows with is_deleted false."""
+    return {
+        'postgresql_where': db.text('is_deleted = false'),
+        'sqlite_where': db.text('is_deleted = 0'),
+    }
+
+
 class BaseModel(db.Model, SerializerMixin):
     __abstract__ = True
     id = db.Column(db.Integer, primary_key=True)
@@ -45,9 +53,23 @@ class Store(BaseModel):
 
  #(Add 'import secrets' and 'from datetime import timedelta' to your existing imports)
 
+def _active_invitations_only():
+    """Partial-index predicate for invitations that can still be accepted (expiry aside)."""
+    return {
+        'postgresql_where': db.text('is_used = false AND is_deleted = false'),
+        'sqlite_where': db.text('is_used = 0 AND is_deleted = 0'),
+    }
+
+
 class InvitationToken(db.Model):
     __tablename__ = 'invitation_tokens'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Pending invitations of a merchant, newest first
+        db.Index('ix_invitation_tokens_active_user_id_created_at', 'user_id', 'created_at', **_active_invitations_only()),
+        # The sweeper's scan for expired tokens
+        db.Index('ix_invitation_tokens_expires_at', 'expires_at'),
+        {'extend_existing': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     token = db.Column(db.String(64), unique=True, nullable=False, index=True)
@@ -124,6 +146,37 @@ class InvitationToken(db.Model):
     
     def __repr__(self):
         return f'<InvitationToken {self.email} - {self.role}>'
+
+
+# Invitation lookups compare lower(email); a plain index on email cannot serve them
+db.Index('ix_invitation_tokens_lower_email', func.lower(InvitationToken.email))
+
+
+class OutboundEmail(db.Model):
+    """
+    Durable outbox of emails to send. Requests only insert rows (in their own
+    transaction); app.services.email_service delivers them in batches over a
+    reused SMTP connection, retrying failures with exponential backoff.
+    """
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        # The sender's poll: due pending messages, oldest first
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    to_address = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<OutboundEmail {self.id} to {self.to_address} ({self.status})>"
     
 
 
@@ -174,6 +227,45 @@ class User(BaseModel):
         return f"<User {self.email} ({self.role})>"
 
 
+class TokenVersion(db.Model):
+    """
+    Per-user version of the authorization claims (role, store_id) embedded
+    in access tokens. Bumped whenever those or the user's active/deleted
+    state change, which retires every token issued before (see
+    app.auth.principal). Users without a row are at version 0.
+
+    `seq` is the TokenVersionClock value of the transaction that last bumped
+    the row; since the clock's row lock is held until commit, seq values
+    become visible in increasing order and workers poll by max(seq).
+    """
+    __tablename__ = 'token_versions'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    seq = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<TokenVersion User {self.user_id} v{self.version}>"
+
+
+class TokenVersionClock(db.Model):
+    """Single-row counter handing out TokenVersion.seq, one value per bumping transaction."""
+    __tablename__ = 'token_version_clock'
+
+    id = db.Column(db.Integer, primary_key=True)
+    seq = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TokenVersionClock {self.seq}>"
+
+
+event.listen(
+    TokenVersionClock.__table__, 'after_create',
+    DDL('INSERT INTO token_version_clock (id, seq) VALUES (1, 0)')
+)
+
+
 class Category(BaseModel):
     __tablename__ = 'categories'
 
@@ -215,6 +307,12 @@ class Product(BaseModel):
 
 class StoreProduct(BaseModel):
     __tablename__ = 'store_products'
+    __table_args__ = (
+        # One stock row per product and store; purchases upsert against it
+        db.UniqueConstraint('store_id', 'product_id', name='uq_store_products_store_id_product_id'),
+        # Stock views and low/out-of-stock panels: one store's live rows by quantity
+        db.Index('ix_store_products_live_store_id_quantity', 'store_id', 'quantity_in_stock', **_live_rows_only()),
+    )
 
     store_id = db.Column(db.Integer, db.ForeignKey('stores.id'))
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'))
@@ -239,6 +337,12 @@ class StoreProduct(BaseModel):
 
 class Sale(BaseModel):
     __tablename__ = 'sales'
+    __table_args__ = (
+        # Store-scoped listings, trends and reports over a created_at range
+        db.Index('ix_sales_store_id_is_deleted_created_at', 'store_id', 'is_deleted', 'created_at'),
+        # Unscoped listing / cursor pagination, newest first
+        db.Index('ix_sales_live_created_at_id', 'created_at', 'id', **_live_rows_only()),
+    )
 
     store_id = db.Column(db.Integer, db.ForeignKey('stores.id'))
     cashier_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -277,6 +381,9 @@ class Sale(BaseModel):
 
 class SaleItem(BaseModel):
     __tablename__ = 'sale_items'
+    __table_args__ = (
+        db.Index('ix_sale_items_sale_id_is_deleted', 'sale_id', 'is_deleted'),
+    )
 
     sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=False)
     store_product_id = db.Column(db.Integer, db.ForeignKey('store_products.id'), nullable=False)
@@ -286,6 +393,196 @@ class SaleItem(BaseModel):
     store_product = db.relationship('StoreProduct', backref='sale_items')
 
 
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), unique=True, nullable=False, index=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=False)
+    sale_total = db.Column(db.Numeric(12, 2), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.key} -> Sale {self.sale_id}>"
+
+
+class SaleSearchDocument(db.Model):
+    """
+    One row per sale holding the product, cashier and store names as a single
+    text document, indexed for substring search. Maintained by
+    app.services.search_services whenever a sale is written.
+    """
+    __tablename__ = 'sale_search_documents'
+    __table_args__ = (
+        db.Index(
+            'ix_sale_search_documents_document_trgm', 'document',
+            postgresql_using='gin', postgresql_ops={'document': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
+
+    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), primary_key=True)
+    document = db.Column(db.Text, nullable=False, default='')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SaleSearchDocument Sale {self.sale_id}>"
+
+
+# PostgreSQL serves ILIKE '%term%' from the trigram GIN index above. SQLite has
+# no trigram operator class, so an external-content FTS5 table with the
+# trigram tokenizer mirrors the documents there (kept in step by triggers).
+event.listen(
+    SaleSearchDocument.__table__, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+for _statement in (
+    "CREATE VIRTUAL TABLE sale_search_fts USING fts5("
+    "document, content='sale_search_documents', content_rowid='sale_id', tokenize='trigram')",
+    "CREATE TRIGGER sale_search_documents_ai AFTER INSERT ON sale_search_documents BEGIN "
+    "INSERT INTO sale_search_fts(rowid, document) VALUES (new.sale_id, new.document); END",
+    "CREATE TRIGGER sale_search_documents_ad AFTER DELETE ON sale_search_documents BEGIN "
+    "INSERT INTO sale_search_fts(sale_search_fts, rowid, document) VALUES ('delete', old.sale_id, old.document); END",
+    "CREATE TRIGGER sale_search_documents_au AFTER UPDATE ON sale_search_documents BEGIN "
+    "INSERT INTO sale_search_fts(sale_search_fts, rowid, document) VALUES ('delete', old.sale_id, old.document); "
+    "INSERT INTO sale_search_fts(rowid, document) VALUES (new.sale_id, new.document); END",
+):
+    event.listen(SaleSearchDocument.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(
+    SaleSearchDocument.__table__, 'after_drop',
+    DDL('DROP TABLE IF EXISTS sale_search_fts').execute_if(dialect='sqlite')
+)
+
+
+class DailyStoreProductSales(db.Model):
+    """
+    Pre-aggregated sales per day, store and product. Maintained incrementally
+    by app.services.rollup_services as sales are created, edited or deleted,
+    and rebuilt from sale_items by `flask reports backfill`.
+    """
+    __tablename__ = 'daily_store_product_sales'
+
+    # Key order puts store first: every report reads one store over a date range
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), primary_key=True)
+    sale_date = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyStoreProductSales {self.sale_date} Store {self.store_id} Product {self.product_id}>"
+
+
+class ProductCostBasis(db.Model):
+    """
+    Running purchase totals per store and product, so the weighted-average
+    unit cost is total_cost / total_quantity without scanning purchase_items.
+    Maintained by app.services.cost_basis_services as purchases are created,
+    edited or deleted, and rebuilt by `flask reports cost-basis`.
+    """
+    __tablename__ = 'product_cost_basis'
+
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    total_quantity = db.Column(db.Integer, nullable=False, default=0)
+    total_cost = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    @property
+    def average_cost(self):
+        if not self.total_quantity:
+            return None
+        return self.total_cost / self.total_quantity
+
+    def __repr__(self):
+        return f"<ProductCostBasis Store {self.store_id} Product {self.product_id}>"
+
+
+class StockMovement(db.Model):
+    """
+    Append-only ledger of every change to a store's stock level. Rows are
+    written by app.services.ledger_services alongside each mutation of
+    StoreProduct.quantity_in_stock and are never updated.
+
+    `seq` is the store's StockLedgerClock value taken by the writing
+    transaction; seq values of a store become visible in increasing order,
+    so replay after a snapshot selects movements by seq, not by time.
+    """
+    __tablename__ = 'stock_movements'
+    __table_args__ = (
+        # Delta replay after a snapshot reads one store past a sequence number
+        db.Index('ix_stock_movements_store_id_seq', 'store_id', 'seq'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    quantity_change = db.Column(db.Integer, nullable=False)
+    # sale, sale_edit, sale_void, purchase, purchase_edit, purchase_void, transfer_out, transfer_in, adjustment
+    reason = db.Column(db.String(20), nullable=False)
+    reference_id = db.Column(db.Integer)
+    seq = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StockMovement Store {self.store_id} Product {self.product_id} {self.quantity_change:+d} ({self.reason})>"
+
+
+class StockSnapshot(db.Model):
+    """
+    Stock level of every product of a store at `taken_at`, written by
+    `flask stock snapshot`. `seq` is the store's ledger clock read by the same
+    statement: the snapshot includes exactly the movements with seq <= it.
+    Stock as of a time is the latest snapshot before it plus the
+    stock_movements with a higher seq recorded up to that time.
+    """
+    __tablename__ = 'stock_snapshots'
+
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), primary_key=True)
+    taken_at = db.Column(db.DateTime, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    seq = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<StockSnapshot Store {self.store_id} at {self.taken_at}>"
+
+
+class StockLedgerClock(db.Model):
+    """
+    Per-store counter handing out StockMovement.seq. Each transaction that
+    records movements increments its stores' rows and keeps them locked until
+    it commits (see app.services.ledger_services).
+    """
+    __tablename__ = 'stock_ledger_clocks'
+
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), primary_key=True)
+    seq = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<StockLedgerClock Store {self.store_id} at {self.seq}>"
+
+
+class CatalogVersion(db.Model):
+    """
+    Single-row counter bumped in every transaction that changes a product or
+    category (see app.services.catalog_services). The product listing derives
+    its ETag from it.
+    """
+    __tablename__ = 'catalog_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CatalogVersion {self.version}>"
+
+
+event.listen(
+    CatalogVersion.__table__, 'after_create',
+    DDL('INSERT INTO catalog_version (id, version) VALUES (1, 0)')
+)
+
+
 class Supplier(BaseModel):
     __tablename__ = 'suppliers'
 
@@ -301,6 +598,9 @@ class Supplier(BaseModel):
 
 class Purchase(BaseModel):
     __tablename__ = 'purchases'
+    __table_args__ = (
+        db.Index('ix_purchases_live_store_id_date', 'store_id', 'date', **_live_rows_only()),
+    )
 
     supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'))
     store_id = db.Column(db.Integer, db.ForeignKey('stores.id'))
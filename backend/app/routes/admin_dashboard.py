@@ -2,6 +2,9 @@
 from flask import Blueprint, jsonify, request, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.routes.auth_routes import role_required
+from app.auth.principal import current_principal, store_name
+from app.cache import cached_dashboard
+from app.services.trend_services import parse_trend_window, window_filter, day_bucket, fill_trend
 from app.models import db, Product, StoreProduct, Purchase, StockTransfer, PurchaseItem, Supplier, User, Store, Sale, SaleItem, StockTransferItem
 from sqlalchemy import func, distinct, cast, String, Date
 from datetime import datetime, timedelta
@@ -16,17 +19,21 @@ def get_admin_store_info(user_id):
     Retrieves the store ID and name for a given admin user.
     Aborts with a 403 error if the user is not a valid admin with an assigned store.
     """
-    user = User.query.get(user_id)
+    # Resolved once per request by role_required, from the token claims when current
+    user = current_principal()
+    if user is not None and str(user.id) != str(user_id):
+        user = None
     if not user or user.role != 'admin' or not user.store_id:
         abort(403, description="Access forbidden: Admin not associated with a valid store.")
-    store = Store.query.get(user.store_id)
-    if not store:
+    name = store_name(user.store_id)
+    if name is None:
         abort(403, description="Access forbidden: Admin's store not found.")
-    return user.store_id, store.name
+    return user.store_id, name
 
 @admin_dashboard_bp.route('/summary', methods=['GET'])
 @jwt_required()
 @role_required("admin")
+@cached_dashboard(lambda: [get_admin_store_info(get_jwt_identity())[0]])
 def get_admin_dashboard_summary():
     """
     Fetches summary statistics and store name for the admin dashboard,
@@ -195,6 +202,7 @@ def get_admin_dashboard_summary():
 @admin_dashboard_bp.route('/movements', methods=['GET'])
 @jwt_required()
 @role_required("admin")
+@cached_dashboard(lambda: [get_admin_store_info(get_jwt_identity())[0]])
 def get_admin_dashboard_movements():
     """
     Fetches recent inventory movements (purchases and stock transfers) for the admin dashboard,
@@ -270,40 +278,34 @@ def get_admin_dashboard_movements():
 @admin_dashboard_bp.route('/sales_trend_daily', methods=['GET'])
 @jwt_required()
 @role_required("admin")
+@cached_dashboard(lambda: [get_admin_store_info(get_jwt_identity())[0]])
 def get_daily_sales_trend_admin():
     """
-    Fetches daily total sales trend for the admin dashboard,
+    Fetches the total sales trend for the admin dashboard,
     scoped to the logged-in admin's assigned store.
+    'start'/'end' (YYYY-MM-DD, default: the last 30 days) bound the window and
+    'granularity' (day|week|month) sets the bucket size.
     """
     admin_id = get_jwt_identity()
 
     admin_store_id, _ = get_admin_store_info(admin_id)
 
+    window = parse_trend_window(request.args)
     sales_filter_condition = Sale.store_id == admin_store_id
 
-    # Query to sum sales value per day
+    # Query to sum sales value per day inside the window; fill_trend buckets and gap-fills
+    bucket_day = day_bucket(Sale.created_at)
     daily_sales = db.session.query(
-        cast(Sale.created_at, Date).label('sale_date'),
+        bucket_day,
         func.sum(SaleItem.quantity * SaleItem.price_at_sale).label('total_sales')
     ).join(SaleItem, Sale.id == SaleItem.sale_id).filter(
         sales_filter_condition,
+        window_filter(Sale.created_at, window),
         Sale.is_deleted == False,
         SaleItem.is_deleted == False
-    ).group_by(
-        cast(Sale.created_at, Date)
-    ).order_by(
-        cast(Sale.created_at, Date)
-    ).all()
-
-    # Format the data for the front-end chart
-    sales_trend_data = []
-    for row in daily_sales:
-        sales_trend_data.append({
-            "date": row.sale_date.isoformat(),
-            "value": float(row.total_sales) if row.total_sales else 0.0
-        })
+    ).group_by(bucket_day).all()
 
-    return jsonify(sales_trend_data), 200
+    return jsonify(fill_trend(daily_sales, window)), 200
 
 # ---
 
@@ -312,19 +314,24 @@ def get_daily_sales_trend_admin():
 @admin_dashboard_bp.route('/profit_trend_daily', methods=['GET'])
 @jwt_required()
 @role_required("admin")
+@cached_dashboard(lambda: [get_admin_store_info(get_jwt_identity())[0]])
 def get_daily_profit_trend_admin():
     """
     Calculates and fetches daily profit trends for the admin dashboard,
     scoped to the logged-in admin's assigned store.
     Profit is calculated as (sale price - unit cost) per item.
+    Accepts the same 'start'/'end'/'granularity' parameters as /sales_trend_daily.
     """
     admin_id = get_jwt_identity()
 
     admin_store_id, _ = get_admin_store_info(admin_id)
 
+    window = parse_trend_window(request.args)
+
     # We need to join Sale, SaleItem, and StoreProduct to get the unit cost for profit calculation
+    bucket_day = day_bucket(Sale.created_at)
     daily_profit_query = db.session.query(
-        cast(Sale.created_at, Date).label('profit_date'),
+        bucket_day,
         func.sum(
             SaleItem.quantity * (SaleItem.price_at_sale - StoreProduct.unit_cost)
         ).label('total_profit')
@@ -332,21 +339,10 @@ def get_daily_profit_trend_admin():
         StoreProduct, (StoreProduct.id == SaleItem.store_product_id) & (StoreProduct.store_id == Sale.store_id)
     ).filter(
         Sale.store_id == admin_store_id,
+        window_filter(Sale.created_at, window),
         Sale.is_deleted == False,
         SaleItem.is_deleted == False,
         StoreProduct.is_deleted == False
-    ).group_by(
-        cast(Sale.created_at, Date)
-    ).order_by(
-        cast(Sale.created_at, Date)
-    ).all()
-
-    # Format the data for the front-end chart
-    profit_trend_data = []
-    for row in daily_profit_query:
-        profit_trend_data.append({
-            "date": row.profit_date.isoformat(),
-            "value": float(row.total_profit) if row.total_profit else 0.0
-        })
+    ).group_by(bucket_day).all()
 
-    return jsonify(profit_trend_data), 200
+    return jsonify(fill_trend(daily_profit_query, window)), 200
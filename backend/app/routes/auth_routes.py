@@ -11,6 +11,8 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
 from app.models import User # Ensure User model is imported
+from app.auth.principal import current_principal, token_claims
+from app.auth.utils import hash_password, needs_rehash
 from app import db # Ensure db is imported
 from datetime import datetime # Import datetime for isoformat()
 
@@ -34,8 +36,7 @@ def role_required(*allowed_roles):
         @wraps(fn)
         @jwt_required()
         def wrapper(*args, **kwargs):
-            user_id = get_jwt_identity()
-            user = User.query.get(int(user_id))
+            user = current_principal()
 
             if user is None or not user.is_active or user.role not in allowed_roles:
                 return jsonify({"error": "Forbidden"}), 403
@@ -102,7 +103,14 @@ def login():
     if not user.is_active:
         return jsonify({"error": "This account has been deactivated"}), 403
 
-    token = create_access_token(identity=str(user.id))
+    # Move hashes made with older Argon2 parameters to the current ones
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+        db.session.commit()
+
+    # Role and store travel in the token so authorization needs no lookup;
+    # the token version lets role/store/active changes retire it
+    token = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
 
     # ✅ FIX: Include all required fields from userSchema in the response
     return jsonify(
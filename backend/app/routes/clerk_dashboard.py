@@ -2,6 +2,8 @@
 from flask import Blueprint, jsonify, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.routes.auth_routes import role_required
+from app.auth.principal import current_principal, store_name
+from app.cache import cached_dashboard
 from app.models import db, Product, StoreProduct, User, Store
 from sqlalchemy import func
 
@@ -13,19 +15,23 @@ def get_clerk_store_info(user_id):
     Retrieves the store ID and name for a given clerk user.
     Aborts with a 403 error if the user is not a valid clerk with an assigned store.
     """
-    user = User.query.get(user_id)
+    # Resolved once per request by role_required, from the token claims when current
+    user = current_principal()
+    if user is not None and str(user.id) != str(user_id):
+        user = None
     if not user or user.role != 'clerk' or not user.store_id:
         # Prevent access if the user is not a clerk or not associated with a store.
         abort(403, description="Access forbidden: Clerk not associated with a valid store.")
-    store = Store.query.get(user.store_id)
-    if not store:
+    name = store_name(user.store_id)
+    if name is None:
         # Prevent access if the clerk's assigned store does not exist.
         abort(403, description="Access forbidden: Clerk's store not found.")
-    return user.store_id, store.name
+    return user.store_id, name
 
 @clerk_dashboard_bp.route('/summary', methods=['GET'])
 @jwt_required()
 @role_required("clerk")
+@cached_dashboard(lambda: [get_clerk_store_info(get_jwt_identity())[0]])
 def get_clerk_dashboard_summary():
     """
     Fetches low stock and out of stock items for the clerk dashboard,
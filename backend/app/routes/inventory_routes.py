@@ -1,15 +1,28 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from app.models import db, Category, Product, Purchase, PurchaseItem, StoreProduct, Supplier, Store
+from app.services.cost_basis_services import purchase_contributions, apply_cost_basis_changes
+from app.services.ledger_services import stock_as_of, reconcile_stock
+from app.services.catalog_services import import_products, catalog_version, IMPORT_BATCH_SIZE
+from app.services.catalog_search_services import search_products, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from app.errors import BadRequestError, NotFoundError
 from flask_jwt_extended import jwt_required # Assuming JWT protection will be added later
+from sqlalchemy import or_, tuple_
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError # Import these for better error handling in create_supplier (good practice)
 import logging # Import logging to use it for errors
+import base64
+import codecs
+import hashlib
+import json
+from datetime import datetime, time
 
 # Set up a logger for this blueprint
 logger = logging.getLogger(__name__)
 
 inventory_bp = Blueprint('inventory', __name__, url_prefix="/api/inventory")
 
+MAX_CATALOG_PAGE_SIZE = 500
+
 # --- CATEGORY ROUTES ---
 
 @inventory_bp.route('/categories', methods=['GET'])
@@ -220,16 +233,106 @@ def delete_category(id):
 
 # -------------------- PRODUCT ROUTES --------------------
 
+def _catalog_listing_query():
+    """
+    Projected query for one row per live product with its category name
+    joined in, so listing the catalog never lazy-loads categories.
+    """
+    return db.session.query(
+        Product.id,
+        Product.name,
+        Product.sku,
+        Product.unit,
+        Product.description,
+        Product.image_url,
+        Product.category_id,
+        Category.name.label('category_name'),
+        Product.created_at,
+        Product.updated_at
+    ).select_from(Product)\
+     .outerjoin(Category, Product.category_id == Category.id)\
+     .filter(Product.is_deleted == False)
+
+
+def _serialize_product_row(row):
+    """Same shape as Product.to_dict()."""
+    return {
+        "id": row.id,
+        "name": row.name,
+        "sku": row.sku,
+        "unit": row.unit,
+        "description": row.description,
+        "image_url": row.image_url,
+        "category": row.category_name,
+        "category_id": row.category_id,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+    }
+
+
+def _encode_catalog_cursor(row):
+    """Opaque cursor pointing just past `row` in (name, id) order."""
+    raw = json.dumps([row.name, row.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_catalog_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        name, product_id = json.loads(raw)
+        return str(name), int(product_id)
+    except (ValueError, TypeError):
+        raise BadRequestError("Invalid cursor.")
+
+
+def _catalog_etag():
+    """Strong ETag for this listing request: the catalog version plus the query arguments."""
+    args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return hashlib.sha1(f"{catalog_version()}|{args}".encode()).hexdigest()
+
+
 @inventory_bp.route('/products', methods=['GET'])
 def get_products():
     """
-    Get a list of all products.
+    Get the product catalog, ordered by name.
+    Without `cursor` every matching product is returned as a list. Passing
+    `cursor` (empty for the first page) switches to keyset pagination on
+    (name, id) and returns a page object with `next_cursor` (null on the last
+    page). Responses carry a strong ETag that changes whenever any product or
+    category changes; send it back in If-None-Match to get a 304.
     ---
     tags:
       - Inventory - Products
+    parameters:
+      - name: category_id
+        in: query
+        type: integer
+        required: false
+        description: Only products in this category.
+      - name: search
+        in: query
+        type: string
+        required: false
+        description: Case-insensitive substring of the product name or SKU.
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Keyset pagination cursor; empty for the first page, then the previous page's next_cursor.
+      - name: per_page
+        in: query
+        type: integer
+        required: false
+        default: 50
+        description: Page size when paginating (at most 500).
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag of a previous response.
     responses:
       200:
-        description: A list of products.
+        description: A list of products, or a page of them when `cursor` is given.
         schema:
           type: array
           items:
@@ -248,6 +351,10 @@ def get_products():
               category_id:
                 type: integer
                 example: 1
+              category:
+                type: string
+                nullable: true
+                example: Electronics
               unit:
                 type: string
                 example: pcs
@@ -255,12 +362,121 @@ def get_products():
                 type: string
                 nullable: true
                 example: LAP-HP-001
-              is_deleted:
-                type: boolean
-                example: false
+      304:
+        description: The catalog has not changed since the ETag in If-None-Match.
+      400:
+        description: Invalid cursor.
+    """
+    # Read the version before the rows: a change committed in between can only
+    # make the tag older than the content, which costs a refetch, never a stale 304
+    etag = _catalog_etag()
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    query = _catalog_listing_query()
+    category_id = request.args.get('category_id', type=int)
+    if category_id is not None:
+        query = query.filter(Product.category_id == category_id)
+    search = (request.args.get('search') or '').strip()
+    if search:
+        pattern = f"%{search}%"
+        query = query.filter(or_(Product.name.ilike(pattern), Product.sku.ilike(pattern)))
+    query = query.order_by(Product.name, Product.id)
+
+    cursor = request.args.get('cursor', type=str)
+    if cursor is not None:
+        per_page = min(max(request.args.get('per_page', default=50, type=int), 1), MAX_CATALOG_PAGE_SIZE)
+        if cursor:
+            try:
+                after_name, after_id = _decode_catalog_cursor(cursor)
+            except BadRequestError as e:
+                return jsonify({"message": e.message}), e.status_code
+            query = query.filter(tuple_(Product.name, Product.id) > tuple_(after_name, after_id))
+        # One extra row tells us whether another page exists without counting
+        rows = query.limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        response = jsonify({
+            "products": [_serialize_product_row(row) for row in rows],
+            "next_cursor": _encode_catalog_cursor(rows[-1]) if has_more else None,
+            "per_page": per_page
+        })
+    else:
+        response = jsonify([_serialize_product_row(row) for row in query])
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response, 200
+
+@inventory_bp.route('/search', methods=['GET'])
+def search_catalog():
+    """
+    Typeahead search over products by SKU or name prefix, e.g. for barcode
+    and name lookup at the till. Served from an in-process index that is
+    rebuilt whenever the catalog changes.
+    ---
+    tags:
+      - Inventory - Products
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Prefix of a SKU, a product name or any word of the name (case-insensitive).
+        example: coca
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 10
+        description: Maximum number of matches (at most 50).
+      - name: store_id
+        in: query
+        type: integer
+        required: false
+        description: Include this store's store_product_id, price and quantity_in_stock for each match.
+    responses:
+      200:
+        description: Best matches first (exact SKU, SKU prefix, name prefix, word prefix).
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              id:
+                type: integer
+                example: 7
+              name:
+                type: string
+                example: Coca-Cola 500ml
+              sku:
+                type: string
+                example: "5449000000996"
+              unit:
+                type: string
+                example: pcs
+              category:
+                type: string
+                nullable: true
+                example: Drinks
+              store_product_id:
+                type: integer
+                nullable: true
+              price:
+                type: number
+                nullable: true
+              quantity_in_stock:
+                type: integer
+                nullable: true
     """
-    products = Product.query.filter_by(is_deleted=False).all()
-    return jsonify([product.to_dict() for product in products]), 200
+    term = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', default=DEFAULT_SEARCH_LIMIT, type=int), 1), MAX_SEARCH_LIMIT)
+    store_id = request.args.get('store_id', type=int)
+    return jsonify(search_products(term, limit=limit, store_id=store_id)), 200
+
 
 @inventory_bp.route('/products', methods=['POST'])
 # @jwt_required() # Uncomment if you want to protect this route
@@ -493,6 +709,87 @@ def delete_product(id):
     db.session.commit()
     return jsonify({'message': 'Product deleted'}), 200
 
+
+@inventory_bp.route('/products/import', methods=['POST'])
+# @jwt_required() # Uncomment if you want to protect this route
+def import_products_csv():
+    """
+    Bulk-import products from a CSV file, optionally stocking them in a store.
+    Send the CSV as the raw request body (text/csv) or as a multipart 'file'.
+    Products are upserted by sku in batches; rows that fail validation are
+    reported and skipped.
+    ---
+    tags:
+      - Inventory - Products
+    consumes:
+      - text/csv
+      - multipart/form-data
+    parameters:
+      - name: store_id
+        in: query
+        type: integer
+        required: false
+        description: Also create or update each product's StoreProduct row in this store (needs price and unit_cost columns).
+        example: 1
+      - name: file
+        in: formData
+        type: file
+        required: false
+        description: "CSV with a header row. Columns: sku, name, unit (required), description, category (name), price, unit_cost, low_stock_threshold."
+    responses:
+      200:
+        description: Import summary.
+        schema:
+          type: object
+          properties:
+            rows:
+              type: integer
+              example: 3
+            products:
+              type: integer
+              example: 2
+            store_products:
+              type: integer
+              example: 2
+            error_count:
+              type: integer
+              example: 1
+            errors:
+              type: array
+              items:
+                type: object
+                properties:
+                  line:
+                    type: integer
+                    example: 4
+                  sku:
+                    type: string
+                    example: SPH-SAM-007
+                  error:
+                    type: string
+                    example: Unknown category 'Phones'.
+      400:
+        description: Missing or unreadable CSV, or a header without the required columns.
+      404:
+        description: Store not found.
+    """
+    store_id = request.args.get('store_id', type=int)
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    try:
+        summary = import_products(
+            codecs.iterdecode(stream, 'utf-8-sig'),
+            store_id=store_id,
+            batch_size=current_app.config.get('PRODUCT_IMPORT_BATCH_SIZE', IMPORT_BATCH_SIZE)
+        )
+    except (BadRequestError, NotFoundError) as e:
+        db.session.rollback()
+        return jsonify({"message": e.message}), e.status_code
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({"message": "CSV must be UTF-8 encoded."}), 400
+    return jsonify(summary), 200
+
 # -------------------- SUPPLIER ROUTES --------------------
 
 @inventory_bp.route('/suppliers', methods=['POST'])
@@ -834,6 +1131,7 @@ def create_purchase():
         )
         db.session.add(purchase_item)
 
+    apply_cost_basis_changes({}, purchase_contributions([purchase.id]))
     db.session.commit()
     return jsonify(purchase.to_dict()), 201
 
@@ -1036,7 +1334,9 @@ def get_stock_by_store(store_id):
         return jsonify({"message": "Store not found"}), 404
 
     # Start with a base query that includes joined product details
-    query = db.session.query(StoreProduct, Product).join(Product).filter(
+    query = db.session.query(StoreProduct, Product, Category.name).select_from(StoreProduct)\
+        .join(Product, StoreProduct.product_id == Product.id)\
+        .outerjoin(Category, Product.category_id == Category.id).filter(
         StoreProduct.store_id == store_id,
         StoreProduct.is_deleted == False
     )
@@ -1075,7 +1375,7 @@ def get_stock_by_store(store_id):
     store_products_with_products = query.all()
 
     results = []
-    for sp, product in store_products_with_products:
+    for sp, product, category_name in store_products_with_products:
         # sp is the StoreProduct object, product is the joined Product object
         results.append({
             'store_product_id': sp.id,
@@ -1088,7 +1388,127 @@ def get_stock_by_store(store_id):
             'low_stock_threshold': sp.low_stock_threshold,
             'last_updated': sp.last_updated.isoformat() if sp.last_updated else None,
             'category_id': product.category_id, # Include category_id in the response for debugging/frontend
-            'category_name': product.category.name if product.category else None # Include category name
+            'category_name': category_name # Joined in the query above, not lazy-loaded per row
         })
 
-    return jsonify(results), 200
\ No newline at end of file
+    return jsonify(results), 200
+
+
+@inventory_bp.route('/stock/<int:store_id>/as-of', methods=['GET'])
+def get_stock_as_of(store_id):
+    """
+    Get a store's stock levels as they were at a point in time, rebuilt from
+    the latest stock snapshot before it plus the stock movements since.
+    ---
+    tags:
+      - Inventory - Stock
+    parameters:
+      - name: store_id
+        in: path
+        type: integer
+        required: true
+        example: 1
+      - name: at
+        in: query
+        type: string
+        required: true
+        description: ISO 8601 date or date-time (UTC). A bare date means the end of that day.
+        example: "2024-07-18"
+    responses:
+      200:
+        description: Stock level per product at the requested time.
+        schema:
+          type: object
+          properties:
+            store_id:
+              type: integer
+            as_of:
+              type: string
+              format: date-time
+            snapshot_taken_at:
+              type: string
+              format: date-time
+              nullable: true
+            items:
+              type: array
+              items:
+                type: object
+                properties:
+                  product_id:
+                    type: integer
+                  product_name:
+                    type: string
+                  quantity_in_stock:
+                    type: integer
+      400:
+        description: Missing or invalid 'at'.
+      404:
+        description: Store not found.
+    """
+    store = Store.query.get(store_id)
+    if not store:
+        return jsonify({"message": "Store not found"}), 404
+
+    at = request.args.get('at')
+    try:
+        as_of = datetime.fromisoformat(at)
+    except (TypeError, ValueError):
+        return jsonify({"message": "'at' must be an ISO 8601 date or date-time."}), 400
+    if len(at) == 10:  # a bare date covers the whole day
+        as_of = datetime.combine(as_of.date(), time.max)
+
+    levels, snapshot_taken_at = stock_as_of(store_id, as_of)
+    names = dict(db.session.query(Product.id, Product.name).filter(Product.id.in_(levels.keys()))) if levels else {}
+    return jsonify({
+        'store_id': store_id,
+        'as_of': as_of.isoformat(),
+        'snapshot_taken_at': snapshot_taken_at.isoformat() if snapshot_taken_at else None,
+        'items': [
+            {'product_id': product_id, 'product_name': names.get(product_id), 'quantity_in_stock': quantity}
+            for product_id, quantity in sorted(levels.items())
+        ]
+    }), 200
+
+
+@inventory_bp.route('/stock/<int:store_id>/reconcile', methods=['GET'])
+def reconcile_store_stock(store_id):
+    """
+    Compare a store's current stock levels with the stock ledger.
+    ---
+    tags:
+      - Inventory - Stock
+    parameters:
+      - name: store_id
+        in: path
+        type: integer
+        required: true
+        example: 1
+    responses:
+      200:
+        description: Products whose quantity_in_stock differs from the ledger (empty when in balance).
+        schema:
+          type: object
+          properties:
+            store_id:
+              type: integer
+            discrepancies:
+              type: array
+              items:
+                type: object
+                properties:
+                  product_id:
+                    type: integer
+                  ledger_quantity:
+                    type: integer
+                  quantity_in_stock:
+                    type: integer
+                  difference:
+                    type: integer
+      404:
+        description: Store not found.
+    """
+    store = Store.query.get(store_id)
+    if not store:
+        return jsonify({"message": "Store not found"}), 404
+
+    return jsonify({'store_id': store_id, 'discrepancies': reconcile_stock(store_id)}), 200
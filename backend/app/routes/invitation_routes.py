@@ -3,8 +3,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 # Remove flask_cors import since global CORS handles it
 from app.models import User, Store, InvitationToken, db
-from app.services.email_service import EmailService
+from app.services.email_service import EmailService, notify_outbox
 from app.routes.auth_routes import role_required, EMAIL_REGEX
+from app.auth.principal import current_principal
 from sqlalchemy import func
 from http import HTTPStatus
 from datetime import datetime
@@ -87,26 +88,20 @@ def send_invitation():
         )
         
         db.session.add(invitation)
-        db.session.commit()
-        
-        # Send email - FIXED TO HANDLE TUPLE RETURN
-        success, message = EmailService.send_invitation_email(
+        # The email is queued in the same transaction and sent by the outbox worker
+        EmailService.queue_invitation_email(
             email=email,
             token=invitation.token,
             inviter_name=current_user.name,
             role=role  # Pass role instead of store_name
         )
-        
-        if not success:
-            # Rollback the invitation if email fails
-            db.session.delete(invitation)
-            db.session.commit()
-            return jsonify({"error": f"Failed to send invitation email: {message}"}), HTTPStatus.INTERNAL_SERVER_ERROR
+        db.session.commit()
+        notify_outbox()
         
         return jsonify({
             "message": "Invitation sent successfully",
             "invitation": invitation.to_dict(),
-            "email_status": message
+            "email_status": "queued"
         }), HTTPStatus.CREATED
         
     except Exception as e:
@@ -239,7 +234,7 @@ def get_pending_invitations():
     verify_jwt_in_request()
     
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != "merchant" or not current_user.is_active:
         return jsonify({"error": "Only active merchants can view invitations"}), HTTPStatus.FORBIDDEN
@@ -278,7 +273,7 @@ def cancel_invitation(token):
     verify_jwt_in_request()
     
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != "merchant" or not current_user.is_active:
         return jsonify({"error": "Only active merchants can cancel invitations"}), HTTPStatus.FORBIDDEN
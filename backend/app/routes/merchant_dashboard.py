@@ -1,8 +1,14 @@
-from flask import Blueprint, jsonify, request, abort
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, jsonify, request, abort, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.routes.auth_routes import role_required
-from app.models import db, Product, StoreProduct, Purchase, StockTransfer, PurchaseItem, StockTransferItem, Supplier, User, Store, Sale, SaleItem
+from app.cache import cached_dashboard, ALL_STORES
+from app.models import db, Product, StoreProduct, Purchase, StockTransfer, PurchaseItem, StockTransferItem, Supplier, User, Store, Sale, SaleItem, ProductCostBasis
 from sqlalchemy import func, distinct, cast, String, Date
+from sqlalchemy.orm import aliased
+from app.services.trend_services import parse_trend_window, window_filter, day_bucket, fill_trend
+from app.services.cost_basis_services import average_cost_column
 from datetime import datetime, timedelta
 from decimal import Decimal
 
@@ -12,43 +18,80 @@ merchant_dashboard_bp = Blueprint('merchant_dashboard', __name__, url_prefix='/d
 # The get_merchant_stores_ids helper is no longer needed
 # as the merchant role is a superuser and can view all stores directly.
 
-@merchant_dashboard_bp.route('/summary', methods=['GET'])
-# @jwt_required()
-# @role_required("merchant") # Only merchants can access this dashboard summary
-def get_merchant_dashboard_summary():
+def _merchant_cache_scope():
+    """Cache scope of a merchant request: the selected store, or all stores."""
+    selected_store_id_param = request.args.get('store_id')
+    if selected_store_id_param and selected_store_id_param.isdigit():
+        return [int(selected_store_id_param)]
+    return ALL_STORES
+
+
+def _stock_item_rows(*conditions, limit=None):
     """
-    Fetches summary statistics for the merchant dashboard.
-    As a superuser, the merchant can view data across all active stores by default,
-    or filter by a specific store using the 'store_id' query parameter.
+    Live StoreProduct rows matching `conditions`, projected together with the
+    product and store names in a single query.
+    """
+    query = db.session.query(
+        StoreProduct.product_id,
+        Product.name.label('product_name'),
+        StoreProduct.quantity_in_stock,
+        StoreProduct.low_stock_threshold,
+        Store.name.label('store_name')
+    ).join(Product, Product.id == StoreProduct.product_id)\
+     .outerjoin(Store, Store.id == StoreProduct.store_id)\
+     .filter(*conditions, StoreProduct.is_deleted == False)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+EMPTY_SUMMARY = {
+    "total_items": 0, "total_stock": 0, "low_stock_count": 0, "out_of_stock_count": 0,
+    "low_stock_items": [], "out_of_stock_items": [], "in_stock_items": [],
+    "recent_purchases": [], "recent_transfers": [], "inventory_value": 0.0,
+    "total_purchase_value": 0.0, "supplier_spending_trends": []
+}
+
+
+def _active_store_ids():
+    return [store_id for (store_id,) in db.session.query(Store.id).filter(Store.is_deleted == False)]
+
+
+def _resolve_store_scope():
+    """
+    Reads the 'store_id' query parameter and returns (all_active_store_ids,
+    query_store_ids): the selected store, or every active store for 'all' /
+    no parameter. Aborts with 404 for an unknown or inactive store and 400
+    for a malformed id.
     """
     selected_store_id_param = request.args.get('store_id')
 
     # Start with all active store IDs in the system
-    all_active_store_ids = [s.id for s in Store.query.filter_by(is_deleted=False).all()]
-
+    all_active_store_ids = _active_store_ids()
     if not all_active_store_ids:
-        # If there are no active stores at all, return empty dashboard data
-        return jsonify({
-            "total_items": 0, "total_stock": 0, "low_stock_count": 0, "out_of_stock_count": 0,
-            "low_stock_items": [], "out_of_stock_items": [], "in_stock_items": [],
-            "recent_purchases": [], "recent_transfers": [], "inventory_value": 0.0,
-            "total_purchase_value": 0.0, "supplier_spending_trends": []
-        }), 200
-
-    # Determine the store IDs to query against based on selected_store_id_param
-    query_store_ids = []
+        return [], []
+
     if selected_store_id_param and selected_store_id_param.lower() != 'all':
         try:
             selected_store_id_int = int(selected_store_id_param)
-            # Ensure the requested store ID is valid and active
-            if selected_store_id_int not in all_active_store_ids:
-                abort(404, description="Store not found or is inactive.")
-            query_store_ids = [selected_store_id_int]
         except ValueError:
             abort(400, description="Invalid 'store_id' provided. Must be an integer or 'all'.")
-    else:
-        # If 'all' or no store_id is provided, query all active stores
-        query_store_ids = all_active_store_ids
+        # Ensure the requested store ID is valid and active
+        if selected_store_id_int not in all_active_store_ids:
+            abort(404, description="Store not found or is inactive.")
+        return all_active_store_ids, [selected_store_id_int]
+
+    # If 'all' or no store_id is provided, query all active stores
+    return all_active_store_ids, all_active_store_ids
+
+
+# --- Panels ---
+# Each panel takes an already-resolved store scope and returns plain data, so
+# the individual endpoints and /bootstrap share the same computation.
+
+def _summary_panel(query_store_ids):
+    """Stock, purchase and transfer summary for the given stores."""
+    if not query_store_ids:
+        return dict(EMPTY_SUMMARY)
 
     # --- Construct dynamic filter conditions ---
     # These filters will be used in the queries below
@@ -74,60 +117,54 @@ def get_merchant_dashboard_summary():
         .filter(store_product_filter_condition, StoreProduct.is_deleted == False)
     total_stock = total_stock_query.scalar() or 0
 
-    # Low Stock Items
-    low_stock_store_products = StoreProduct.query.filter(
+    # Low / Out of / In Stock Items: one projected query per list, joined to
+    # the product and store names instead of loading them row by row
+    low_stock_rows = _stock_item_rows(
         store_product_filter_condition,
         StoreProduct.quantity_in_stock <= StoreProduct.low_stock_threshold,
-        StoreProduct.quantity_in_stock > 0,
-        StoreProduct.is_deleted == False
-    ).all()
-    low_stock_count = len(low_stock_store_products)
-    low_stock_items_data = []
-    for sp in low_stock_store_products:
-        product = Product.query.get(sp.product_id)
-        if product:
-            low_stock_items_data.append({
-                "id": product.id,
-                "name": product.name,
-                "stock_level": sp.quantity_in_stock,
-                "threshold": sp.low_stock_threshold,
-                "store_name": sp.store.name if sp.store else "N/A" # Include store name for clarity
-            })
-
-    # Out of Stock Items
-    out_of_stock_store_products = StoreProduct.query.filter(
+        StoreProduct.quantity_in_stock > 0
+    )
+    low_stock_count = len(low_stock_rows)
+    low_stock_items_data = [
+        {
+            "id": row.product_id,
+            "name": row.product_name,
+            "stock_level": row.quantity_in_stock,
+            "threshold": row.low_stock_threshold,
+            "store_name": row.store_name or "N/A" # Include store name for clarity
+        }
+        for row in low_stock_rows
+    ]
+
+    out_of_stock_rows = _stock_item_rows(
         store_product_filter_condition,
-        StoreProduct.quantity_in_stock == 0,
-        StoreProduct.is_deleted == False
-    ).all()
-    out_of_stock_count = len(out_of_stock_store_products)
-    out_of_stock_items_data = []
-    for sp in out_of_stock_store_products:
-        product = Product.query.get(sp.product_id)
-        if product:
-            out_of_stock_items_data.append({
-                "id": product.id,
-                "name": product.name,
-                "stock_level": sp.quantity_in_stock,
-                "store_name": sp.store.name if sp.store else "N/A" # Include store name for clarity
-            })
+        StoreProduct.quantity_in_stock == 0
+    )
+    out_of_stock_count = len(out_of_stock_rows)
+    out_of_stock_items_data = [
+        {
+            "id": row.product_id,
+            "name": row.product_name,
+            "stock_level": row.quantity_in_stock,
+            "store_name": row.store_name or "N/A"
+        }
+        for row in out_of_stock_rows
+    ]
 
     # In Stock Items (a few examples)
-    in_stock_store_products = StoreProduct.query.filter(
-        store_product_filter_condition,
-        StoreProduct.quantity_in_stock > StoreProduct.low_stock_threshold,
-        StoreProduct.is_deleted == False
-    ).limit(5).all() # Limit to avoid fetching too much data
-    in_stock_items_data = []
-    for sp in in_stock_store_products:
-        product = Product.query.get(sp.product_id)
-        if product:
-            in_stock_items_data.append({
-                "id": product.id,
-                "name": product.name,
-                "stock_level": sp.quantity_in_stock,
-                "store_name": sp.store.name if sp.store else "N/A" # Include store name for clarity
-            })
+    in_stock_items_data = [
+        {
+            "id": row.product_id,
+            "name": row.product_name,
+            "stock_level": row.quantity_in_stock,
+            "store_name": row.store_name or "N/A"
+        }
+        for row in _stock_item_rows(
+            store_product_filter_condition,
+            StoreProduct.quantity_in_stock > StoreProduct.low_stock_threshold,
+            limit=5 # Limit to avoid fetching too much data
+        )
+    ]
 
     # Inventory Value
     inventory_value_query = db.session.query(func.sum(StoreProduct.quantity_in_stock * StoreProduct.price))\
@@ -145,37 +182,47 @@ def get_merchant_dashboard_summary():
     total_purchase_value = total_purchase_value_query.scalar() or Decimal('0.00')
 
     # Recent Purchases
-    recent_purchases_data = []
-    purchases = Purchase.query.filter(
+    purchases = db.session.query(
+        Purchase.id, Purchase.notes, Purchase.date,
+        Store.name.label('store_name'), Supplier.name.label('supplier_name')
+    ).outerjoin(Store, Store.id == Purchase.store_id)\
+     .outerjoin(Supplier, Supplier.id == Purchase.supplier_id)\
+     .filter(
         purchase_filter_condition,
         Purchase.is_deleted == False
     ).order_by(Purchase.date.desc()).limit(5).all()
-    for p in purchases:
-        recent_purchases_data.append({
+    recent_purchases_data = [
+        {
             "id": p.id,
             "notes": p.notes,
             "purchase_date": p.date.isoformat() if p.date else None,
-            "store_name": p.store.name if p.store else "N/A",
-            "supplier_name": p.supplier.name if p.supplier else "N/A"
-        })
+            "store_name": p.store_name or "N/A",
+            "supplier_name": p.supplier_name or "N/A"
+        }
+        for p in purchases
+    ]
 
     # Recent Transfers
-    recent_transfers_data = []
-    transfers = StockTransfer.query.filter(
+    from_store, to_store = aliased(Store), aliased(Store)
+    transfers = db.session.query(
+        StockTransfer.id, StockTransfer.notes, StockTransfer.transfer_date,
+        from_store.name.label('from_store_name'), to_store.name.label('to_store_name')
+    ).outerjoin(from_store, from_store.id == StockTransfer.from_store_id)\
+     .outerjoin(to_store, to_store.id == StockTransfer.to_store_id)\
+     .filter(
         transfer_filter_condition,
         StockTransfer.is_deleted == False
     ).order_by(StockTransfer.transfer_date.desc()).limit(5).all()
-    
-    for t in transfers:
-        from_store_name = Store.query.get(t.from_store_id).name if t.from_store_id else "N/A"
-        to_store_name = Store.query.get(t.to_store_id).name if t.to_store_id else "N/A"
-        recent_transfers_data.append({
+    recent_transfers_data = [
+        {
             "id": t.id,
             "notes": t.notes,
             "date": t.transfer_date.isoformat() if t.transfer_date else None,
-            "from_store": from_store_name,
-            "to_store": to_store_name
-        })
+            "from_store": t.from_store_name or "N/A",
+            "to_store": t.to_store_name or "N/A"
+        }
+        for t in transfers
+    ]
     
     # Supplier Spending Trends
     supplier_spending_trends_data = []
@@ -216,34 +263,13 @@ def get_merchant_dashboard_summary():
         "supplier_spending_trends": supplier_spending_trends_data
     }
 
-    return jsonify(summary_data), 200
+    return summary_data
 
-### /dashboard/movements Route
-@merchant_dashboard_bp.route('/movements', methods=['GET'])
-# @jwt_required()
-# @role_required("merchant")
-def get_merchant_dashboard_movements():
-    """
-    Fetches recent inventory movements (purchases and stock transfers) for the merchant dashboard.
-    Can be filtered by a specific store using the 'store_id' query parameter.
-    """
-    selected_store_id_param = request.args.get('store_id')
 
-    all_active_store_ids = [s.id for s in Store.query.filter_by(is_deleted=False).all()]
-    if not all_active_store_ids:
-        return jsonify([]), 200 # No active stores means no movements
-
-    query_store_ids = []
-    if selected_store_id_param and selected_store_id_param.lower() != 'all':
-        try:
-            selected_store_id_int = int(selected_store_id_param)
-            if selected_store_id_int not in all_active_store_ids:
-                abort(404, description="Store not found or is inactive.")
-            query_store_ids = [selected_store_id_int]
-        except ValueError:
-            abort(400, description="Invalid 'store_id' provided. Must be an integer or 'all'.")
-    else:
-        query_store_ids = all_active_store_ids
+def _movements_panel(query_store_ids):
+    """The 10 most recent purchase and transfer lines touching the given stores."""
+    if not query_store_ids:
+        return []
 
     purchase_filter_condition = Purchase.store_id.in_(query_store_ids)
     transfer_filter_condition = (
@@ -253,200 +279,125 @@ def get_merchant_dashboard_movements():
 
     all_movements = []
 
-    # Fetch recent purchase items (last 10)
-    purchase_items = PurchaseItem.query.join(Purchase)\
-        .filter(
-            purchase_filter_condition,
-            PurchaseItem.is_deleted == False,
-            Purchase.is_deleted == False
-        ).order_by(PurchaseItem.created_at.desc()).limit(10).all()
+    # Fetch recent purchase items (last 10), with product, store and supplier names joined in
+    purchase_items = db.session.query(
+        PurchaseItem.id, PurchaseItem.quantity, Product.name.label('product_name'),
+        Purchase.date, Purchase.notes,
+        Store.name.label('store_name'), Supplier.name.label('supplier_name')
+    ).join(Purchase, Purchase.id == PurchaseItem.purchase_id)\
+     .join(Product, Product.id == PurchaseItem.product_id)\
+     .outerjoin(Store, Store.id == Purchase.store_id)\
+     .outerjoin(Supplier, Supplier.id == Purchase.supplier_id)\
+     .filter(
+        purchase_filter_condition,
+        PurchaseItem.is_deleted == False,
+        Purchase.is_deleted == False
+    ).order_by(PurchaseItem.created_at.desc()).limit(10).all()
     for pi in purchase_items:
-        product = Product.query.get(pi.product_id)
-        purchase = Purchase.query.get(pi.purchase_id)
-        if product and purchase:
-            all_movements.append({
-                "id": pi.id,
-                "type": "Purchase",
-                "quantity": pi.quantity,
-                "product_name": product.name,
-                "date": purchase.date.isoformat() if purchase.date else None,
-                "store_name": purchase.store.name if purchase.store else "N/A", # Indicate which store this purchase was for
-                "source_or_destination": purchase.supplier.name if purchase.supplier else "N/A",
-                "notes": purchase.notes or "N/A"
-            })
+        all_movements.append({
+            "id": pi.id,
+            "type": "Purchase",
+            "quantity": pi.quantity,
+            "product_name": pi.product_name,
+            "date": pi.date.isoformat() if pi.date else None,
+            "store_name": pi.store_name or "N/A", # Indicate which store this purchase was for
+            "source_or_destination": pi.supplier_name or "N/A",
+            "notes": pi.notes or "N/A"
+        })
 
     # Fetch recent stock transfer items (last 10)
-    stock_transfer_items = StockTransferItem.query.join(StockTransfer)\
-        .filter(
-            transfer_filter_condition,
-            StockTransferItem.is_deleted == False,
-            StockTransfer.is_deleted == False
-        ).order_by(StockTransferItem.created_at.desc()).limit(10).all()
+    from_store, to_store = aliased(Store), aliased(Store)
+    stock_transfer_items = db.session.query(
+        StockTransferItem.id, StockTransferItem.quantity, Product.name.label('product_name'),
+        StockTransfer.transfer_date, StockTransfer.notes,
+        from_store.name.label('from_store_name'), to_store.name.label('to_store_name')
+    ).join(StockTransfer, StockTransfer.id == StockTransferItem.stock_transfer_id)\
+     .join(Product, Product.id == StockTransferItem.product_id)\
+     .outerjoin(from_store, from_store.id == StockTransfer.from_store_id)\
+     .outerjoin(to_store, to_store.id == StockTransfer.to_store_id)\
+     .filter(
+        transfer_filter_condition,
+        StockTransferItem.is_deleted == False,
+        StockTransfer.is_deleted == False
+    ).order_by(StockTransferItem.created_at.desc()).limit(10).all()
     for sti in stock_transfer_items:
-        product = Product.query.get(sti.product_id)
-        transfer = StockTransfer.query.get(sti.stock_transfer_id)
-        if product and transfer:
-            from_store_name = Store.query.get(transfer.from_store_id).name if transfer.from_store_id else "N/A"
-            to_store_name = Store.query.get(transfer.to_store_id).name if transfer.to_store_id else "N/A"
-            
-            all_movements.append({
-                "id": sti.id,
-                "type": "Transfer",
-                "quantity": sti.quantity,
-                "product_name": product.name,
-                "date": transfer.transfer_date.isoformat() if transfer.transfer_date else None,
-                "source_or_destination": f"{from_store_name} -> {to_store_name}",
-                "notes": transfer.notes or "N/A"
-            })
+        all_movements.append({
+            "id": sti.id,
+            "type": "Transfer",
+            "quantity": sti.quantity,
+            "product_name": sti.product_name,
+            "date": sti.transfer_date.isoformat() if sti.transfer_date else None,
+            "source_or_destination": f"{sti.from_store_name or 'N/A'} -> {sti.to_store_name or 'N/A'}",
+            "notes": sti.notes or "N/A"
+        })
     
     # Sort all movements by date, descending, and return top 10
     all_movements.sort(key=lambda x: x['date'] if x['date'] else '', reverse=True)
 
-    return jsonify(all_movements[:10]), 200
-
-### /dashboard/sales_trend_daily Route
-@merchant_dashboard_bp.route('/sales_trend_daily', methods=['GET'])
-# @jwt_required()
-# @role_required("merchant")
-def get_daily_sales_trend():
-    """
-    Fetches daily total sales trend for the merchant dashboard.
-    Can be filtered by a specific store using the 'store_id' query parameter.
-    """
-    selected_store_id_param = request.args.get('store_id')
+    return all_movements[:10]
 
-    all_active_store_ids = [s.id for s in Store.query.filter_by(is_deleted=False).all()]
-    if not all_active_store_ids:
-        return jsonify([]), 200
 
-    query_store_ids = []
-    if selected_store_id_param and selected_store_id_param.lower() != 'all':
-        try:
-            selected_store_id_int = int(selected_store_id_param)
-            if selected_store_id_int not in all_active_store_ids:
-                abort(404, description="Store not found or is inactive.")
-            query_store_ids = [selected_store_id_int]
-        except ValueError:
-            abort(400, description="Invalid 'store_id' provided. Must be an integer or 'all'.")
-    else:
-        query_store_ids = all_active_store_ids
+def _sales_trend_panel(query_store_ids, window):
+    """Sales revenue per day/week/month bucket of `window` for the given stores."""
+    if not query_store_ids:
+        return []
 
     sales_filter_condition = Sale.store_id.in_(query_store_ids)
 
+    # Group by day inside the requested window only; fill_trend rolls days up and fills gaps
+    bucket_day = day_bucket(Sale.created_at)
     daily_sales = db.session.query(
-        cast(Sale.created_at, Date).label('sale_date'),
+        bucket_day,
         func.sum(SaleItem.quantity * SaleItem.price_at_sale).label('total_sales')
     ).join(SaleItem, Sale.id == SaleItem.sale_id).filter(
         sales_filter_condition,
+        window_filter(Sale.created_at, window),
         Sale.is_deleted == False,
         SaleItem.is_deleted == False
-    ).group_by(
-        cast(Sale.created_at, Date)
-    ).order_by(
-        cast(Sale.created_at, Date)
-    ).all()
-
-    sales_trend_data = []
-    for row in daily_sales:
-        sales_trend_data.append({
-            "date": row.sale_date.isoformat(),
-            "value": float(row.total_sales)
-        })
-    return jsonify(sales_trend_data), 200
+    ).group_by(bucket_day).all()
 
-### /dashboard/profit_trend_daily Route
-@merchant_dashboard_bp.route('/profit_trend_daily', methods=['GET'])
-# @jwt_required()
-# @role_required("merchant")
-def get_daily_profit_trend():
-    """
-    Fetches daily total profit trend for the merchant dashboard.
-    Can be filtered by a specific store using the 'store_id' query parameter.
-    """
-    selected_store_id_param = request.args.get('store_id')
+    return fill_trend(daily_sales, window)
 
-    all_active_store_ids = [s.id for s in Store.query.filter_by(is_deleted=False).all()]
-    if not all_active_store_ids:
-        return jsonify([]), 200
 
-    query_store_ids = []
-    if selected_store_id_param and selected_store_id_param.lower() != 'all':
-        try:
-            selected_store_id_int = int(selected_store_id_param)
-            if selected_store_id_int not in all_active_store_ids:
-                abort(404, description="Store not found or is inactive.")
-            query_store_ids = [selected_store_id_int]
-        except ValueError:
-            abort(400, description="Invalid 'store_id' provided. Must be an integer or 'all'.")
-    else:
-        query_store_ids = all_active_store_ids
+def _profit_trend_panel(query_store_ids, window):
+    """Gross profit (revenue less weighted-average purchase cost) per bucket of `window` for the given stores."""
+    if not query_store_ids:
+        return []
 
     sales_filter_condition = Sale.store_id.in_(query_store_ids)
-    
-    # The product_avg_cost_subquery should look at all relevant purchases to establish
-    # an average cost for a product, regardless of the current store filter,
-    # or you could limit it to the queried stores if costs differ per store.
-    # For a superuser merchant, perhaps a global average cost is more appropriate,
-    # or a weighted average across all stores the product has been purchased in.
-    # For now, let's keep it limited to purchases within the `query_store_ids` for consistency.
-    product_avg_cost_subquery = db.session.query(
-        PurchaseItem.product_id,
-        func.avg(PurchaseItem.unit_cost).label('avg_cost')
-    ).join(Purchase, Purchase.id == PurchaseItem.purchase_id).filter(
-        PurchaseItem.is_deleted == False,
-        Purchase.is_deleted == False,
-        Purchase.store_id.in_(query_store_ids) # Filter purchases relevant to the current store scope
-    ).group_by(
-        PurchaseItem.product_id
-    ).subquery()
+    average_cost = average_cost_column()
 
+    # Cost of goods comes from the maintained per-store weighted-average cost basis
+    bucket_day = day_bucket(Sale.created_at)
     daily_profit_data = db.session.query(
-        cast(Sale.created_at, Date).label('sale_date'),
+        bucket_day,
         func.sum(SaleItem.quantity * SaleItem.price_at_sale).label('total_revenue'),
-        func.sum(SaleItem.quantity * product_avg_cost_subquery.c.avg_cost).label('total_cogs')
+        func.sum(SaleItem.quantity * average_cost).label('total_cogs')
     ).join(SaleItem, Sale.id == SaleItem.sale_id).join(
         StoreProduct, SaleItem.store_product_id == StoreProduct.id
     ).outerjoin(
-        product_avg_cost_subquery,
-        StoreProduct.product_id == product_avg_cost_subquery.c.product_id
+        ProductCostBasis,
+        (ProductCostBasis.store_id == Sale.store_id) & (ProductCostBasis.product_id == StoreProduct.product_id)
     ).filter(
         sales_filter_condition,
+        window_filter(Sale.created_at, window),
         Sale.is_deleted == False,
         SaleItem.is_deleted == False
-    ).group_by(
-        cast(Sale.created_at, Date)
-    ).order_by(
-        cast(Sale.created_at, Date)
-    ).all()
-
-    profit_trend_data = []
-    for row in daily_profit_data:
-        revenue = row.total_revenue or Decimal('0.00')
-        cogs = row.total_cogs or Decimal('0.00')
-        profit = revenue - cogs
-        profit_trend_data.append({
-            "date": row.sale_date.isoformat(),
-            "value": float(profit)
-        })
-    return jsonify(profit_trend_data), 200
+    ).group_by(bucket_day).all()
+
+    return fill_trend(
+        [
+            (row.bucket_day, Decimal(str(row.total_revenue or 0)) - Decimal(str(row.total_cogs or 0)))
+            for row in daily_profit_data
+        ],
+        window
+    )
 
-### /dashboard/top_performing_stores Route
-@merchant_dashboard_bp.route('/top_performing_stores', methods=['GET'])
-# @jwt_required()
-# @role_required("merchant")
-def get_top_performing_stores():
-    """
-    Fetches the top performing stores based on total sales revenue.
-    Since the merchant is a superuser, this aggregates across ALL active stores.
-    The 'store_id' parameter is not applicable here as this endpoint is about
-    comparing multiple stores.
-    """
-    # This endpoint inherently provides a list of stores, so no store_id filter here.
-    # We always want to compare all active stores.
-    all_active_store_ids = [s.id for s in Store.query.filter_by(is_deleted=False).all()]
-    
+
+def _top_stores_panel(all_active_store_ids):
+    """The five active stores with the highest sales revenue."""
     if not all_active_store_ids:
-        return jsonify([]), 200
+        return []
 
     top_stores_query = db.session.query(
         Store.id.label('store_id'),
@@ -471,4 +422,141 @@ def get_top_performing_stores():
             "store_name": store_name,
             "total_revenue": float(total_revenue)
         })
-    return jsonify(top_stores_data), 200
\ No newline at end of file
+    return top_stores_data
+
+
+@merchant_dashboard_bp.route('/summary', methods=['GET'])
+# @jwt_required()
+# @role_required("merchant") # Only merchants can access this dashboard summary
+@cached_dashboard(_merchant_cache_scope)
+def get_merchant_dashboard_summary():
+    """
+    Fetches summary statistics for the merchant dashboard.
+    As a superuser, the merchant can view data across all active stores by default,
+    or filter by a specific store using the 'store_id' query parameter.
+    """
+    _, query_store_ids = _resolve_store_scope()
+    return jsonify(_summary_panel(query_store_ids)), 200
+
+### /dashboard/movements Route
+@merchant_dashboard_bp.route('/movements', methods=['GET'])
+# @jwt_required()
+# @role_required("merchant")
+@cached_dashboard(_merchant_cache_scope)
+def get_merchant_dashboard_movements():
+    """
+    Fetches recent inventory movements (purchases and stock transfers) for the merchant dashboard.
+    Can be filtered by a specific store using the 'store_id' query parameter.
+    """
+    _, query_store_ids = _resolve_store_scope()
+    return jsonify(_movements_panel(query_store_ids)), 200
+
+### /dashboard/sales_trend_daily Route
+@merchant_dashboard_bp.route('/sales_trend_daily', methods=['GET'])
+# @jwt_required()
+# @role_required("merchant")
+@cached_dashboard(_merchant_cache_scope)
+def get_daily_sales_trend():
+    """
+    Fetches the total sales trend for the merchant dashboard.
+    Can be filtered by a specific store using the 'store_id' query parameter.
+    'start'/'end' (YYYY-MM-DD, default: the last 30 days) bound the window and
+    'granularity' (day|week|month) sets the bucket size; empty buckets are 0.
+    """
+    _, query_store_ids = _resolve_store_scope()
+    return jsonify(_sales_trend_panel(query_store_ids, parse_trend_window(request.args))), 200
+
+### /dashboard/profit_trend_daily Route
+@merchant_dashboard_bp.route('/profit_trend_daily', methods=['GET'])
+# @jwt_required()
+# @role_required("merchant")
+@cached_dashboard(_merchant_cache_scope)
+def get_daily_profit_trend():
+    """
+    Fetches the total profit trend for the merchant dashboard.
+    Can be filtered by a specific store using the 'store_id' query parameter.
+    Accepts the same 'start'/'end'/'granularity' parameters as /sales_trend_daily.
+    """
+    _, query_store_ids = _resolve_store_scope()
+    return jsonify(_profit_trend_panel(query_store_ids, parse_trend_window(request.args))), 200
+
+### /dashboard/top_performing_stores Route
+@merchant_dashboard_bp.route('/top_performing_stores', methods=['GET'])
+# @jwt_required()
+# @role_required("merchant")
+@cached_dashboard(lambda: ALL_STORES)
+def get_top_performing_stores():
+    """
+    Fetches the top performing stores based on total sales revenue.
+    Since the merchant is a superuser, this aggregates across ALL active stores.
+    The 'store_id' parameter is not applicable here as this endpoint is about
+    comparing multiple stores.
+    """
+    all_active_store_ids = _active_store_ids()
+    return jsonify(_top_stores_panel(all_active_store_ids)), 200
+
+# Panels served by /bootstrap: (response key, panel, takes every active store rather than the selected scope, takes the trend window)
+BOOTSTRAP_PANELS = (
+    ('summary', _summary_panel, False, False),
+    ('movements', _movements_panel, False, False),
+    ('sales_trend_daily', _sales_trend_panel, False, True),
+    ('profit_trend_daily', _profit_trend_panel, False, True),
+    ('top_performing_stores', _top_stores_panel, True, False),
+)
+
+_bootstrap_executor = None
+_bootstrap_executor_lock = threading.Lock()
+
+
+def _get_bootstrap_executor(workers):
+    global _bootstrap_executor
+    with _bootstrap_executor_lock:
+        if _bootstrap_executor is None:
+            _bootstrap_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard-bootstrap')
+        return _bootstrap_executor
+
+
+def _run_panel_in_app_context(app, panel, panel_args):
+    # Each worker thread gets its own app context and therefore its own session
+    with app.app_context():
+        return panel(*panel_args)
+
+
+### /dashboard/bootstrap Route
+@merchant_dashboard_bp.route('/bootstrap', methods=['GET'])
+# @jwt_required()
+# @role_required("merchant")
+@cached_dashboard(lambda: ALL_STORES) # top_performing_stores always spans every store
+def get_merchant_dashboard_bootstrap():
+    """
+    Returns every merchant dashboard panel in one response, keyed like the
+    individual endpoints (summary, movements, sales_trend_daily,
+    profit_trend_daily, top_performing_stores).
+    The store scope is resolved once from the 'store_id' query parameter;
+    the trend panels take the same 'start'/'end'/'granularity' parameters as
+    their endpoints.
+    Panels run one after another in the request's session unless
+    DASHBOARD_BOOTSTRAP_WORKERS > 1, in which case the independent queries
+    run concurrently, each on its own pooled connection.
+    """
+    all_active_store_ids, query_store_ids = _resolve_store_scope()
+    window = parse_trend_window(request.args)
+    jobs = [
+        (key, panel, (all_active_store_ids if spans_all_stores else query_store_ids,) + ((window,) if windowed else ()))
+        for key, panel, spans_all_stores, windowed in BOOTSTRAP_PANELS
+    ]
+
+    workers = current_app.config.get('DASHBOARD_BOOTSTRAP_WORKERS', 1)
+    if workers > 1:
+        app = current_app._get_current_object()
+        executor = _get_bootstrap_executor(workers)
+        futures = [
+            (key, executor.submit(_run_panel_in_app_context, app, panel, panel_args))
+            for key, panel, panel_args in jobs
+        ]
+        payload = {key: future.result() for key, future in futures}
+    else:
+        payload = {key: panel(*panel_args) for key, panel, panel_args in jobs}
+
+    payload["store_ids"] = query_store_ids
+    return jsonify(payload), 200
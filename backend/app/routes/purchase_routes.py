@@ -4,6 +4,9 @@ from functools import wraps
 from flask_jwt_extended import jwt_required
 from app.routes.auth_routes import role_required
 from app.models import db, Purchase, PurchaseItem, Supplier, Product, StoreProduct, Store
+from app.services.cost_basis_services import purchase_contributions, apply_cost_basis_changes
+from app.services.stock_services import receive_stock
+from app.services.ledger_services import set_movement_reason
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -92,25 +95,9 @@ def create_purchase():
         db.session.flush()
 
         total_cost = 0
+        new_items = []
 
         for item_data in data["purchase_items"]:
-            store_product = StoreProduct.query.filter_by(
-                store_id=new_purchase.store_id,
-                product_id=item_data["product_id"]
-            ).first()
-
-            if store_product:
-                store_product.quantity_in_stock += item_data["quantity"]
-                store_product.unit_cost = item_data["unit_cost"]
-            else:
-                store_product = StoreProduct(
-                    store_id=new_purchase.store_id,
-                    product_id=item_data["product_id"],
-                    quantity_in_stock=item_data["quantity"],
-                    unit_cost=item_data["unit_cost"]
-                )
-                db.session.add(store_product)
-
             new_item = PurchaseItem(
                 purchase_id=new_purchase.id,
                 product_id=item_data["product_id"],
@@ -118,8 +105,16 @@ def create_purchase():
                 unit_cost=item_data["unit_cost"]
             )
             total_cost += new_item.quantity * new_item.unit_cost
-            db.session.add(new_item)
-            
+            new_items.append(new_item)
+        db.session.add_all(new_items)
+
+        # All stock for the purchase is received in one upsert
+        receive_stock(new_purchase.store_id, [
+            (item_data["product_id"], item_data["quantity"], item_data["unit_cost"])
+            for item_data in data["purchase_items"]
+        ], reference_id=new_purchase.id)
+
+        apply_cost_basis_changes({}, purchase_contributions([new_purchase.id]))
         db.session.commit()
         
         new_purchase_dict = new_purchase.to_dict()
@@ -149,6 +144,10 @@ def update_purchase(id):
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
+        # Captured before any change so the cost basis can be adjusted by the difference
+        cost_basis_before = purchase_contributions([purchase.id])
+        set_movement_reason('purchase_edit', purchase.id)
+
         # Update top-level purchase fields if they are in the request
         if "supplier_id" in data:
             purchase.supplier_id = data["supplier_id"]
@@ -187,25 +186,8 @@ def update_purchase(id):
                 db.session.delete(item)
             db.session.flush()
 
-            # Now, add the new items and update inventory
+            # Now, add the new items and receive their stock into the (possibly new) store
             for item_data in data["purchase_items"]:
-                store_product = StoreProduct.query.filter_by(
-                    store_id=purchase.store_id, # Use the new store_id
-                    product_id=item_data["product_id"]
-                ).first()
-                
-                if store_product:
-                    store_product.quantity_in_stock += item_data["quantity"]
-                    store_product.unit_cost = item_data["unit_cost"]
-                else:
-                    store_product = StoreProduct(
-                        store_id=purchase.store_id,
-                        product_id=item_data["product_id"],
-                        quantity_in_stock=item_data["quantity"],
-                        unit_cost=item_data["unit_cost"]
-                    )
-                    db.session.add(store_product)
-
                 new_item = PurchaseItem(
                     purchase_id=purchase.id,
                     product_id=item_data["product_id"],
@@ -213,7 +195,12 @@ def update_purchase(id):
                     unit_cost=item_data["unit_cost"]
                 )
                 db.session.add(new_item)
+            receive_stock(purchase.store_id, [
+                (item_data["product_id"], item_data["quantity"], item_data["unit_cost"])
+                for item_data in data["purchase_items"]
+            ], reason='purchase_edit', reference_id=purchase.id)
 
+        apply_cost_basis_changes(cost_basis_before, purchase_contributions([purchase.id]))
         db.session.commit()
         
         # Re-fetch the purchase to get the new items
@@ -257,7 +244,9 @@ def soft_delete_purchase(id):
         if purchase.is_deleted:
             return jsonify({"error": "Purchase already deleted"}), 400
 
-        # Mark the purchase as deleted
+        # Take the purchase's cost out of the cost basis, then mark it as deleted
+        apply_cost_basis_changes(purchase_contributions([purchase.id]), {})
+        set_movement_reason('purchase_void', purchase.id)
         purchase.is_deleted = True
 
         # Revert inventory changes and soft-delete purchase items
@@ -1,117 +1,211 @@
 # app/routes/sales_routes.py
 
-from flask import Blueprint, request, jsonify
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import joinedload # Now needed here for eager loading
-from datetime import datetime, date # Now needed here for date parsing
-from decimal import Decimal # Now needed here for total calculation (if Decimal is preferred for totals)
-from sqlalchemy import desc, func, cast, Date # Now needed here for filtering/ordering
+import base64
+import csv
+import json
+from itertools import groupby
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.orm import joinedload
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import tuple_
 
 # Import ALL necessary models and db from app.models
 # Make sure app.models.py imports db as `from app import db`
 from app.models import db, Sale, SaleItem, Product, StoreProduct, User, Store
 
 # Import ALL necessary error classes
-from app.errors import BadRequestError, NotFoundError, InsufficientStockError, APIError
+from app.errors import BadRequestError, NotFoundError, InsufficientStockError, ConflictError, APIError
+from app.services.checkout_services import checkout, checkout_batch
+from app.services.idempotency_services import validate_key, request_fingerprint, find_replay, record_keys, remember_committed
+from app.services.search_services import refresh_sale_search_documents, sale_search_condition
+from app.services.rollup_services import sale_contributions, apply_rollup_changes
+from app.services.ledger_services import set_movement_reason
 
 
 sales_bp = Blueprint('sales_bp', __name__)
 
-@sales_bp.route('/sales', methods=['GET'])
-def get_sales():
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+DEFAULT_SALES_BATCH_MAX_SIZE = 10000
+
+def _optional_arg(name):
+    value = request.args.get(name, type=str)
+    return value if value and value.lower() != 'undefined' else None
+
+
+def _parse_date_arg(name, value):
     try:
-        page = request.args.get('page', default=1, type=int)
-        per_page = request.args.get('per_page', default=10, type=int)
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise BadRequestError(f"Invalid {name} format. Use YYYY-MM-DD.")
+
+
+def _sales_listing_query():
+    """
+    Projected query for one row per sale: the header columns plus the cashier
+    and store names. Both joins are many-to-one, so rows never fan out.
+    """
+    return db.session.query(
+        Sale.id,
+        Sale.store_id,
+        Sale.cashier_id,
+        Sale.payment_status,
+        Sale.created_at,
+        User.name.label('cashier_name'),
+        Store.name.label('store_name')
+    ).select_from(Sale)\
+     .outerjoin(User, Sale.cashier_id == User.id)\
+     .outerjoin(Store, Sale.store_id == Store.id)
+
+
+def _filtered_sales_query(query):
+    """
+    Applies the store/cashier/search/date filters from the query string to a
+    query built by _sales_listing_query(). Shared by every listing mode so
+    they always agree on which sales match.
+    """
+    store_id_param = request.args.get('store_id')
+    store_id = int(store_id_param) if store_id_param and store_id_param.isdigit() else None
+
+    cashier_id_param = request.args.get('cashier_id')
+    cashier_id = int(cashier_id_param) if cashier_id_param and cashier_id_param.isdigit() else None
+
+    search_query = _optional_arg('search')
+    start_date = _optional_arg('start_date')
+    end_date = _optional_arg('end_date')
+
+    query = query.filter(Sale.is_deleted == False)
+
+    if store_id:
+        query = query.filter(Sale.store_id == store_id)
+    if cashier_id:
+        query = query.filter(Sale.cashier_id == cashier_id)
+
+    if search_query:
+        query = query.filter(sale_search_condition(search_query))
+
+    # Half-open datetime ranges rather than CAST(created_at AS DATE) so an index on created_at applies
+    if start_date:
+        start_datetime = datetime.combine(_parse_date_arg('start_date', start_date), time.min)
+        query = query.filter(Sale.created_at >= start_datetime)
+
+    end_day = _parse_date_arg('end_date', end_date) if end_date else date.today()
+    return query.filter(Sale.created_at < datetime.combine(end_day + timedelta(days=1), time.min))
+
+
+def _load_sale_items(sale_ids):
+    """
+    Loads the live items of a page of sales with one projected query and
+    returns them grouped by sale id.
+    """
+    items_by_sale = {sale_id: [] for sale_id in sale_ids}
+    if not sale_ids:
+        return items_by_sale
+
+    rows = db.session.query(
+        SaleItem.sale_id,
+        SaleItem.store_product_id,
+        SaleItem.price_at_sale,
+        SaleItem.quantity,
+        Product.name,
+        Product.unit
+    ).select_from(SaleItem)\
+     .outerjoin(SaleItem.store_product)\
+     .outerjoin(StoreProduct.product)\
+     .filter(SaleItem.sale_id.in_(sale_ids), SaleItem.is_deleted == False)\
+     .order_by(SaleItem.sale_id, SaleItem.id)
+
+    for sale_id, store_product_id, price_at_sale, quantity, product_name, unit in rows:
+        items_by_sale[sale_id].append({
+            "product_id": store_product_id,
+            "product_name": product_name if product_name is not None else 'N/A',
+            "price": float(price_at_sale),
+            "quantity": quantity,
+            "unit": unit,
+            "subtotal": float(price_at_sale * quantity)
+        })
+    return items_by_sale
+
+
+def _serialize_sale_rows(rows):
+    """Builds the listing payload from _sales_listing_query() rows."""
+    items_by_sale = _load_sale_items([row.id for row in rows])
+    sales_list = []
+    for row in rows:
+        items = items_by_sale[row.id]
+        sales_list.append({
+            "id": row.id,
+            "store_id": row.store_id,
+            "cashier_id": row.cashier_id,
+            "payment_status": row.payment_status,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "total": sum(item["subtotal"] for item in items),
+            "cashier": {
+                "name": row.cashier_name
+            } if row.cashier_name is not None else None,
+            "store": {
+                "name": row.store_name
+            } if row.store_name is not None else None,
+            "sale_items": items
+        })
+    return sales_list
 
-        store_id_param = request.args.get('store_id')
-        store_id = int(store_id_param) if store_id_param and store_id_param.isdigit() else None
 
-        cashier_id_param = request.args.get('cashier_id')
-        cashier_id = int(cashier_id_param) if cashier_id_param and cashier_id_param.isdigit() else None
-        
-        search_query_param = request.args.get('search', type=str)
-        search_query = search_query_param if search_query_param and search_query_param.lower() != 'undefined' else None
+def _encode_sales_cursor(sale):
+    """Opaque cursor pointing just past `sale` in (created_at desc, id desc) order."""
+    raw = json.dumps([sale.created_at.isoformat(), sale.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
 
-        start_date_param = request.args.get('start_date', type=str)
-        start_date = start_date_param if start_date_param and start_date_param.lower() != 'undefined' else None
 
-        end_date_param = request.args.get('end_date', type=str)
-        end_date = end_date_param if end_date_param and end_date_param.lower() != 'undefined' else None
+def _decode_sales_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, sale_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(sale_id)
+    except (ValueError, TypeError):
+        raise BadRequestError("Invalid cursor.")
 
-        # --- SalesService.get_all_sales logic moved here ---
-        query = Sale.query.options( # Use Sale directly
-            joinedload(Sale.store),
-            joinedload(Sale.cashier),
-            joinedload(Sale.sale_items).joinedload(SaleItem.store_product).joinedload(StoreProduct.product)
-        ).filter_by(is_deleted=False)
-
-        if store_id:
-            query = query.filter(Sale.store_id == store_id)
-        if cashier_id:
-            query = query.filter(Sale.cashier_id == cashier_id)
-
-        if search_query:
-            search_pattern = f"%{search_query}%"
-            query = query.join(Sale.sale_items, isouter=True)\
-                         .join(SaleItem.store_product, isouter=True)\
-                         .join(StoreProduct.product, isouter=True)\
-                         .filter(
-                             (Product.name.ilike(search_pattern)) |
-                             (Sale.cashier.has(User.name.ilike(search_pattern))) |
-                             (Sale.store.has(Store.name.ilike(search_pattern)))
-                         ).distinct()
-
-        if start_date:
-            try:
-                start_datetime = datetime.strptime(start_date, '%Y-%m-%d').date()
-                query = query.filter(cast(Sale.created_at, Date) >= start_datetime)
-            except ValueError:
-                raise BadRequestError("Invalid start_date format. Use YYYY-MM-DD.")
-        
-        if end_date:
-            try:
-                end_datetime = datetime.strptime(end_date, '%Y-%m-%d').date()
-            except ValueError:
-                raise BadRequestError("Invalid end_date format. Use YYYY-MM-DD.")
-        else:
-            end_datetime = date.today()
 
-        query = query.filter(cast(Sale.created_at, Date) <= end_datetime)
+@sales_bp.route('/sales', methods=['GET'])
+def get_sales():
+    """
+    Lists sales, newest first.
+
+    A page of sale headers is selected first and the items for just those
+    sales are fetched with a second projected query; no ORM objects are
+    built. By default the response is page/per_page based and includes the
+    total count. Passing `cursor` (empty for the first page) switches to
+    keyset pagination on (created_at, id): no COUNT or OFFSET is issued, so
+    every page costs the same, and the response carries `next_cursor` (null
+    on the last page) instead of `total`/`pages`.
+    """
+    try:
+        page = request.args.get('page', default=1, type=int)
+        per_page = request.args.get('per_page', default=10, type=int)
+        cursor = request.args.get('cursor', type=str)
+
+        query = _filtered_sales_query(_sales_listing_query())
+        query = query.order_by(Sale.created_at.desc(), Sale.id.desc())
+
+        if cursor is not None:
+            per_page = max(per_page, 1)
+            if cursor:
+                after_created_at, after_id = _decode_sales_cursor(cursor)
+                query = query.filter(tuple_(Sale.created_at, Sale.id) < tuple_(after_created_at, after_id))
+            # One extra row tells us whether another page exists without counting
+            rows = query.limit(per_page + 1).all()
+            has_more = len(rows) > per_page
+            rows = rows[:per_page]
+            return jsonify({
+                "sales": _serialize_sale_rows(rows),
+                "next_cursor": _encode_sales_cursor(rows[-1]) if has_more else None,
+                "per_page": per_page
+            }), 200
 
-        query = query.order_by(Sale.created_at.desc())
         paginated_sales = query.paginate(page=page, per_page=per_page, error_out=False)
-        # --- End SalesService.get_all_sales logic ---
-
-        sales_list = []
-        for sale in paginated_sales.items:
-            sales_list.append({
-                "id": sale.id,
-                "store_id": sale.store_id,
-                "cashier_id": sale.cashier_id,
-                "payment_status": sale.payment_status,
-                "created_at": sale.created_at.isoformat() if sale.created_at else None,
-                "total": float(sale.total),
-                "cashier": {
-                    "name": sale.cashier.name
-                } if sale.cashier else None,
-                "store": {
-                    "name": sale.store.name
-                } if sale.store else None,
-                "sale_items": [
-                    {
-                        "product_id": item.store_product_id,
-                        "product_name": item.store_product.product.name if item.store_product and item.store_product.product else 'N/A',
-                        "price": float(item.price_at_sale),
-                        "quantity": item.quantity,
-                        "unit": item.store_product.product.unit if item.store_product and item.store_product.product else None,
-                        "subtotal": float(item.price_at_sale * item.quantity)
-                    }
-                    for item in sale.sale_items if not item.is_deleted
-                ]
-            })
 
         return jsonify({
-            "sales": sales_list,
+            "sales": _serialize_sale_rows(paginated_sales.items),
             "total": paginated_sales.total,
             "page": paginated_sales.page,
             "pages": paginated_sales.pages,
@@ -129,12 +223,139 @@ def get_sales():
         return jsonify({"error": "An unexpected error occurred while fetching sales."}), 500
 
 
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CSV_COLUMNS = (
+    'sale_id', 'created_at', 'store_id', 'store_name', 'cashier_id', 'cashier_name', 'payment_status',
+    'product_id', 'product_name', 'unit', 'quantity', 'price', 'subtotal'
+)
+
+
+class _EchoBuffer:
+    """File-like object whose write() hands the text back, so csv.writer can format one row at a time."""
+    def write(self, value):
+        return value
+
+
+def _sales_export_rows():
+    """
+    One row per live sale item (or one row for a sale without items), with
+    the sale header repeated, in export order. Streamed from a server-side
+    cursor in batches of EXPORT_BATCH_SIZE.
+    """
+    query = _sales_listing_query().add_columns(
+        SaleItem.store_product_id.label('product_id'),
+        Product.name.label('product_name'),
+        Product.unit,
+        SaleItem.quantity,
+        SaleItem.price_at_sale
+    ).outerjoin(SaleItem, (SaleItem.sale_id == Sale.id) & (SaleItem.is_deleted == False))\
+     .outerjoin(StoreProduct, SaleItem.store_product_id == StoreProduct.id)\
+     .outerjoin(Product, StoreProduct.product_id == Product.id)
+    query = _filtered_sales_query(query).order_by(Sale.created_at.desc(), Sale.id.desc(), SaleItem.id)
+    return query.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+
+
+def _export_item(row):
+    return {
+        "product_id": row.product_id,
+        "product_name": row.product_name if row.product_name is not None else 'N/A',
+        "price": float(row.price_at_sale),
+        "quantity": row.quantity,
+        "unit": row.unit,
+        "subtotal": float(row.price_at_sale * row.quantity)
+    }
+
+
+def _generate_sales_csv(rows):
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow(EXPORT_CSV_COLUMNS)
+    for row in rows:
+        item = _export_item(row) if row.quantity is not None else None
+        yield writer.writerow([
+            row.id,
+            row.created_at.isoformat() if row.created_at else '',
+            row.store_id,
+            row.store_name or '',
+            row.cashier_id,
+            row.cashier_name or '',
+            row.payment_status,
+            item["product_id"] if item else '',
+            item["product_name"] if item else '',
+            (item["unit"] or '') if item else '',
+            item["quantity"] if item else '',
+            item["price"] if item else '',
+            item["subtotal"] if item else ''
+        ])
+
+
+def _generate_sales_ndjson(rows):
+    # Rows arrive grouped by sale, so only the current sale's items are held in memory
+    for _, sale_rows in groupby(rows, key=lambda row: row.id):
+        sale_rows = list(sale_rows)
+        header = sale_rows[0]
+        items = [_export_item(row) for row in sale_rows if row.quantity is not None]
+        yield json.dumps({
+            "id": header.id,
+            "store_id": header.store_id,
+            "cashier_id": header.cashier_id,
+            "payment_status": header.payment_status,
+            "created_at": header.created_at.isoformat() if header.created_at else None,
+            "total": sum(item["subtotal"] for item in items),
+            "cashier": {"name": header.cashier_name} if header.cashier_name is not None else None,
+            "store": {"name": header.store_name} if header.store_name is not None else None,
+            "sale_items": items
+        }) + "\n"
+
+
+@sales_bp.route('/sales/export', methods=['GET'])
+def export_sales():
+    """
+    Streams every sale matching the GET /sales filters (store_id, cashier_id,
+    search, start_date, end_date), newest first.
+
+    `format=csv` (default) writes one row per sale item with the sale header
+    repeated; `format=ndjson` writes one JSON object per line in the GET
+    /sales shape. Rows are read from a server-side cursor and written as
+    they arrive, so memory use does not grow with the size of the export.
+    """
+    try:
+        export_format = (request.args.get('format') or 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            raise BadRequestError("Invalid format. Must be 'csv' or 'ndjson'.")
+
+        # Built (and its filters validated) before the response starts streaming
+        rows = _sales_export_rows()
+    except BadRequestError as e:
+        return jsonify({"error": e.message}), e.status_code
+
+    if export_format == 'ndjson':
+        body, mimetype = _generate_sales_ndjson(rows), 'application/x-ndjson'
+    else:
+        body, mimetype = _generate_sales_csv(rows), 'text/csv'
+
+    response = current_app.response_class(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=sales-export.{export_format}'
+    return response
+
+
+def _sale_created_response(sale_id, total, replayed=False):
+    response = jsonify({
+        "message": "Sale created successfully",
+        "sale_id": sale_id,
+        "total": total
+    })
+    response.status_code = 201
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
 @sales_bp.route('/sales', methods=['POST'])
 def create_sale():
     try:
         data = request.get_json()
         
-        # --- SalesService.create_sale logic moved here ---
         store_id = data.get('store_id')
         cashier_id = data.get('cashier_id')
         payment_status = data.get('payment_status')
@@ -143,79 +364,103 @@ def create_sale():
         if not all([store_id, cashier_id, payment_status, sale_items_data]):
             raise BadRequestError("Missing required fields for sale creation.")
 
-        store = Store.query.filter_by(id=store_id, is_deleted=False).first()
-        if not store:
-            raise NotFoundError(f"Store with ID {store_id} not found.")
+        # A retried request with the same Idempotency-Key gets the original sale back
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key:
+            validate_key(idempotency_key)
+            request_hash = request_fingerprint(data)
+            replay = find_replay(idempotency_key, request_hash)
+            if replay:
+                return _sale_created_response(replay.sale_id, replay.total, replayed=True)
+
+        # One bulk StoreProduct fetch and one guarded stock UPDATE for the whole basket
+        new_sale = checkout(store_id, cashier_id, payment_status, sale_items_data)
+        total = float(new_sale.total)
+
+        if idempotency_key:
+            key_entry = (idempotency_key, request_hash, new_sale.id, total)
+            record_keys([key_entry])
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # A concurrent retry with the same key won the race; return its sale instead
+                db.session.rollback()
+                replay = find_replay(idempotency_key, request_hash)
+                if not replay:
+                    raise
+                return _sale_created_response(replay.sale_id, replay.total, replayed=True)
+            remember_committed([key_entry])
+        else:
+            db.session.commit()
 
-        cashier = User.query.filter_by(id=cashier_id, is_deleted=False).first()
-        if not cashier:
-            raise NotFoundError(f"Cashier with ID {cashier_id} not found.")
+        return _sale_created_response(new_sale.id, total)
 
-        new_sale = Sale(
-            store_id=store_id,
-            cashier_id=cashier_id,
-            payment_status=payment_status
-        )
-        db.session.add(new_sale)
-        db.session.flush() # Use flush to get new_sale.id before commit
+    except SQLAlchemyError as e:
+        db.session.rollback() # Rollback explicitly here
+        print(f"SQLAlchemy Error in create_sale: {e}")
+        raise APIError("Database error occurred during sale creation.", 500)
+    except (BadRequestError, NotFoundError, InsufficientStockError, ConflictError) as e:
+        db.session.rollback() # Rollback explicitly here
+        raise e
+    except Exception as e:
+        db.session.rollback() # Rollback explicitly here
+        print(f"Unexpected Error in create_sale: {e}")
+        raise APIError("An unexpected error occurred during sale creation.", 500)
 
-        for item_data in sale_items_data:
-            store_product_id = item_data.get('store_product_id')
-            quantity = item_data.get('quantity')
 
-            if not all([store_product_id, quantity is not None]):
-                raise BadRequestError("Missing 'store_product_id' or 'quantity' in a sale item.")
+@sales_bp.route('/sales/batch', methods=['POST'])
+def create_sales_batch():
+    """
+    Bulk-creates sales queued by a till, e.g. an end-of-day offline replay.
+    Accepts a JSON array (or {"sales": [...]}) or an NDJSON body with one sale per line.
+    Each sale has the same shape as POST /sales plus an optional ISO 8601 'created_at'
+    and an optional 'idempotency_key' that makes replaying the same sale safe.
+    Returns one result per sale so the till can retry only the failed ones.
+    """
+    try:
+        if request.mimetype in NDJSON_MIMETYPES:
+            sales_data = []
+            for line in request.stream:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    sales_data.append(json.loads(line))
+                except ValueError:
+                    sales_data.append(None)
+        else:
+            data = request.get_json(silent=True)
+            sales_data = data.get('sales') if isinstance(data, dict) else data
 
-            try:
-                quantity = int(quantity)
-                if quantity <= 0:
-                    raise BadRequestError("Quantity for a sale item must be positive.")
-            except (ValueError, TypeError):
-                raise BadRequestError("Quantity for a sale item must be a valid number.")
-
-            store_product = StoreProduct.query.options(joinedload(StoreProduct.product))\
-                                              .filter_by(id=store_product_id, store_id=store_id).first()
-
-            if not store_product or store_product.is_deleted:
-                raise NotFoundError(f"Store product with ID {store_product_id} not found or is deleted in store {store_id}.")
-            
-            if store_product.quantity_in_stock < quantity:
-                raise InsufficientStockError(
-                    product_name=store_product.product.name,
-                    available_stock=store_product.quantity_in_stock,
-                    requested_quantity=quantity
-                )
-
-            store_product.quantity_in_stock -= quantity
-
-            sale_item = SaleItem(
-                sale_id=new_sale.id,
-                store_product_id=store_product_id,
-                quantity=quantity,
-                price_at_sale=store_product.price
-            )
-            db.session.add(sale_item)
+        if not isinstance(sales_data, list) or not sales_data:
+            raise BadRequestError("Request body must be a non-empty list of sales.")
 
+        max_batch_size = current_app.config.get('SALES_BATCH_MAX_SIZE', DEFAULT_SALES_BATCH_MAX_SIZE)
+        if len(sales_data) > max_batch_size:
+            raise BadRequestError(f"A batch may contain at most {max_batch_size} sales.")
+
+        results, key_entries = checkout_batch(sales_data)
         db.session.commit()
-        # --- End SalesService.create_sale logic ---
+        remember_committed(key_entries)
 
+        created = sum(1 for result in results if result["status"] == "created")
         return jsonify({
-            "message": "Sale created successfully",
-            "sale_id": new_sale.id,
-            "total": float(new_sale.total)
-        }), 201
+            "created": created,
+            "failed": len(results) - created,
+            "results": results
+        }), 200
 
     except SQLAlchemyError as e:
         db.session.rollback() # Rollback explicitly here
-        print(f"SQLAlchemy Error in create_sale: {e}")
-        raise APIError("Database error occurred during sale creation.", 500)
+        print(f"SQLAlchemy Error in create_sales_batch: {e}")
+        raise APIError("Database error occurred during batch sale creation.", 500)
     except (BadRequestError, NotFoundError, InsufficientStockError) as e:
         db.session.rollback() # Rollback explicitly here
         raise e
     except Exception as e:
         db.session.rollback() # Rollback explicitly here
-        print(f"Unexpected Error in create_sale: {e}")
-        raise APIError("An unexpected error occurred during sale creation.", 500)
+        print(f"Unexpected Error in create_sales_batch: {e}")
+        raise APIError("An unexpected error occurred during batch sale creation.", 500)
 
 
 @sales_bp.route('/sales/<int:id>', methods=['GET'])
@@ -278,6 +523,8 @@ def update_sale(id):
 
         if not sale:
             raise NotFoundError(f"Sale with ID {id} not found.")
+        rollup_before = sale_contributions([sale.id])
+        set_movement_reason('sale_edit', sale.id)
 
         if 'cashier_id' in data:
             cashier = User.query.filter_by(id=data['cashier_id'], is_deleted=False).first()
@@ -392,6 +639,8 @@ def update_sale(id):
                         existing_item.quantity = 0
                         db.session.add(existing_item)
 
+        refresh_sale_search_documents([sale.id])
+        apply_rollup_changes(rollup_before, sale_contributions([sale.id]))
         db.session.commit()
         db.session.refresh(sale)
         updated_sale = sale # Assign for clarity, though 'sale' is already updated
@@ -440,6 +689,8 @@ def delete_sale(id):
         
         if not sale:
             raise NotFoundError(f"Sale with ID {id} not found.")
+        apply_rollup_changes(sale_contributions([sale.id]), {})
+        set_movement_reason('sale_void', sale.id)
 
         sale.is_deleted = True
         for item in sale.sale_items:
@@ -450,6 +701,7 @@ def delete_sale(id):
                 item.is_deleted = True
                 db.session.add(item)
 
+        refresh_sale_search_documents([sale.id])
         db.session.commit()
         # --- End SalesService.delete_sale logic ---
         
@@ -3,11 +3,13 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone # Use timezone.utc for datetime.utcnow() replacement
 from app import db
 from app.models import (
-    Store, StoreProduct, SupplyRequest, StockTransferItem,
+    Store, StoreProduct, SupplyRequest, StockTransfer,
     StockTransferItem, Product, User,
     SupplyRequestStatus, StockTransferStatus
 )
 from app.routes.auth_routes import role_required
+from app.errors import StockShortageError
+from app.services.stock_services import transfer_stock
 
 store_bp = Blueprint("store", __name__, url_prefix="/api/store")
 
@@ -594,7 +596,9 @@ def initiate_transfer():
 @role_required("admin")
 def approve_transfer(transfer_id):
     """
-    Approves a pending stock transfer.
+    Approves a pending stock transfer and moves its stock: every item is
+    debited from the source store and credited to the destination store in
+    the same transaction.
     ---
     tags:
       - Stock Transfers
@@ -617,7 +621,8 @@ def approve_transfer(transfer_id):
               type: string
               example: "approved"
       400:
-        description: Bad request, e.g., transfer already processed.
+        description: Bad request, e.g., transfer already processed, or the source store
+          cannot cover every item (all short items are listed under 'shortages').
       401:
         description: Unauthorized, JWT token is missing or invalid.
       403:
@@ -625,11 +630,25 @@ def approve_transfer(transfer_id):
       404:
         description: Stock Transfer not found.
     """
-    transfer = StockTransfer.query.get_or_404(transfer_id)
+    # Locking the transfer row stops two approvals of the same transfer moving stock twice
+    transfer = StockTransfer.query.filter_by(id=transfer_id).with_for_update().first()
+    if not transfer:
+        abort(404)
 
     if transfer.status != StockTransferStatus.pending:
         abort(400, "Transfer already processed.")
 
+    quantities = {}
+    for item in transfer.stock_transfer_items:
+        if not item.is_deleted:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    try:
+        transfer_stock(transfer.from_store_id, transfer.to_store_id, quantities, reference_id=transfer.id)
+    except StockShortageError:
+        db.session.rollback()
+        raise
+
     transfer.status = StockTransferStatus.approved
     transfer.approved_by = get_jwt_identity()
     transfer.transfer_date = datetime.utcnow()
@@ -10,6 +10,7 @@ from email.mime.multipart import MIMEMultipart
 from sqlalchemy import func
 from http import HTTPStatus
 from app.routes.auth_routes import role_required, EMAIL_REGEX
+from app.auth.principal import current_principal
 from app.services.user_services import can_deactivate_user, can_delete_user
 
 # Email Service
@@ -261,7 +262,7 @@ def register_with_invitation():
 def get_pending_invitations():
     """Get all pending invitations (merchant only)"""
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or not current_user.is_active:
         return jsonify({"error": "Invalid or inactive user"}), HTTPStatus.FORBIDDEN
@@ -282,7 +283,7 @@ def get_pending_invitations():
 def cancel_invitation(token):
     """Cancel a pending invitation"""
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or not current_user.is_active:
         return jsonify({"error": "Invalid or inactive user"}), HTTPStatus.FORBIDDEN
@@ -330,7 +331,7 @@ def serialize_user(user):
 @role_required("merchant", "admin")
 def get_all_users():
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     if not current_user or not current_user.is_active:
         return jsonify({"error": "Invalid or inactive user"}), HTTPStatus.FORBIDDEN
@@ -349,7 +350,7 @@ def get_all_users():
 @role_required("admin")
 def get_users_by_store(store_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     if not current_user or not current_user.is_active:
         return jsonify({"error": "Invalid or inactive user"}), HTTPStatus.FORBIDDEN
@@ -374,7 +375,7 @@ def get_users_by_store(store_id):
 @role_required("merchant", "admin")
 def get_user_by_id(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     if not current_user or not current_user.is_active:
         return jsonify({"error": "Invalid or inactive user"}), HTTPStatus.FORBIDDEN
@@ -397,7 +398,7 @@ def create_user():
     Create a new user. Admins must be created via the invitation system.
     """
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     data = request.get_json()
     name = data.get("name")
@@ -467,7 +468,7 @@ def create_user():
 @role_required("merchant", "admin")
 def update_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     if not current_user or not current_user.is_active:
         return jsonify({"error": "Invalid or inactive user"}), HTTPStatus.FORBIDDEN
@@ -562,7 +563,7 @@ def get_profile():
 @role_required("merchant", "admin")
 def deactivate_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     target_user = User.query.get(user_id)
     if not target_user:
@@ -591,7 +592,7 @@ def deactivate_user(user_id):
 @role_required("merchant", "admin")
 def reactivate_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     if not current_user or not current_user.is_active:
         return jsonify({"error": "Invalid or inactive user"}), HTTPStatus.FORBIDDEN
 
@@ -616,7 +617,7 @@ def reactivate_user(user_id):
 @role_required("merchant", "admin")
 def delete_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     target_user = User.query.get(user_id)
     if not target_user:
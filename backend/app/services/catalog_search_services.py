@@ -0,0 +1,150 @@
+# app/services/catalog_search_services.py
+"""
+In-process prefix index over product names and SKUs for typeahead search.
+
+Each worker keeps sorted arrays of normalized keys (SKUs, full names and the
+individual words of names) and answers a prefix query with one bisection
+per array, without touching the database. The index is tagged with the
+catalog version it was built from (see app.services.catalog_services); a
+search first reads the current version, one primary-key lookup, and rebuilds
+the index if any product or category changed since, in this or any other
+worker.
+"""
+
+import re
+import threading
+from bisect import bisect_left
+
+from flask import current_app
+
+from app.models import db, Category, Product, StoreProduct
+from app.services.catalog_services import catalog_version
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+_WORD_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def _normalize(text):
+    return (text or '').strip().lower()
+
+
+class ProductSearchIndex:
+    """
+    Immutable snapshot of the live catalog. Matches are ranked by kind (exact
+    SKU, SKU prefix, name prefix, word-of-name prefix) and alphabetically
+    within a kind.
+    """
+
+    def __init__(self, version, products):
+        self.version = version
+        self.products = {product['id']: product for product in products}
+        self._skus = sorted((_normalize(p['sku']), p['id']) for p in products if p['sku'])
+        self._names = sorted((_normalize(p['name']), p['id']) for p in products)
+        self._words = sorted({
+            (word, p['id'])
+            for p in products
+            for word in _WORD_SPLIT.split(_normalize(p['name']))[1:]
+            if word
+        })
+
+    @staticmethod
+    def _prefixed(keys, prefix, exact=False):
+        """Yields product ids whose key starts with (or, if `exact`, equals) `prefix`, in key order."""
+        index = bisect_left(keys, (prefix,))
+        while index < len(keys) and (keys[index][0] == prefix if exact else keys[index][0].startswith(prefix)):
+            yield keys[index][1]
+            index += 1
+
+    def search(self, term, limit=DEFAULT_SEARCH_LIMIT):
+        prefix = _normalize(term)
+        if not prefix:
+            return []
+        sources = (
+            self._prefixed(self._skus, prefix, exact=True),
+            self._prefixed(self._skus, prefix),
+            self._prefixed(self._names, prefix),
+            self._prefixed(self._words, prefix),
+        )
+        matches = []
+        seen = set()
+        for source in sources:
+            for product_id in source:
+                if product_id not in seen:
+                    seen.add(product_id)
+                    matches.append(self.products[product_id])
+                    if len(matches) == limit:
+                        return matches
+        return matches
+
+
+def _load_index(version):
+    rows = db.session.query(
+        Product.id,
+        Product.name,
+        Product.sku,
+        Product.unit,
+        Product.image_url,
+        Product.category_id,
+        Category.name.label('category_name')
+    ).select_from(Product)\
+     .outerjoin(Category, Product.category_id == Category.id)\
+     .filter(Product.is_deleted == False)
+    return ProductSearchIndex(version, [
+        {
+            'id': row.id,
+            'name': row.name,
+            'sku': row.sku,
+            'unit': row.unit,
+            'image_url': row.image_url,
+            'category_id': row.category_id,
+            'category': row.category_name
+        }
+        for row in rows
+    ])
+
+
+_build_lock = threading.Lock()
+
+
+def product_search_index():
+    """The app's index, rebuilt first if the catalog changed since it was built."""
+    version = catalog_version()
+    index = current_app.extensions.get('product_search_index')
+    if index is not None and index.version == version:
+        return index
+    with _build_lock:
+        # Another request may have rebuilt it while this one waited
+        index = current_app.extensions.get('product_search_index')
+        if index is None or index.version != version:
+            index = _load_index(version)
+            current_app.extensions['product_search_index'] = index
+    return index
+
+
+def search_products(term, limit=DEFAULT_SEARCH_LIMIT, store_id=None):
+    """
+    Top `limit` products whose SKU, name or a word of the name starts with
+    `term`. With `store_id`, each match also carries that store's
+    store_product_id, price and quantity_in_stock (None when not stocked),
+    fetched with one query for just the matches.
+    """
+    matches = [dict(product) for product in product_search_index().search(term, limit)]
+    if store_id is not None and matches:
+        stock = {
+            row.product_id: row
+            for row in db.session.query(
+                StoreProduct.id, StoreProduct.product_id, StoreProduct.price, StoreProduct.quantity_in_stock
+            ).filter(
+                StoreProduct.store_id == store_id,
+                StoreProduct.is_deleted == False,
+                StoreProduct.product_id.in_([product['id'] for product in matches])
+            )
+        }
+        for product in matches:
+            row = stock.get(product['id'])
+            product['store_product_id'] = row.id if row else None
+            product['price'] = float(row.price) if row else None
+            product['quantity_in_stock'] = row.quantity_in_stock if row else None
+    return matches
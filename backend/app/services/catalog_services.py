@@ -0,0 +1,225 @@
+# app/services/catalog_services.py
+"""
+Product catalog: bulk CSV import and the catalog version counter.
+
+Every transaction that changes a product or category bumps the single
+catalog_version row, so the product listing can tag its responses with a
+strong ETag and answer revalidations with 304. ORM changes are picked up by
+an after_flush listener; bulk statements (the CSV import) bump explicitly
+with bump_catalog_version().
+"""
+
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import db, CatalogVersion, Category, Product, Store, StoreProduct
+from app.errors import BadRequestError, NotFoundError
+from app.cache import INVALIDATES_STORES
+from app.db_utils import upsert
+from app.services.stock_services import STORE_PRODUCT_KEY
+
+IMPORT_BATCH_SIZE = 2000
+MAX_REPORTED_IMPORT_ERRORS = 500
+
+PRODUCT_IMPORT_COLUMNS = ('sku', 'name', 'unit')
+STORE_PRODUCT_IMPORT_COLUMNS = ('price', 'unit_cost')
+DEFAULT_LOW_STOCK_THRESHOLD = 10
+
+CATALOG_VERSION_ID = 1
+
+
+# --- Catalog version --------------------------------------------------------
+
+def catalog_version():
+    """Current catalog version (0 before the first change)."""
+    return db.session.query(CatalogVersion.version).filter(CatalogVersion.id == CATALOG_VERSION_ID).scalar() or 0
+
+
+def bump_catalog_version(connection=None):
+    """
+    Increments the catalog version in the current transaction. The row lock
+    taken by the UPDATE is held until commit, so concurrent catalog writers
+    never hand out the same version for different contents.
+    """
+    execute = (connection or db.session).execute
+    result = execute(
+        update(CatalogVersion).where(CatalogVersion.id == CATALOG_VERSION_ID)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        execute(insert(CatalogVersion).values(id=CATALOG_VERSION_ID, version=1))
+
+
+_listeners_registered = False
+
+
+def register_catalog_listeners():
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'after_flush', _bump_on_catalog_change)
+    _listeners_registered = True
+
+
+def _bump_on_catalog_change(session, flush_context):
+    catalog_models = (Product, Category)
+    changed = any(isinstance(obj, catalog_models) for obj in (*session.new, *session.deleted)) or any(
+        isinstance(obj, catalog_models) and session.is_modified(obj, include_collections=False)
+        for obj in session.dirty
+    )
+    if changed:
+        # The session cannot be used for new work inside after_flush; its connection can
+        bump_catalog_version(session.connection())
+
+
+# --- CSV import -------------------------------------------------------------
+
+def _category_map():
+    """{lower-cased name: id} of the live categories, loaded once per import."""
+    return {
+        name.strip().lower(): category_id
+        for category_id, name in db.session.query(Category.id, Category.name).filter(Category.is_deleted == False)
+    }
+
+
+def _money(value, field):
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise BadRequestError(f"'{field}' must be a number.")
+    if not amount.is_finite() or amount < 0:
+        raise BadRequestError(f"'{field}' must be a non-negative number.")
+    return amount.quantize(Decimal('0.01'))
+
+
+def _parse_import_row(row, categories, with_store):
+    """Validates one CSV row; returns (product row, store product row or None)."""
+    values = {key: (value or '').strip() for key, value in row.items() if key}
+    missing = [column for column in PRODUCT_IMPORT_COLUMNS if not values.get(column)]
+    if with_store:
+        missing += [column for column in STORE_PRODUCT_IMPORT_COLUMNS if not values.get(column)]
+    if missing:
+        raise BadRequestError(f"Missing value for {', '.join(missing)}.")
+
+    category_id = None
+    category_name = values.get('category')
+    if category_name:
+        category_id = categories.get(category_name.lower())
+        if category_id is None:
+            raise BadRequestError(f"Unknown category '{category_name}'.")
+
+    product = {
+        'sku': values['sku'],
+        'name': values['name'],
+        'unit': values['unit'],
+        'description': values.get('description') or None,
+        'category_id': category_id
+    }
+    if not with_store:
+        return product, None
+
+    threshold = values.get('low_stock_threshold') or str(DEFAULT_LOW_STOCK_THRESHOLD)
+    if not threshold.isdigit():
+        raise BadRequestError("'low_stock_threshold' must be a non-negative integer.")
+    store_product = {
+        'price': _money(values['price'], 'price'),
+        'unit_cost': _money(values['unit_cost'], 'unit_cost'),
+        'low_stock_threshold': int(threshold)
+    }
+    return product, store_product
+
+
+def _write_import_batch(parsed, store_id):
+    """Upserts one batch of parsed rows and commits; returns the number of store products written."""
+    now = datetime.utcnow()
+    upsert(
+        Product,
+        [{**product, 'is_deleted': False, 'updated_at': now} for product, _ in parsed],
+        ('sku',),
+        replace=('name', 'unit', 'description', 'category_id', 'is_deleted', 'updated_at')
+    )
+
+    store_rows = []
+    if store_id is not None:
+        product_ids = dict(db.session.execute(
+            select(Product.sku, Product.id).where(Product.sku.in_({product['sku'] for product, _ in parsed}))
+        ).all())
+        store_rows = [
+            {
+                'store_id': store_id,
+                'product_id': product_ids[product['sku']],
+                **store_product,
+                'is_deleted': False,
+                'last_updated': now,
+                'updated_at': now
+            }
+            for product, store_product in parsed
+        ]
+        upsert(
+            StoreProduct, store_rows, STORE_PRODUCT_KEY,
+            replace=('price', 'unit_cost', 'low_stock_threshold', 'is_deleted', 'last_updated', 'updated_at'),
+            execution_options={INVALIDATES_STORES: {store_id}}
+        )
+    bump_catalog_version()
+    db.session.commit()
+    return len({row['product_id'] for row in store_rows})
+
+
+def import_products(text_stream, store_id=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Loads a product catalog from CSV text (header row required).
+
+    Columns: sku, name, unit (required), description, category (an existing
+    category's name, case-insensitive). With `store_id`, every product is
+    also stocked in that store and price, unit_cost (required) and
+    low_stock_threshold (default 10) set; quantities are left alone and come
+    in through purchases.
+
+    Rows are read lazily and written in batches of `batch_size`: products are
+    upserted by sku (existing ones are updated and undeleted), store products
+    by (store_id, product_id), and each batch is committed on its own. A row
+    that fails validation is reported, with the file line the row ends on,
+    and skipped without affecting the others; when a sku repeats, its last
+    row wins.
+    """
+    if store_id is not None and db.session.get(Store, store_id) is None:
+        raise NotFoundError(f"Store with ID {store_id} not found.")
+
+    reader = csv.DictReader(text_stream)
+    header = [column.strip().lower() for column in reader.fieldnames or []]
+    missing = [column for column in PRODUCT_IMPORT_COLUMNS if column not in header]
+    if store_id is not None:
+        missing += [column for column in STORE_PRODUCT_IMPORT_COLUMNS if column not in header]
+    if missing:
+        raise BadRequestError(f"CSV header is missing column(s): {', '.join(missing)}.")
+    reader.fieldnames = header
+
+    categories = _category_map()
+    with_store = store_id is not None
+    summary = {'rows': 0, 'products': 0, 'store_products': 0, 'error_count': 0, 'errors': []}
+    # line_num counts physical lines, so quoted fields spanning lines keep the numbers right
+    rows = ((reader.line_num, row) for row in reader)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        parsed = {}
+        for line, row in chunk:
+            summary['rows'] += 1
+            try:
+                product, store_product = _parse_import_row(row, categories, with_store)
+            except BadRequestError as e:
+                summary['error_count'] += 1
+                if len(summary['errors']) < MAX_REPORTED_IMPORT_ERRORS:
+                    summary['errors'].append({'line': line, 'sku': (row.get('sku') or '').strip() or None, 'error': e.message})
+                continue
+            parsed[product['sku']] = (product, store_product)
+        if parsed:
+            summary['store_products'] += _write_import_batch(list(parsed.values()), store_id)
+            summary['products'] += len(parsed)
+    return summary
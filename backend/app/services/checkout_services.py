@@ -0,0 +1,328 @@
+# app/services/checkout_services.py
+
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+
+from app.models import db, Sale, SaleItem, Store, StoreProduct, User
+from app.cache import INVALIDATES_STORES
+from app.errors import APIError, BadRequestError, ConflictError, NotFoundError, StockShortageError
+from app.services.stock_services import load_store_products, find_shortages, decrement_stock
+from app.services.idempotency_services import validate_key, request_fingerprint, lookup_keys, record_keys
+from app.services.search_services import refresh_sale_search_documents
+from app.services.rollup_services import add_line_contributions, apply_rollup_changes
+from app.services.ledger_services import movement, record_stock_movements
+
+PAYMENT_STATUSES = ('paid', 'unpaid')
+
+
+def parse_sale_items(sale_items_data):
+    """
+    Validates the incoming sale lines and returns them as a list of
+    (store_product_id, quantity) tuples in request order.
+    """
+    if not isinstance(sale_items_data, list):
+        raise BadRequestError("'sale_items' must be a list.")
+
+    lines = []
+    for item_data in sale_items_data:
+        if not isinstance(item_data, dict):
+            raise BadRequestError("Each sale item must be an object.")
+        store_product_id = item_data.get('store_product_id')
+        quantity = item_data.get('quantity')
+
+        if not all([store_product_id, quantity is not None]):
+            raise BadRequestError("Missing 'store_product_id' or 'quantity' in a sale item.")
+
+        try:
+            store_product_id = int(store_product_id)
+        except (ValueError, TypeError):
+            raise BadRequestError("'store_product_id' for a sale item must be an integer.")
+        try:
+            quantity = int(quantity)
+        except (ValueError, TypeError):
+            raise BadRequestError("Quantity for a sale item must be a valid number.")
+        if quantity <= 0:
+            raise BadRequestError("Quantity for a sale item must be positive.")
+
+        lines.append((store_product_id, quantity))
+    return lines
+
+
+def total_quantities(lines):
+    """Sums the requested quantity per store product (a basket may repeat a SKU)."""
+    quantities = {}
+    for store_product_id, quantity in lines:
+        quantities[store_product_id] = quantities.get(store_product_id, 0) + quantity
+    return quantities
+
+
+def checkout(store_id, cashier_id, payment_status, sale_items_data):
+    """
+    Creates a sale and its items and takes the stock for them.
+
+    All referenced StoreProducts are fetched in one query and every stock
+    decrement is applied in one guarded UPDATE, so the number of round trips
+    does not grow with the basket size and two tills cannot oversell a SKU.
+    Every short line is reported together, and the sale's search document and
+    daily rollups are written. The session is flushed but not committed; the caller owns the
+    transaction.
+    """
+    store = Store.query.filter_by(id=store_id, is_deleted=False).first()
+    if not store:
+        raise NotFoundError(f"Store with ID {store_id} not found.")
+
+    cashier = User.query.filter_by(id=cashier_id, is_deleted=False).first()
+    if not cashier:
+        raise NotFoundError(f"Cashier with ID {cashier_id} not found.")
+
+    lines = parse_sale_items(sale_items_data)
+    quantities = total_quantities(lines)
+    store_products = load_store_products(store_id, quantities.keys())
+
+    shortages = find_shortages(store_products, quantities)
+    if shortages:
+        raise StockShortageError(shortages)
+
+    decrement_stock(store_products, quantities)
+
+    new_sale = Sale(
+        store_id=store_id,
+        cashier_id=cashier_id,
+        payment_status=payment_status
+    )
+    new_sale.sale_items = [
+        SaleItem(
+            store_product_id=store_product_id,
+            quantity=quantity,
+            price_at_sale=store_products[store_product_id].price
+        )
+        for store_product_id, quantity in lines
+    ]
+    db.session.add(new_sale)
+    db.session.flush()
+    record_stock_movements([
+        movement(store_id, store_products[store_product_id].product_id, -quantity, 'sale', new_sale.id)
+        for store_product_id, quantity in quantities.items()
+    ])
+    refresh_sale_search_documents([new_sale.id])
+    apply_rollup_changes({}, add_line_contributions({}, store_id, new_sale.created_at, [
+        (store_products[store_product_id].product_id, quantity, store_products[store_product_id].price)
+        for store_product_id, quantity in lines
+    ]))
+    return new_sale
+
+
+def _parse_batch_sale(sale_data):
+    """Validates one entry of a batch upload without touching the database."""
+    if not isinstance(sale_data, dict):
+        raise BadRequestError("Each sale must be a JSON object.")
+
+    store_id = sale_data.get('store_id')
+    cashier_id = sale_data.get('cashier_id')
+    payment_status = sale_data.get('payment_status')
+    sale_items_data = sale_data.get('sale_items')
+
+    if not all([store_id, cashier_id, payment_status, sale_items_data]):
+        raise BadRequestError("Missing required fields for sale creation.")
+    if payment_status not in PAYMENT_STATUSES:
+        raise BadRequestError("Invalid payment status. Must be 'paid' or 'unpaid'.")
+
+    created_at = sale_data.get('created_at')
+    if created_at:
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (ValueError, TypeError):
+            raise BadRequestError("Invalid created_at format. Use ISO 8601.")
+
+    try:
+        store_id = int(store_id)
+        cashier_id = int(cashier_id)
+    except (ValueError, TypeError):
+        raise BadRequestError("store_id and cashier_id must be integers.")
+
+    idempotency_key = sale_data.get('idempotency_key')
+    if idempotency_key is not None:
+        validate_key(str(idempotency_key))
+
+    return {
+        'idempotency_key': str(idempotency_key) if idempotency_key is not None else None,
+        'request_hash': request_fingerprint({k: v for k, v in sale_data.items() if k != 'idempotency_key'}),
+        'store_id': store_id,
+        'cashier_id': cashier_id,
+        'payment_status': payment_status,
+        'created_at': created_at or datetime.utcnow(),
+        'lines': parse_sale_items(sale_items_data)
+    }
+
+
+def checkout_batch(sales_data):
+    """
+    Creates many sales at once, e.g. the queue a till replays after being offline.
+
+    Stores, cashiers and StoreProducts for the whole upload are preloaded with
+    one query each, every sale is validated in memory against a running stock
+    tally, and accepted sales and their items are written with bulk INSERTs
+    followed by one guarded stock UPDATE. A sale that fails validation is
+    reported and skipped without affecting the others. A sale whose
+    'idempotency_key' was already used (in an earlier upload or earlier in
+    this one) is not created again; its original sale is reported instead.
+
+    Returns (results, key_entries): one result dict per submitted sale in
+    input order, and the idempotency keys staged in the session. The session
+    is flushed but not committed; the caller owns the transaction.
+    """
+    results = [None] * len(sales_data)
+    parsed = {}
+    for index, sale_data in enumerate(sales_data):
+        try:
+            parsed[index] = _parse_batch_sale(sale_data)
+        except APIError as e:
+            results[index] = {"index": index, "status": "failed", "error": e.message}
+
+    # Resolve retried sales before any validation so they cost nothing further
+    known_keys = lookup_keys({
+        sale['idempotency_key']: sale['request_hash']
+        for sale in parsed.values() if sale['idempotency_key']
+    })
+    first_use = {}
+    repeats = []
+    for index, sale in list(parsed.items()):
+        key = sale['idempotency_key']
+        if not key:
+            continue
+        outcome = known_keys.get(key)
+        if isinstance(outcome, ConflictError):
+            results[index] = {"index": index, "status": "failed", "error": outcome.message}
+        elif outcome:
+            results[index] = {
+                "index": index, "status": "created", "sale_id": outcome.sale_id,
+                "total": outcome.total, "replayed": True
+            }
+        elif key in first_use:
+            repeats.append((index, first_use[key], sale['request_hash']))
+        else:
+            first_use[key] = index
+            continue
+        del parsed[index]
+
+    store_ids = {sale['store_id'] for sale in parsed.values()}
+    cashier_ids = {sale['cashier_id'] for sale in parsed.values()}
+    store_product_ids = {sp_id for sale in parsed.values() for sp_id, _ in sale['lines']}
+
+    active_store_ids = {
+        store_id for (store_id,) in
+        db.session.query(Store.id).filter(Store.id.in_(store_ids), Store.is_deleted == False)
+    } if store_ids else set()
+    active_cashier_ids = {
+        user_id for (user_id,) in
+        db.session.query(User.id).filter(User.id.in_(cashier_ids), User.is_deleted == False)
+    } if cashier_ids else set()
+    # Lock the stock rows for the rest of the transaction so the in-memory tally stays authoritative
+    store_products = {
+        sp.id: sp for sp in
+        StoreProduct.query.options(joinedload(StoreProduct.product))
+        .filter(StoreProduct.id.in_(store_product_ids), StoreProduct.is_deleted == False)
+        .with_for_update(of=StoreProduct)
+        .all()
+    } if store_product_ids else {}
+
+    available = {sp_id: sp.quantity_in_stock for sp_id, sp in store_products.items()}
+    accepted = []
+    for index, sale in parsed.items():
+        try:
+            if sale['store_id'] not in active_store_ids:
+                raise NotFoundError(f"Store with ID {sale['store_id']} not found.")
+            if sale['cashier_id'] not in active_cashier_ids:
+                raise NotFoundError(f"Cashier with ID {sale['cashier_id']} not found.")
+
+            quantities = total_quantities(sale['lines'])
+            for sp_id in quantities:
+                store_product = store_products.get(sp_id)
+                if not store_product or store_product.store_id != sale['store_id']:
+                    raise NotFoundError(
+                        f"Store product with ID {sp_id} not found or is deleted in store {sale['store_id']}."
+                    )
+            shortages = find_shortages(store_products, quantities, available)
+            if shortages:
+                raise StockShortageError(shortages)
+        except APIError as e:
+            results[index] = {"index": index, "status": "failed", "error": e.message, **e.payload}
+            continue
+
+        for sp_id, quantity in quantities.items():
+            available[sp_id] -= quantity
+        accepted.append((index, sale))
+
+    if not accepted:
+        _resolve_repeats(results, repeats, parsed)
+        return results, []
+
+    touched_stores = {INVALIDATES_STORES: {sale['store_id'] for _, sale in accepted}}
+    sale_ids = db.session.scalars(
+        insert(Sale).returning(Sale.id, sort_by_parameter_order=True).execution_options(**touched_stores),
+        [
+            {
+                'store_id': sale['store_id'],
+                'cashier_id': sale['cashier_id'],
+                'payment_status': sale['payment_status'],
+                'created_at': sale['created_at'],
+                'updated_at': sale['created_at']
+            }
+            for _, sale in accepted
+        ]
+    ).all()
+
+    item_rows = []
+    taken = {}
+    rollup = {}
+    movements = []
+    for sale_id, (index, sale) in zip(sale_ids, accepted):
+        total = Decimal('0.00')
+        add_line_contributions(rollup, sale['store_id'], sale['created_at'], [
+            (store_products[sp_id].product_id, quantity, store_products[sp_id].price)
+            for sp_id, quantity in sale['lines']
+        ])
+        for sp_id, quantity in sale['lines']:
+            price = store_products[sp_id].price
+            item_rows.append({
+                'sale_id': sale_id,
+                'store_product_id': sp_id,
+                'quantity': quantity,
+                'price_at_sale': price
+            })
+            taken[sp_id] = taken.get(sp_id, 0) + quantity
+            total += price * quantity
+        movements.extend(
+            movement(sale['store_id'], store_products[sp_id].product_id, -quantity, 'sale', sale_id)
+            for sp_id, quantity in total_quantities(sale['lines']).items()
+        )
+        results[index] = {"index": index, "status": "created", "sale_id": sale_id, "total": float(total)}
+
+    db.session.execute(insert(SaleItem).execution_options(**touched_stores), item_rows)
+    decrement_stock(store_products, taken)
+    record_stock_movements(movements)
+    refresh_sale_search_documents(sale_ids)
+    apply_rollup_changes({}, rollup)
+
+    key_entries = [
+        (sale['idempotency_key'], sale['request_hash'], results[index]['sale_id'], results[index]['total'])
+        for index, sale in accepted if sale['idempotency_key']
+    ]
+    record_keys(key_entries)
+    _resolve_repeats(results, repeats, parsed)
+    return results, key_entries
+
+
+def _resolve_repeats(results, repeats, parsed):
+    """Points sales that reuse a key from earlier in the same upload at that first sale."""
+    for index, first_index, request_hash in repeats:
+        first = results[first_index]
+        if parsed[first_index]['request_hash'] != request_hash:
+            error = f"Idempotency-Key '{parsed[first_index]['idempotency_key']}' was already used for a different request."
+            results[index] = {"index": index, "status": "failed", "error": error}
+        elif first['status'] == 'created':
+            results[index] = {**first, "index": index, "replayed": True}
+        else:
+            results[index] = {**first, "index": index}
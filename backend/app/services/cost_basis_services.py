@@ -0,0 +1,85 @@
+# app/services/cost_basis_services.py
+
+from decimal import Decimal
+from sqlalchemy import and_, delete, func, insert, select
+
+from app.models import db, Purchase, PurchaseItem, ProductCostBasis
+from app.db_utils import upsert
+
+COST_BASIS_KEY = ('store_id', 'product_id')
+
+# Items that count towards a cost basis: live, on a live purchase, with a store and product
+_LIVE_COSTED_ITEMS = and_(
+    PurchaseItem.is_deleted == False,
+    Purchase.is_deleted == False,
+    Purchase.store_id.isnot(None),
+    PurchaseItem.product_id.isnot(None)
+)
+
+
+def purchase_contributions(purchase_ids):
+    """
+    Current contribution of the given purchases (live items of live purchases
+    only) as a {(store_id, product_id): (quantity, cost)} map.
+    """
+    totals = {}
+    if not purchase_ids:
+        return totals
+
+    rows = db.session.query(
+        Purchase.store_id, PurchaseItem.product_id, PurchaseItem.quantity, PurchaseItem.unit_cost
+    ).select_from(PurchaseItem)\
+     .join(Purchase, PurchaseItem.purchase_id == Purchase.id)\
+     .filter(PurchaseItem.purchase_id.in_(purchase_ids), _LIVE_COSTED_ITEMS)
+
+    for store_id, product_id, quantity, unit_cost in rows:
+        key = (store_id, product_id)
+        total_quantity, cost = totals.get(key, (0, Decimal('0.00')))
+        totals[key] = (total_quantity + quantity, cost + Decimal(str(unit_cost or 0)) * quantity)
+    return totals
+
+
+def apply_cost_basis_changes(before, after):
+    """Adds (after - before) to the cost basis rows in one upsert."""
+    rows = []
+    for key in before.keys() | after.keys():
+        before_quantity, before_cost = before.get(key, (0, Decimal('0.00')))
+        after_quantity, after_cost = after.get(key, (0, Decimal('0.00')))
+        if after_quantity != before_quantity or after_cost != before_cost:
+            rows.append({
+                **dict(zip(COST_BASIS_KEY, key)),
+                'total_quantity': after_quantity - before_quantity,
+                'total_cost': after_cost - before_cost
+            })
+    upsert(ProductCostBasis, rows, COST_BASIS_KEY, increment=('total_quantity', 'total_cost'))
+
+
+def average_cost_column():
+    """Weighted-average unit cost of a ProductCostBasis row (NULL when nothing was bought)."""
+    return ProductCostBasis.total_cost / func.nullif(ProductCostBasis.total_quantity, 0)
+
+
+def backfill_product_cost_basis():
+    """
+    Recomputes every cost basis row from purchase_items with one
+    INSERT ... SELECT and commits. Returns the number of rows written.
+    """
+    db.session.execute(delete(ProductCostBasis))
+
+    source = select(
+        Purchase.store_id,
+        PurchaseItem.product_id,
+        func.sum(PurchaseItem.quantity),
+        func.coalesce(func.sum(PurchaseItem.unit_cost * PurchaseItem.quantity), 0)
+    ).select_from(PurchaseItem)\
+     .join(Purchase, PurchaseItem.purchase_id == Purchase.id)\
+     .where(_LIVE_COSTED_ITEMS)\
+     .group_by(Purchase.store_id, PurchaseItem.product_id)
+
+    result = db.session.execute(
+        insert(ProductCostBasis).from_select(
+            ['store_id', 'product_id', 'total_quantity', 'total_cost'], source
+        )
+    )
+    db.session.commit()
+    return result.rowcount
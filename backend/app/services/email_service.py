@@ -1,45 +1,91 @@
 # app/services/email_service.py
-import smtplib
+"""
+Outbound email through a durable outbox.
+
+Requests never talk to SMTP: queue_email() adds an email_outbox row to the
+caller's transaction, so the message exists exactly when the change that
+produced it is committed. Delivery happens in deliver_pending_emails(),
+which claims a batch of due messages (FOR UPDATE SKIP LOCKED, so several
+senders can run side by side), sends them over a pooled SMTP connection
+that stays open between batches, and reschedules failures with exponential
+backoff until EMAIL_OUTBOX_MAX_ATTEMPTS.
+
+Senders: an in-process OutboxWorker thread, started on the first queued
+email and woken after each commit that queues more (EMAIL_OUTBOX_WORKER,
+default on), and the `flask email send` / `flask email worker` commands for
+running delivery as its own process.
+"""
+
 import os
-from email.mime.text import MIMEText
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
 from flask import current_app
+from sqlalchemy import select
+
+from app.models import db, OutboundEmail
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 6 * 60 * 60
+DEFAULT_POLL_SECONDS = 10
+SMTP_IDLE_SECONDS = 60
+
+
+def smtp_settings():
+    """SMTP connection settings from the environment."""
+    smtp_user = os.getenv('SMTP_USER')
+    return {
+        'host': os.getenv('SMTP_HOST', 'smtp.gmail.com'),
+        'port': int(os.getenv('SMTP_PORT', '587')),
+        'user': smtp_user,
+        'password': os.getenv('SMTP_PASSWORD'),
+        'from_email': os.getenv('FROM_EMAIL', smtp_user),
+        'starttls': os.getenv('SMTP_STARTTLS', 'true').lower() in ('true', '1', 't'),
+    }
+
+
+# --- Queueing ---------------------------------------------------------------
+
+def queue_email(to_address, subject, html_body):
+    """Adds a message to the outbox in the current transaction; the caller commits."""
+    email = OutboundEmail(to_address=to_address, subject=subject, html_body=html_body)
+    db.session.add(email)
+    return email
+
+
+def notify_outbox():
+    """Wakes this process's sender (starting it if needed) after a commit that queued mail."""
+    app = current_app._get_current_object()
+    if not app.config.get('EMAIL_OUTBOX_WORKER', True):
+        return
+    worker = app.extensions.get('email_outbox_worker')
+    if worker is None or not worker.is_alive():
+        with _worker_lock:
+            worker = app.extensions.get('email_outbox_worker')
+            if worker is None or not worker.is_alive():
+                worker = OutboxWorker(app)
+                app.extensions['email_outbox_worker'] = worker
+                worker.start()
+    worker.wake()
+
 
 class EmailService:
     @staticmethod
-    def send_invitation_email(email, token, inviter_name, role='admin'):
-        """Send invitation email with registration link"""
-        try:
-            # Email configuration
-            smtp_server = os.getenv('SMTP_HOST', 'smtp.gmail.com')
-            smtp_port = int(os.getenv('SMTP_PORT', '587'))
-            smtp_user = os.getenv('SMTP_USER')
-            smtp_password = os.getenv('SMTP_PASSWORD')
-            from_email = os.getenv('FROM_EMAIL', smtp_user)
-            
-            # 🔥 DEBUG OUTPUT
-            print(f"📧 EMAIL DEBUG:")
-            print(f"   To: {email}")
-            print(f"   From: {from_email}")
-            print(f"   SMTP Server: {smtp_server}:{smtp_port}")
-            print(f"   SMTP User: {smtp_user}")
-            print(f"   Has Password: {'Yes' if smtp_password else 'No'}")
-            
-            if not all([smtp_user, smtp_password]):
-                error_msg = "Email configuration missing - check SMTP_USER and SMTP_PASSWORD in .env file"
-                print(f"❌ {error_msg}")
-                raise ValueError(error_msg)
-            
-            # Create invitation link
-            frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
-            invitation_link = f"{frontend_url}/register?token={token}"
-            
-            print(f"   Invitation Link: {invitation_link}")
-            
-            # Email content
-            subject = f"Admin Account Invitation - {role.title()} Role"
-            
-            html_body = f"""
+    def invitation_email(token, inviter_name, role='admin'):
+        """Subject and HTML body of an invitation with its registration link."""
+        frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
+        invitation_link = f"{frontend_url}/register?token={token}"
+
+        subject = f"Admin Account Invitation - {role.title()} Role"
+
+        html_body = f"""
             <html>
             <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
                 <div style="background-color: #f8f9fa; padding: 30px; border-radius: 10px;">
@@ -47,25 +93,25 @@ class EmailService:
                     <p>Hello,</p>
                     <p><strong>{inviter_name}</strong> has invited you to join as a <strong>{role.title()}</strong>.</p>
                     <p>Click the button below to complete your registration:</p>
-                    
+
                     <div style="text-align: center; margin: 30px 0;">
-                        <a href="{invitation_link}" 
-                           style="background-color: #007bff; color: white; padding: 15px 30px; 
+                        <a href="{invitation_link}"
+                           style="background-color: #007bff; color: white; padding: 15px 30px;
                                   text-decoration: none; border-radius: 5px; display: inline-block;
                                   font-weight: bold;">
                             Complete Registration
                         </a>
                     </div>
-                    
+
                     <div style="background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; border-radius: 5px; margin: 20px 0;">
                         <strong>⚠️ Important:</strong> This invitation expires in 24 hours.
                     </div>
-                    
+
                     <p>If the button doesn't work, copy and paste this link into your browser:</p>
                     <p style="word-break: break-all; font-size: 12px; background-color: #f1f3f4; padding: 10px; border-radius: 3px;">
                         {invitation_link}
                     </p>
-                    
+
                     <hr style="margin: 30px 0;">
                     <p style="font-size: 12px; color: #666; text-align: center;">
                         If you didn't expect this invitation, please ignore this email.
@@ -74,33 +120,209 @@ class EmailService:
             </body>
             </html>
             """
-            
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = from_email
-            msg['To'] = email
-            
-            html_part = MIMEText(html_body, 'html')
-            msg.attach(html_part)
-            
-            print("📧 Connecting to SMTP server...")
-            
-            # Send email
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                print("📧 Starting TLS...")
-                server.starttls()
-                print("📧 Logging in...")
-                server.login(smtp_user, smtp_password)
-                print("📧 Sending message...")
-                server.send_message(msg)
-                print("✅ Email sent successfully!")
-            
-            return True, "Email sent successfully"
-            
-        except Exception as e:
-            error_msg = f"Failed to send email: {str(e)}"
-            print(f"❌ EMAIL ERROR: {error_msg}")
-            if current_app:
-                current_app.logger.error(error_msg)
-            return False, error_msg
\ No newline at end of file
+        return subject, html_body
+
+    @staticmethod
+    def queue_invitation_email(email, token, inviter_name, role='admin'):
+        """Queues the invitation email in the current transaction (see queue_email)."""
+        subject, html_body = EmailService.invitation_email(token, inviter_name, role)
+        return queue_email(email, subject, html_body)
+
+
+# --- SMTP connections -------------------------------------------------------
+
+class SmtpConnection:
+    """An SMTP session reused across messages; reopened when idle too long or dropped."""
+
+    def __init__(self, settings, smtp_class=smtplib.SMTP):
+        self.settings = settings
+        self.smtp_class = smtp_class
+        self._server = None
+        self._last_used = 0.0
+
+    def send(self, message):
+        reused = self._server is not None
+        try:
+            self._connection().send_message(message)
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            raise  # the server answered; the connection is still usable
+        except OSError:  # includes SMTPServerDisconnected
+            self.close()
+            if not reused:
+                raise
+            # The server dropped a connection we kept open; one fresh attempt
+            self._connection().send_message(message)
+        self._last_used = time.monotonic()
+
+    def _connection(self):
+        if self._server is not None and time.monotonic() - self._last_used > SMTP_IDLE_SECONDS:
+            if not self._alive():
+                self.close()
+        if self._server is None:
+            settings = self.settings
+            server = self.smtp_class(settings['host'], settings['port'], timeout=30)
+            try:
+                if settings['starttls']:
+                    server.starttls()
+                if settings['user'] and settings['password']:
+                    server.login(settings['user'], settings['password'])
+            except Exception:
+                server.close()
+                raise
+            self._server = server
+            self._last_used = time.monotonic()
+        return self._server
+
+    def _alive(self):
+        try:
+            return self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+class SmtpConnectionPool:
+    """Keeps up to `size` idle SmtpConnections for reuse by sender threads."""
+
+    def __init__(self, settings=None, size=2, smtp_class=smtplib.SMTP):
+        self.settings = settings or smtp_settings()
+        self.size = size
+        self.smtp_class = smtp_class
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            connection = self._idle.pop() if self._idle else SmtpConnection(self.settings, self.smtp_class)
+        try:
+            yield connection
+        finally:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(connection)
+                    connection = None
+            if connection is not None:
+                connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+# --- Delivery ---------------------------------------------------------------
+
+def _mime_message(email, from_email):
+    message = MIMEMultipart('alternative')
+    message['Subject'] = email.subject
+    message['From'] = from_email
+    message['To'] = email.to_address
+    message.attach(MIMEText(email.html_body, 'html'))
+    return message
+
+
+def _backoff(attempts, base_seconds):
+    return timedelta(seconds=min(base_seconds * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+
+def deliver_pending_emails(pool, batch_size=None):
+    """
+    Sends one batch of due pending messages and commits the outcome.
+    Returns (sent, failed) counts for the batch; failed messages are
+    rescheduled, or marked 'failed' once out of attempts.
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('EMAIL_OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    max_attempts = config.get('EMAIL_OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    backoff_seconds = config.get('EMAIL_OUTBOX_BACKOFF_SECONDS', DEFAULT_BACKOFF_SECONDS)
+
+    now = datetime.utcnow()
+    emails = db.session.scalars(
+        select(OutboundEmail)
+        .where(OutboundEmail.status == 'pending', OutboundEmail.next_attempt_at <= now)
+        .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not emails:
+        db.session.rollback()
+        return 0, 0
+
+    sent = failed = 0
+    with pool.connection() as connection:
+        for email in emails:
+            email.attempts += 1
+            try:
+                connection.send(_mime_message(email, pool.settings['from_email']))
+            except (smtplib.SMTPException, OSError) as e:
+                failed += 1
+                email.last_error = str(e)
+                if email.attempts >= max_attempts:
+                    email.status = 'failed'
+                    current_app.logger.error(f"Giving up on email {email.id} to {email.to_address}: {e}")
+                else:
+                    email.next_attempt_at = datetime.utcnow() + _backoff(email.attempts, backoff_seconds)
+                continue
+            sent += 1
+            email.status = 'sent'
+            email.sent_at = datetime.utcnow()
+            email.last_error = None
+    db.session.commit()
+    return sent, failed
+
+
+def drain_outbox(pool, batch_size=None):
+    """Delivers batches until none is full; returns total (sent, failed)."""
+    batch_size = batch_size or current_app.config.get('EMAIL_OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = deliver_pending_emails(pool, batch_size)
+        total_sent += sent
+        total_failed += failed
+        if sent + failed < batch_size:
+            return total_sent, total_failed
+
+
+_worker_lock = threading.Lock()
+
+
+class OutboxWorker(threading.Thread):
+    """Background sender: drains the outbox when woken and every EMAIL_OUTBOX_POLL_SECONDS."""
+
+    def __init__(self, app, pool=None):
+        super().__init__(name='email-outbox', daemon=True)
+        self.app = app
+        self.pool = pool or SmtpConnectionPool()
+        self.poll_seconds = app.config.get('EMAIL_OUTBOX_POLL_SECONDS', DEFAULT_POLL_SECONDS)
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            with self.app.app_context():
+                try:
+                    drain_outbox(self.pool)
+                except Exception:
+                    self.app.logger.exception("Email outbox delivery failed")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+        self.pool.close()
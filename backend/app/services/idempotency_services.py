@@ -0,0 +1,106 @@
+# app/services/idempotency_services.py
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+from app.models import db, IdempotencyKey
+from app.errors import BadRequestError, ConflictError
+
+MAX_KEY_LENGTH = 255
+LRU_SIZE = 10000
+
+SaleReplay = namedtuple('SaleReplay', ['sale_id', 'total'])
+
+# Recently used keys per process; a committed key never changes, so entries never go stale.
+_recent_keys = OrderedDict()
+_recent_keys_lock = threading.Lock()
+
+
+def validate_key(key):
+    if len(key) > MAX_KEY_LENGTH:
+        raise BadRequestError(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters.")
+    return key
+
+
+def request_fingerprint(payload):
+    """Stable hash of a request body, used to reject a key reused for a different sale."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _remember(key, request_hash, replay):
+    with _recent_keys_lock:
+        _recent_keys[key] = (request_hash, replay)
+        _recent_keys.move_to_end(key)
+        while len(_recent_keys) > LRU_SIZE:
+            _recent_keys.popitem(last=False)
+
+
+def _replay_or_conflict(key, stored_hash, request_hash, replay):
+    if stored_hash != request_hash:
+        return ConflictError(f"Idempotency-Key '{key}' was already used for a different request.")
+    return replay
+
+
+def lookup_keys(keys_with_hashes):
+    """
+    Looks up {key: request_hash} pairs and returns {key: SaleReplay} for keys
+    that were already used, or {key: ConflictError} when a key was used with a
+    different request body. Keys in the process LRU cost no query; the rest
+    are resolved with a single IN (...) lookup.
+    """
+    found = {}
+    missing = []
+    with _recent_keys_lock:
+        for key, request_hash in keys_with_hashes.items():
+            cached = _recent_keys.get(key)
+            if cached:
+                _recent_keys.move_to_end(key)
+                found[key] = _replay_or_conflict(key, cached[0], request_hash, cached[1])
+            else:
+                missing.append(key)
+
+    if missing:
+        rows = db.session.query(
+            IdempotencyKey.key, IdempotencyKey.request_hash, IdempotencyKey.sale_id, IdempotencyKey.sale_total
+        ).filter(IdempotencyKey.key.in_(missing)).all()
+        for key, stored_hash, sale_id, total in rows:
+            replay = SaleReplay(sale_id, float(total))
+            _remember(key, stored_hash, replay)
+            found[key] = _replay_or_conflict(key, stored_hash, keys_with_hashes[key], replay)
+    return found
+
+
+def find_replays(keys_with_hashes):
+    """Like lookup_keys, but raises the ConflictError of the first reused key."""
+    found = lookup_keys(keys_with_hashes)
+    for outcome in found.values():
+        if isinstance(outcome, ConflictError):
+            raise outcome
+    return found
+
+
+def find_replay(key, request_hash):
+    """Returns the SaleReplay recorded for key, or None if the key is new."""
+    return find_replays({key: request_hash}).get(key)
+
+
+def record_keys(entries):
+    """
+    Stages IdempotencyKey rows for (key, request_hash, sale_id, total) tuples in
+    the current transaction, so a key is only stored if its sale is committed.
+    A concurrent request with the same key fails on the unique constraint.
+    """
+    if entries:
+        db.session.add_all([
+            IdempotencyKey(key=key, request_hash=request_hash, sale_id=sale_id, sale_total=total)
+            for key, request_hash, sale_id, total in entries
+        ])
+
+
+def remember_committed(entries):
+    """Primes the process LRU with keys whose transaction has committed."""
+    for key, request_hash, sale_id, total in entries:
+        _remember(key, request_hash, SaleReplay(sale_id, float(total)))
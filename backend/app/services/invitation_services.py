@@ -0,0 +1,39 @@
+# app/services/invitation_services.py
+
+from datetime import datetime, timedelta
+from sqlalchemy import delete, or_, select
+
+from app.models import db, InvitationToken
+
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_SWEEP_BATCH_SIZE = 1000
+
+
+def sweep_invitation_tokens(retention_days=DEFAULT_RETENTION_DAYS, batch_size=DEFAULT_SWEEP_BATCH_SIZE, now=None):
+    """
+    Deletes invitation tokens that can no longer be accepted once they are
+    older than the retention period: expired more than `retention_days` ago,
+    or used/cancelled and created before then. Works in batches of
+    `batch_size` ids, committing each, so the sweep never holds long locks.
+    Returns the number of tokens deleted.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    sweepable = or_(
+        InvitationToken.expires_at < cutoff,
+        (InvitationToken.is_used == True) & (InvitationToken.created_at < cutoff),
+        (InvitationToken.is_deleted == True) & (InvitationToken.created_at < cutoff)
+    )
+
+    deleted = 0
+    while True:
+        token_ids = db.session.scalars(
+            select(InvitationToken.id).where(sweepable).order_by(InvitationToken.id).limit(batch_size)
+        ).all()
+        if not token_ids:
+            return deleted
+        db.session.execute(
+            delete(InvitationToken).where(InvitationToken.id.in_(token_ids)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        deleted += len(token_ids)
@@ -0,0 +1,193 @@
+# app/services/ledger_services.py
+"""
+Stock movement ledger and snapshots.
+
+Bulk stock statements (sales checkout, purchase receipts, transfers) record
+their movements explicitly with record_stock_movements(). Changes made
+through the unit of work (editing or voiding a sale or purchase) are picked
+up by an after_flush listener from the quantity_in_stock history of the
+flushed StoreProduct rows; the route names the reason with
+set_movement_reason() beforehand.
+
+Snapshots and replay are ordered by commit, not by clock: every transaction
+that records movements takes the next value of each affected store's
+StockLedgerClock, which it keeps locked until it commits, and stamps its
+movements with it. A snapshot reads the clock in the same statement as the
+stock levels, so a movement is in the snapshot exactly when its seq is not
+above the snapshot's, however long its transaction ran.
+"""
+
+from datetime import datetime
+from sqlalchemy import event, func, insert, inspect, literal, select
+from sqlalchemy.orm import Session
+
+from app.models import db, StoreProduct, StockMovement, StockSnapshot, StockLedgerClock
+from app.db_utils import increment_counter
+
+DEFAULT_REASON = 'adjustment'
+_REASON_KEY = 'stock_movement_reason'
+
+
+def movement(store_id, product_id, quantity_change, reason, reference_id=None):
+    return {
+        'store_id': store_id,
+        'product_id': product_id,
+        'quantity_change': quantity_change,
+        'reason': reason,
+        'reference_id': reference_id
+    }
+
+
+def record_stock_movements(movements):
+    """Appends movement dicts (see movement()) to the ledger in one INSERT, skipping zero changes."""
+    rows = [dict(row) for row in movements if row['quantity_change']]
+    if rows:
+        _insert_movements(db.session.connection(), rows)
+
+
+def _insert_movements(connection, rows):
+    """Stamps movement rows with their stores' next ledger seq and inserts them."""
+    # Stores are locked in id order so transactions touching two (transfers) cannot deadlock
+    seqs = {
+        store_id: increment_counter(connection, StockLedgerClock, 'store_id', store_id, 'seq')
+        for store_id in sorted({row['store_id'] for row in rows})
+    }
+    now = datetime.utcnow()
+    connection.execute(insert(StockMovement), [
+        {**row, 'seq': seqs[row['store_id']], 'created_at': now} for row in rows
+    ])
+
+
+def set_movement_reason(reason, reference_id=None, session=None):
+    """
+    Labels the stock changes the current transaction makes through the ORM
+    (e.g. 'sale_void' for sale 12). Cleared when the transaction ends.
+    """
+    (session or db.session).info[_REASON_KEY] = (reason, reference_id)
+
+
+# --- Unit-of-work changes ---------------------------------------------------
+
+_listeners_registered = False
+
+
+def register_ledger_listeners():
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'after_flush', _record_flushed_movements)
+    event.listen(Session, 'after_commit', _clear_reason)
+    event.listen(Session, 'after_rollback', _clear_reason)
+    _listeners_registered = True
+
+
+def _flushed_changes(session):
+    for obj in session.new:
+        if isinstance(obj, StoreProduct):
+            yield obj, obj.quantity_in_stock or 0
+    for obj in session.dirty:
+        if isinstance(obj, StoreProduct):
+            history = inspect(obj).attrs.quantity_in_stock.history
+            if history.added and history.deleted:
+                yield obj, (history.added[0] or 0) - (history.deleted[0] or 0)
+    for obj in session.deleted:
+        if isinstance(obj, StoreProduct):
+            yield obj, -(obj.quantity_in_stock or 0)
+
+
+def _record_flushed_movements(session, flush_context):
+    reason, reference_id = session.info.get(_REASON_KEY, (DEFAULT_REASON, None))
+    rows = [
+        movement(obj.store_id, obj.product_id, change, reason, reference_id)
+        for obj, change in _flushed_changes(session)
+        if change and obj.store_id is not None and obj.product_id is not None
+    ]
+    if rows:
+        # The session cannot be used for new work inside after_flush; its connection can
+        _insert_movements(session.connection(), rows)
+
+
+def _clear_reason(session):
+    session.info.pop(_REASON_KEY, None)
+
+
+# --- Snapshots and replay ---------------------------------------------------
+
+def take_stock_snapshots(store_ids=None):
+    """
+    Copies the current quantity_in_stock of every product (of the given
+    stores, or all) into stock_snapshots with one INSERT ... SELECT, which
+    also reads each store's ledger clock, and commits. Returns the number of
+    rows written.
+    """
+    taken_at = datetime.utcnow()
+    source = select(
+        StoreProduct.store_id,
+        literal(taken_at, db.DateTime),
+        StoreProduct.product_id,
+        func.coalesce(StoreProduct.quantity_in_stock, 0),
+        func.coalesce(StockLedgerClock.seq, 0)
+    ).select_from(StoreProduct)\
+        .outerjoin(StockLedgerClock, StockLedgerClock.store_id == StoreProduct.store_id)\
+        .where(StoreProduct.store_id.isnot(None), StoreProduct.product_id.isnot(None))
+    if store_ids:
+        source = source.where(StoreProduct.store_id.in_(store_ids))
+
+    result = db.session.execute(
+        insert(StockSnapshot).from_select(['store_id', 'taken_at', 'product_id', 'quantity', 'seq'], source)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def stock_as_of(store_id, as_of):
+    """
+    Stock level of each product of a store at `as_of`: the latest snapshot
+    taken at or before it plus the movements it does not include (a higher
+    seq) recorded up to `as_of`. Returns ({product_id: quantity}, snapshot
+    taken_at or None).
+    """
+    snapshot = db.session.query(StockSnapshot.taken_at, StockSnapshot.seq).filter(
+        StockSnapshot.store_id == store_id,
+        StockSnapshot.taken_at <= as_of
+    ).order_by(StockSnapshot.taken_at.desc()).first()
+    taken_at = snapshot.taken_at if snapshot else None
+
+    levels = {}
+    if taken_at is not None:
+        levels = dict(db.session.query(StockSnapshot.product_id, StockSnapshot.quantity).filter(
+            StockSnapshot.store_id == store_id,
+            StockSnapshot.taken_at == taken_at
+        ))
+
+    deltas = db.session.query(StockMovement.product_id, func.sum(StockMovement.quantity_change)).filter(
+        StockMovement.store_id == store_id,
+        StockMovement.created_at <= as_of
+    )
+    if taken_at is not None:
+        deltas = deltas.filter(StockMovement.seq > snapshot.seq)
+    for product_id, change in deltas.group_by(StockMovement.product_id):
+        levels[product_id] = levels.get(product_id, 0) + int(change)
+    return levels, taken_at
+
+
+def reconcile_stock(store_id):
+    """
+    Compares the ledger's view of a store's stock (snapshot plus replay up to
+    now) with StoreProduct.quantity_in_stock. Returns one entry per product
+    where they disagree.
+    """
+    expected, _ = stock_as_of(store_id, datetime.utcnow())
+    actual = dict(db.session.query(StoreProduct.product_id, StoreProduct.quantity_in_stock).filter(
+        StoreProduct.store_id == store_id
+    ))
+    return [
+        {
+            'product_id': product_id,
+            'ledger_quantity': expected.get(product_id, 0),
+            'quantity_in_stock': actual.get(product_id) or 0,
+            'difference': (actual.get(product_id) or 0) - expected.get(product_id, 0)
+        }
+        for product_id in sorted(expected.keys() | actual.keys())
+        if expected.get(product_id, 0) != (actual.get(product_id) or 0)
+    ]
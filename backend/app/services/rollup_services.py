@@ -0,0 +1,96 @@
+# app/services/rollup_services.py
+
+from datetime import datetime, time
+from decimal import Decimal
+from sqlalchemy import delete, func, insert, select
+
+from app.models import db, Sale, SaleItem, StoreProduct, DailyStoreProductSales
+from app.db_utils import sale_day, upsert
+
+ROLLUP_KEY = ('store_id', 'sale_date', 'product_id')
+
+
+def add_line_contributions(totals, store_id, sold_at, lines):
+    """
+    Accumulates sale lines ((product_id, quantity, price) tuples) into a
+    {(store_id, sale_date, product_id): (quantity, revenue)} map and returns it.
+    """
+    for product_id, quantity, price in lines:
+        key = (store_id, sold_at.date(), product_id)
+        total_quantity, revenue = totals.get(key, (0, Decimal('0.00')))
+        totals[key] = (total_quantity + quantity, revenue + price * quantity)
+    return totals
+
+
+def sale_contributions(sale_ids):
+    """
+    Current rollup contribution of the given sales (live items of live sales
+    only), in the same shape as add_line_contributions().
+    """
+    totals = {}
+    if not sale_ids:
+        return totals
+
+    rows = db.session.query(
+        Sale.store_id, Sale.created_at, StoreProduct.product_id, SaleItem.quantity, SaleItem.price_at_sale
+    ).select_from(SaleItem)\
+     .join(Sale, SaleItem.sale_id == Sale.id)\
+     .join(StoreProduct, SaleItem.store_product_id == StoreProduct.id)\
+     .filter(SaleItem.sale_id.in_(sale_ids), SaleItem.is_deleted == False, Sale.is_deleted == False)
+
+    for store_id, created_at, product_id, quantity, price in rows:
+        add_line_contributions(totals, store_id, created_at, [(product_id, quantity, price)])
+    return totals
+
+
+def apply_rollup_changes(before, after):
+    """
+    Adds (after - before) to the daily rollup rows in one upsert, so the
+    caller only has to capture a sale's contribution around its change.
+    """
+    rows = []
+    for key in before.keys() | after.keys():
+        before_quantity, before_revenue = before.get(key, (0, Decimal('0.00')))
+        after_quantity, after_revenue = after.get(key, (0, Decimal('0.00')))
+        if after_quantity != before_quantity or after_revenue != before_revenue:
+            rows.append({
+                **dict(zip(ROLLUP_KEY, key)),
+                'quantity': after_quantity - before_quantity,
+                'revenue': after_revenue - before_revenue
+            })
+    upsert(DailyStoreProductSales, rows, ROLLUP_KEY, increment=('quantity', 'revenue'))
+
+
+def backfill_daily_sales_rollups(since=None):
+    """
+    Recomputes the rollup rows from sale_items with one INSERT ... SELECT
+    (for days on or after `since`, or for all history) and commits.
+    Returns the number of rollup rows written.
+    """
+    clear = delete(DailyStoreProductSales)
+    if since:
+        clear = clear.where(DailyStoreProductSales.sale_date >= since)
+    db.session.execute(clear)
+
+    day = sale_day(Sale.created_at)
+    source = select(
+        Sale.store_id,
+        day,
+        StoreProduct.product_id,
+        func.sum(SaleItem.quantity),
+        func.sum(SaleItem.price_at_sale * SaleItem.quantity)
+    ).select_from(SaleItem)\
+     .join(Sale, SaleItem.sale_id == Sale.id)\
+     .join(StoreProduct, SaleItem.store_product_id == StoreProduct.id)\
+     .where(SaleItem.is_deleted == False, Sale.is_deleted == False)\
+     .group_by(Sale.store_id, day, StoreProduct.product_id)
+    if since:
+        source = source.where(Sale.created_at >= datetime.combine(since, time.min))
+
+    result = db.session.execute(
+        insert(DailyStoreProductSales).from_select(
+            ['store_id', 'sale_date', 'product_id', 'quantity', 'revenue'], source
+        )
+    )
+    db.session.commit()
+    return result.rowcount
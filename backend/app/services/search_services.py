@@ -0,0 +1,103 @@
+# app/services/search_services.py
+"""
+Sale search documents: one text row per sale with its product, cashier and
+store names, searched by substring (see sale_search_condition).
+
+A sale's document is rewritten only when the sale itself is written (checkout,
+edits, deletion). Renaming a product, cashier or store does not touch existing
+documents, since one rename can affect every sale of that store or product:
+older sales keep matching the old name, and not the new one, until
+`flask search rebuild` runs. Run it after renames, or on a schedule.
+"""
+
+from datetime import datetime
+from sqlalchemy import column, delete, insert, select, table
+
+from app.models import db, Sale, SaleItem, SaleSearchDocument, Product, StoreProduct, Store, User
+
+# SQLite mirror of sale_search_documents (see the DDL events in app.models)
+_sale_search_fts = table('sale_search_fts', column('rowid'), column('document'))
+
+
+def _build_documents(sale_ids):
+    """Returns {sale_id: document} for the given sales, built with two queries."""
+    names = {}
+    headers = db.session.query(Sale.id, User.name, Store.name)\
+        .select_from(Sale)\
+        .outerjoin(User, Sale.cashier_id == User.id)\
+        .outerjoin(Store, Sale.store_id == Store.id)\
+        .filter(Sale.id.in_(sale_ids), Sale.is_deleted == False)
+    for sale_id, cashier_name, store_name in headers:
+        names[sale_id] = [name for name in (cashier_name, store_name) if name]
+
+    product_names = db.session.query(SaleItem.sale_id, Product.name)\
+        .join(SaleItem.store_product)\
+        .join(StoreProduct.product)\
+        .filter(SaleItem.sale_id.in_(names.keys()), SaleItem.is_deleted == False)\
+        .distinct()
+    for sale_id, product_name in product_names:
+        names[sale_id].append(product_name)
+
+    # Newlines keep a term from matching across the boundary of two names
+    return {sale_id: '\n'.join(parts) for sale_id, parts in names.items()}
+
+
+def refresh_sale_search_documents(sale_ids):
+    """
+    Rewrites the search documents of the given sales from their current rows
+    (deleted sales lose theirs). Runs inside the caller's transaction.
+    """
+    sale_ids = list(set(sale_ids))
+    if not sale_ids:
+        return
+
+    documents = _build_documents(sale_ids)
+    db.session.execute(delete(SaleSearchDocument).where(SaleSearchDocument.sale_id.in_(sale_ids)))
+    if documents:
+        now = datetime.utcnow()
+        db.session.execute(insert(SaleSearchDocument), [
+            {'sale_id': sale_id, 'document': document, 'updated_at': now}
+            for sale_id, document in documents.items()
+        ])
+
+
+def rebuild_sale_search_documents(batch_size=1000):
+    """
+    Regenerates every search document, committing per batch of sales, e.g.
+    after a product, cashier or store rename. Returns the number indexed.
+    """
+    db.session.execute(
+        delete(SaleSearchDocument)
+        .where(SaleSearchDocument.sale_id.in_(select(Sale.id).where(Sale.is_deleted == True)))
+    )
+    db.session.commit()
+
+    indexed = 0
+    last_id = 0
+    while True:
+        sale_ids = db.session.scalars(
+            select(Sale.id)
+            .where(Sale.id > last_id, Sale.is_deleted == False)
+            .order_by(Sale.id)
+            .limit(batch_size)
+        ).all()
+        if not sale_ids:
+            return indexed
+        refresh_sale_search_documents(sale_ids)
+        db.session.commit()
+        indexed += len(sale_ids)
+        last_id = sale_ids[-1]
+
+
+def sale_search_condition(term):
+    """
+    Returns a WHERE clause matching sales whose product, cashier or store
+    names contain `term` (case-insensitive), answered from the indexed
+    search documents rather than by joining the sale tables.
+    """
+    pattern = f"%{term}%"
+    if db.session.get_bind().dialect.name == 'sqlite':
+        matches = select(_sale_search_fts.c.rowid).where(_sale_search_fts.c.document.like(pattern))
+    else:
+        matches = select(SaleSearchDocument.sale_id).where(SaleSearchDocument.document.ilike(pattern))
+    return Sale.id.in_(matches)
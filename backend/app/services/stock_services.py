@@ -0,0 +1,219 @@
+# app/services/stock_services.py
+
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import case, update
+from sqlalchemy.orm import joinedload
+
+from app.models import db, StoreProduct, Product
+from app.errors import NotFoundError, StockShortageError
+from app.cache import INVALIDATES_STORES
+from app.db_utils import upsert
+from app.services.ledger_services import movement, record_stock_movements
+
+STORE_PRODUCT_KEY = ('store_id', 'product_id')
+
+
+def load_store_products(store_id, store_product_ids):
+    """
+    Loads every requested StoreProduct of a store (with its Product) in a single
+    IN (...) query and returns them keyed by id.
+    Raises NotFoundError listing every id that is missing or soft-deleted.
+    """
+    ids = set(store_product_ids)
+    store_products = StoreProduct.query.options(joinedload(StoreProduct.product))\
+        .filter(StoreProduct.id.in_(ids), StoreProduct.store_id == store_id)\
+        .all()
+    found = {sp.id: sp for sp in store_products if not sp.is_deleted}
+
+    missing = sorted(ids - found.keys())
+    if missing:
+        missing_str = ", ".join(str(sp_id) for sp_id in missing)
+        raise NotFoundError(
+            f"Store product with ID {missing_str} not found or is deleted in store {store_id}.",
+            payload={'missing_store_product_ids': missing}
+        )
+    return found
+
+
+def find_shortages(store_products, quantities, available=None):
+    """
+    Compares requested quantities ({store_product_id: quantity}) against the
+    loaded StoreProduct rows, or against a running tally ({store_product_id:
+    quantity}) when one is given, and returns one entry per line that cannot
+    be filled.
+    """
+    shortages = []
+    for sp_id, quantity in quantities.items():
+        store_product = store_products[sp_id]
+        in_stock = available[sp_id] if available is not None else store_product.quantity_in_stock
+        if in_stock < quantity:
+            shortages.append(_shortage(store_product, in_stock, quantity))
+    return shortages
+
+
+def _shortage(store_product, in_stock, quantity):
+    return {
+        'store_product_id': store_product.id,
+        'product_name': store_product.product.name if store_product.product else 'N/A',
+        'available_stock': in_stock,
+        'requested_quantity': quantity
+    }
+
+
+def decrement_stock(store_products, quantities):
+    """
+    Applies all stock decrements ({store_product_id: quantity}) as one guarded
+    UPDATE ... WHERE quantity_in_stock >= :qty statement.
+
+    The statement only succeeds as a whole: if another transaction consumed
+    stock in the meantime fewer rows match. The rows it did not update
+    (RETURNING tells which) are re-read and reported together in a single
+    StockShortageError; lines that were taken are not, and no reported level
+    includes this statement's own decrements. The caller is responsible for
+    rolling back the session in that case.
+    """
+    if not quantities:
+        return
+
+    requested = case(quantities, value=StoreProduct.id)
+    stmt = update(StoreProduct)\
+        .where(StoreProduct.id.in_(list(quantities)), StoreProduct.quantity_in_stock >= requested)\
+        .values(quantity_in_stock=StoreProduct.quantity_in_stock - requested)\
+        .returning(StoreProduct.id)\
+        .execution_options(
+            synchronize_session=False,
+            **{INVALIDATES_STORES: {store_products[sp_id].store_id for sp_id in quantities}}
+        )
+    updated = set(db.session.execute(stmt).scalars())
+
+    if len(updated) != len(quantities):
+        shortages = []
+        for sp_id, quantity in quantities.items():
+            if sp_id not in updated:
+                db.session.refresh(store_products[sp_id], ['quantity_in_stock'])
+                shortages.append(_shortage(store_products[sp_id], store_products[sp_id].quantity_in_stock, quantity))
+        raise StockShortageError(shortages)
+
+    for sp_id in quantities:
+        db.session.expire(store_products[sp_id], ['quantity_in_stock', 'last_updated', 'updated_at'])
+
+
+def receive_stock(store_id, lines, reason='purchase', reference_id=None):
+    """
+    Adds received stock ((product_id, quantity, unit_cost) tuples) to a store
+    with one INSERT ... ON CONFLICT (store_id, product_id) DO UPDATE statement:
+    existing rows get quantity_in_stock incremented and unit_cost replaced by
+    the latest cost, missing rows are created. Lines for the same product are
+    merged first. The received quantities are recorded in the stock ledger
+    under `reason` / `reference_id` (the purchase).
+
+    StoreProduct instances already loaded in the session are not refreshed.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            'store_id': store_id,
+            'product_id': product_id,
+            'quantity_in_stock': quantity,
+            'unit_cost': Decimal(str(unit_cost)),
+            'last_updated': now,
+            'updated_at': now
+        }
+        for product_id, quantity, unit_cost in lines
+    ]
+    upsert(
+        StoreProduct, rows, STORE_PRODUCT_KEY,
+        increment=('quantity_in_stock',),
+        replace=('unit_cost', 'last_updated', 'updated_at'),
+        execution_options={INVALIDATES_STORES: {store_id}}
+    )
+
+    received = {}
+    for product_id, quantity, _ in lines:
+        received[product_id] = received.get(product_id, 0) + quantity
+    record_stock_movements([
+        movement(store_id, product_id, quantity, reason, reference_id)
+        for product_id, quantity in received.items()
+    ])
+
+
+def transfer_stock(from_store_id, to_store_id, quantities, reference_id=None):
+    """
+    Moves stock ({product_id: quantity}) between two stores as two set-based
+    statements: the source rows are locked (SELECT ... FOR UPDATE) and debited
+    with decrement_stock()'s guarded UPDATE, then the destination is credited
+    with one upsert that creates missing rows at the source's cost and price.
+    StoreProduct instances already loaded for the destination are not refreshed.
+    Both sides are recorded in the stock ledger against `reference_id` (the transfer).
+
+    Every line the source cannot cover, including products it does not
+    stock, is reported in a single StockShortageError. The session is not
+    committed; the caller rolls back on error.
+    """
+    if not quantities:
+        return
+
+    source_rows = StoreProduct.query.options(joinedload(StoreProduct.product))\
+        .filter(
+            StoreProduct.store_id == from_store_id,
+            StoreProduct.product_id.in_(list(quantities)),
+            StoreProduct.is_deleted == False
+        ).with_for_update(of=StoreProduct).all()
+    source = {sp.product_id: sp for sp in source_rows}
+
+    unstocked = sorted(set(quantities) - source.keys())
+    shortages = []
+    if unstocked:
+        names = dict(db.session.query(Product.id, Product.name).filter(Product.id.in_(unstocked)))
+        shortages = [
+            {
+                'product_id': product_id,
+                'store_product_id': None,
+                'product_name': names.get(product_id, 'N/A'),
+                'available_stock': 0,
+                'requested_quantity': quantities[product_id]
+            }
+            for product_id in unstocked
+        ]
+
+    store_products = {sp.id: sp for sp in source_rows}
+    debits = {source[product_id].id: quantity for product_id, quantity in quantities.items() if product_id in source}
+    shortages += [
+        {'product_id': store_products[shortage['store_product_id']].product_id, **shortage}
+        for shortage in find_shortages(store_products, debits)
+    ]
+    if shortages:
+        raise StockShortageError(shortages)
+
+    decrement_stock(store_products, debits)
+
+    now = datetime.utcnow()
+    upsert(
+        StoreProduct,
+        [
+            {
+                'store_id': to_store_id,
+                'product_id': product_id,
+                'quantity_in_stock': quantity,
+                'unit_cost': source[product_id].unit_cost,
+                'price': source[product_id].price,
+                'is_deleted': False,
+                'last_updated': now,
+                'updated_at': now
+            }
+            for product_id, quantity in quantities.items()
+        ],
+        STORE_PRODUCT_KEY,
+        increment=('quantity_in_stock',),
+        # A soft-deleted destination row is brought back rather than credited invisibly
+        replace=('is_deleted', 'last_updated', 'updated_at'),
+        execution_options={INVALIDATES_STORES: {to_store_id}}
+    )
+
+    record_stock_movements(
+        [movement(from_store_id, product_id, -quantity, 'transfer_out', reference_id)
+         for product_id, quantity in quantities.items()] +
+        [movement(to_store_id, product_id, quantity, 'transfer_in', reference_id)
+         for product_id, quantity in quantities.items()]
+    )
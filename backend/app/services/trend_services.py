@@ -0,0 +1,91 @@
+# app/services/trend_services.py
+
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from app.db_utils import sale_day
+from app.errors import BadRequestError
+
+GRANULARITIES = ('day', 'week', 'month')
+DEFAULT_WINDOW_DAYS = 30
+MAX_WINDOW_DAYS = 366 * 3
+
+TrendWindow = namedtuple('TrendWindow', ['start', 'end', 'granularity'])
+
+
+def _parse_day(args, name):
+    value = args.get(name)
+    if not value or value.lower() == 'undefined':
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise BadRequestError(f"Invalid {name} format. Use YYYY-MM-DD.")
+
+
+def parse_trend_window(args):
+    """
+    Reads 'start', 'end' (inclusive, YYYY-MM-DD) and 'granularity'
+    (day|week|month) from request args. Defaults to the last 30 days by day.
+    """
+    granularity = (args.get('granularity') or 'day').lower()
+    if granularity not in GRANULARITIES:
+        raise BadRequestError("Invalid granularity. Must be one of: day, week, month.")
+
+    end = _parse_day(args, 'end') or datetime.utcnow().date()
+    start = _parse_day(args, 'start') or end - timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+    if start > end:
+        raise BadRequestError("'start' must be on or before 'end'.")
+    if (end - start).days >= MAX_WINDOW_DAYS:
+        raise BadRequestError(f"Trend window cannot exceed {MAX_WINDOW_DAYS} days.")
+    return TrendWindow(start, end, granularity)
+
+
+def window_filter(column, window):
+    """Half-open range predicate on a DateTime column, so an index on it is usable."""
+    return (
+        (column >= datetime.combine(window.start, time.min)) &
+        (column < datetime.combine(window.end + timedelta(days=1), time.min))
+    )
+
+
+def day_bucket(column):
+    """Day of a DateTime column for GROUP BY; week/month roll-ups happen in fill_trend."""
+    return sale_day(column).label('bucket_day')
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def fill_trend(day_values, window):
+    """
+    Folds (day, value) rows into the window's buckets and returns one
+    {"date", "value"} point per bucket, including empty ones as 0.0.
+    """
+    totals = {}
+    for day, value in day_values:
+        if isinstance(day, str):  # SQLite's date() returns text
+            day = date.fromisoformat(day)
+        key = bucket_start(day, window.granularity)
+        totals[key] = totals.get(key, Decimal('0')) + Decimal(str(value or 0))
+
+    points = []
+    bucket = bucket_start(window.start, window.granularity)
+    while bucket <= window.end:
+        points.append({"date": bucket.isoformat(), "value": float(totals.get(bucket, 0))})
+        bucket = _next_bucket(bucket, window.granularity)
+    return points
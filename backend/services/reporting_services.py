@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 from sqlalchemy import func
-from app.models import Sale, Product, Store, StoreProduct
+from app.models import Product, DailyStoreProductSales
 from app import db
 
 
@@ -32,13 +32,17 @@ def get_monthly_summary(store_id):
 
 
 def _generate_summary(store_id, start_date, end_date):
+    # Reads the daily rollups: at most one row per product per day in range
     results = (
         db.session.query(
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.sum(Sale.total_price).label('total_revenue')
+            func.sum(DailyStoreProductSales.quantity).label('total_quantity'),
+            func.sum(DailyStoreProductSales.revenue).label('total_revenue')
+        )
+        .filter(DailyStoreProductSales.store_id == store_id)
+        .filter(
+            DailyStoreProductSales.sale_date >= start_date.date(),
+            DailyStoreProductSales.sale_date < end_date.date()
         )
-        .filter(Sale.store_id == store_id)
-        .filter(Sale.created_at >= start_date, Sale.created_at < end_date)
         .first()
     )
 
@@ -52,15 +56,17 @@ def _generate_summary(store_id, start_date, end_date):
 
 
 def get_top_products(store_id, limit=5):
+    total_sold = func.sum(DailyStoreProductSales.quantity)
     results = (
         db.session.query(
             Product.name,
-            func.sum(Sale.quantity).label("total_sold")
+            total_sold.label("total_sold")
         )
-        .join(Sale, Product.id == Sale.product_id)
-        .filter(Sale.store_id == store_id)
-        .group_by(Product.id)
-        .order_by(func.sum(Sale.quantity).desc())
+        .join(DailyStoreProductSales, Product.id == DailyStoreProductSales.product_id)
+        .filter(DailyStoreProductSales.store_id == store_id)
+        .group_by(Product.id, Product.name)
+        .having(total_sold > 0)
+        .order_by(total_sold.desc())
         .limit(limit)
         .all()
     )